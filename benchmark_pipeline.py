@@ -0,0 +1,279 @@
+"""
+Benchmark sin cámara ni ESP32: reproduce un video o una secuencia de landmarks
+a través del clasificador, el suavizado de gestos y la codificación serial.
+
+Uso:
+    python benchmark_pipeline.py --landmarks grabacion.lmk --labels etiquetas.txt
+    python benchmark_pipeline.py --landmarks grabacion.npy --labels etiquetas.txt
+    python benchmark_pipeline.py --video prueba.mp4 --labels etiquetas.txt --device TV.ir
+
+Las etiquetas son un archivo de texto con un gesto por línea (uno por fotograma,
+"NINGUNO" cuando no hay gesto).
+"""
+import argparse
+import json
+import statistics
+import sys
+import time
+
+import numpy as np
+
+from gestures import (GestureSmoother, classify_array, classify_batch, compile_dispatch_table,
+                      get_gesture_robust)
+from ir_protocol import encode_frame
+from irdb_parser import parse_ir_file
+from landmark_log import LandmarkReplay
+from pipeline_metrics import PipelineMetrics
+
+
+class FakeSerial:
+    """Puerto serial simulado: guarda lo escrito con su instante."""
+
+    def __init__(self):
+        self.writes = []
+
+    def write(self, data):
+        self.writes.append((time.perf_counter(), data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+
+def load_landmark_array(path):
+    """Grabación completa como array (N, 21, 3) (.lmk de landmark_log o .npy)."""
+    if path.endswith('.npy'):
+        return np.load(path, mmap_mode='r')
+    return LandmarkReplay(path).hands
+
+
+def iter_landmark_file(path, realtime=False):
+    """
+    Fotogramas (array (21, 3) o None sin mano) de una grabación .lmk o .npy.
+    """
+    if path.endswith('.npy'):
+        for hand in np.load(path, mmap_mode='r'):
+            yield None if np.isnan(hand).any() else hand
+        return
+
+    for _, hand in LandmarkReplay(path).frames(realtime=realtime):
+        yield hand
+
+
+def iter_video_file(path, metrics):
+    """Fotogramas de un video pasados por MediaPipe (requiere cv2 y mediapipe)."""
+    import cv2
+    import mediapipe as mp
+
+    hands = mp.solutions.hands.Hands(
+        model_complexity=1,
+        min_detection_confidence=0.8,
+        min_tracking_confidence=0.5,
+        max_num_hands=1
+    )
+    cap = cv2.VideoCapture(path)
+    while True:
+        success, image = cap.read()
+        if not success:
+            break
+        image = cv2.flip(image, 1)
+        image_rgb = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+        with metrics.time('hands'):
+            results = hands.process(image_rgb)
+        if results.multi_hand_landmarks:
+            yield results.multi_hand_landmarks[0].landmark
+        else:
+            yield None
+    cap.release()
+
+
+def load_labels(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        return [line.strip() for line in f if line.strip()]
+
+
+def label_segments(labels):
+    """Tramos consecutivos con el mismo gesto: lista de (gesto, inicio, fin)."""
+    segments = []
+    start = 0
+    for i in range(1, len(labels) + 1):
+        if i == len(labels) or labels[i] != labels[start]:
+            segments.append((labels[start], start, i))
+            start = i
+    return segments
+
+
+def run_benchmark(frames, fps, labels=None, ir_commands=None, metrics=None, extra_time=0.0):
+    """
+    Pasa cada fotograma por clasificador -> suavizado -> codificación -> FakeSerial.
+
+    'frames' puede contener landmarks de MediaPipe, arrays (21, 3), None (sin
+    mano) o directamente nombres de gesto ya clasificados en bloque.
+
+    El tiempo del suavizado es virtual (fotograma / fps), de modo que el
+    enfriamiento y la latencia de decisión no dependen de la velocidad del equipo.
+
+    'extra_time' se suma al tiempo medido: el trabajo hecho antes de llamar
+    (p. ej. classify_batch) también cuenta en los fotogramas/s.
+    """
+    metrics = metrics or PipelineMetrics(window=100000)
+    smoother = GestureSmoother(window=7, threshold=5, cooldown=0.8)
+    dispatch_table = compile_dispatch_table(ir_commands) if ir_commands else {}
+    ser = FakeSerial()
+    predictions = []
+    decisions = []  # (fotograma, gesto)
+
+    start = time.perf_counter()
+    for i, landmarks in enumerate(frames):
+        gesture = "NINGUNO"
+        if isinstance(landmarks, str):
+            gesture = landmarks
+        elif isinstance(landmarks, np.ndarray):
+            with metrics.time('classify'):
+                gesture = classify_array(landmarks)
+        elif landmarks is not None:
+            with metrics.time('classify'):
+                gesture = get_gesture_robust(landmarks)
+        predictions.append(gesture)
+
+        with metrics.time('smooth'):
+            _, fired = smoother.update(gesture, now=i / fps)
+
+        if fired:
+            decisions.append((i, fired))
+            with metrics.time('encode'):
+                entry = dispatch_table.get(fired)
+                if entry:
+                    message = entry[1]
+                    # Lo mismo que escribe SerialLink con firmware binario
+                    payload = (b"".join(encode_frame(frame_type, len(decisions), body)
+                                        for frame_type, body in message.frames)
+                               if message.frames else message.text or b"")
+                else:
+                    payload = f"{fired}\n".encode()
+            ser.write(payload)
+        metrics.frame_done()
+    elapsed = time.perf_counter() - start + extra_time
+
+    report = {
+        'frames': len(predictions),
+        'elapsed_s': elapsed,
+        'frames_per_s': len(predictions) / elapsed if elapsed else 0.0,
+        'decisions': len(decisions),
+        'serial_writes': len(ser.writes),
+        'stages': metrics.snapshot()['stages'],
+    }
+    if labels:
+        report.update(score_against_labels(predictions, decisions, labels, fps))
+    return report
+
+
+def score_against_labels(predictions, decisions, labels, fps):
+    """Exactitud por fotograma y por decisión, y latencia de decisión por gesto."""
+    n = min(len(predictions), len(labels))
+    frame_hits = sum(1 for i in range(n) if predictions[i] == labels[i])
+
+    latencies = {}
+    correct_decisions = 0
+    for gesture, start, end in label_segments(labels[:n]):
+        correct = [i for i, g in decisions if start <= i < end and g == gesture]
+        correct_decisions += len(correct)
+        if gesture != "NINGUNO":
+            # Latencia hasta la primera decisión correcta del tramo (None = no se detectó)
+            first = correct[0] if correct else None
+            latencies.setdefault(gesture, []).append(
+                (first - start) / fps * 1000 if first is not None else None)
+
+    per_gesture = {}
+    for gesture, values in latencies.items():
+        detected = [v for v in values if v is not None]
+        per_gesture[gesture] = {
+            'segments': len(values),
+            'detected': len(detected),
+            'latency_median_ms': statistics.median(detected) if detected else None,
+            'latency_max_ms': max(detected) if detected else None,
+        }
+
+    return {
+        'frame_accuracy': frame_hits / n if n else 0.0,
+        'decision_precision': correct_decisions / len(decisions) if decisions else 0.0,
+        'per_gesture': per_gesture,
+    }
+
+
+def print_report(report):
+    print(f"Fotogramas:  {report['frames']} en {report['elapsed_s']:.3f} s "
+          f"({report['frames_per_s']:.0f} fotogramas/s)")
+    print(f"Decisiones:  {report['decisions']} ({report['serial_writes']} escrituras serial)")
+    for name, s in sorted(report['stages'].items()):
+        if 'p50_ms' in s:
+            print(f"  {name:<10} p50 {s['p50_ms']:.3f} ms  p95 {s['p95_ms']:.3f} ms  "
+                  f"p99 {s['p99_ms']:.3f} ms  (n={s['count']})")
+    if 'frame_accuracy' in report:
+        print(f"Exactitud por fotograma: {report['frame_accuracy']:.1%}")
+        print(f"Precisión de decisiones: {report['decision_precision']:.1%}")
+        for gesture, g in sorted(report['per_gesture'].items()):
+            latency = (f"mediana {g['latency_median_ms']:.0f} ms, máx {g['latency_max_ms']:.0f} ms"
+                       if g['detected'] else "sin detecciones")
+            print(f"  {gesture:<16} {g['detected']}/{g['segments']} tramos, {latency}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark offline del pipeline de gestos.")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument('--video', help="Archivo de video (usa MediaPipe)")
+    source.add_argument('--landmarks', help="Landmarks grabados (.lmk o .npy de forma N x 21 x 3)")
+    parser.add_argument('--labels', help="Gesto esperado por fotograma (un gesto por línea)")
+    parser.add_argument('--device', help="Archivo .ir para codificar comandos reales")
+    parser.add_argument('--fps', type=float,
+                        help="FPS de la grabación (por defecto: el de la .lmk, o 30)")
+    parser.add_argument('--realtime', action='store_true',
+                        help="Reproducir la .lmk respetando sus tiempos originales")
+    parser.add_argument('--batch', action='store_true',
+                        help="Clasificar toda la grabación de una vez (classify_batch)")
+    parser.add_argument('--json', help="Guardar el informe en este archivo JSON")
+    args = parser.parse_args()
+    if args.batch and args.realtime:
+        parser.error("--realtime no es compatible con --batch (se clasifica todo de una vez)")
+    if args.batch and not args.landmarks:
+        parser.error("--batch requiere --landmarks")
+
+    labels = load_labels(args.labels) if args.labels else None
+    ir_commands = None
+    if args.device:
+        ir_commands = {cmd.name: cmd for cmd in parse_ir_file(args.device) if cmd.name}
+
+    metrics = PipelineMetrics(window=100000)
+    batch_time = 0.0
+    if args.video:
+        frames = iter_video_file(args.video, metrics)
+    elif args.batch:
+        hands = load_landmark_array(args.landmarks)
+        start = time.perf_counter()
+        frames = classify_batch(hands).tolist()
+        batch_time = time.perf_counter() - start
+        metrics.record('classify_batch', batch_time)
+        # Coste equivalente por fotograma, comparable con 'classify'
+        metrics.record('classify', batch_time / max(len(frames), 1))
+    else:
+        frames = iter_landmark_file(args.landmarks, args.realtime)
+
+    fps = args.fps
+    if fps is None:
+        fps = 30.0
+        if args.landmarks and not args.landmarks.endswith('.npy'):
+            fps = LandmarkReplay(args.landmarks).fps() or fps
+
+    report = run_benchmark(frames, fps, labels, ir_commands, metrics, extra_time=batch_time)
+    if not report['frames']:
+        print("La fuente no contiene fotogramas")
+        sys.exit(1)
+
+    print_report(report)
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""
+Benchmark del arranque en frío de la interfaz.
+
+Mide:
+  - el tiempo de importación de cada módulo pesado, en un intérprete nuevo
+    (equivalente a 'python -X importtime' pero resumido por módulo);
+  - las marcas del arranque de main.py (imports, window_shown, event_loop,
+    interactive = índice listo, first_frame = primer fotograma en pantalla),
+    repitiendo el arranque varias veces.
+
+Uso:
+    python benchmark_startup.py --runs 5
+    python benchmark_startup.py --runs 3 --timeout 40 --json arranque.json
+
+Sin cámara no llega 'first_frame': cada arranque se corta al agotar --timeout
+y se informa de las marcas alcanzadas.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from pipeline_metrics import STARTUP_BENCHMARK_ENV
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+MODULES = ['PyQt6.QtWidgets', 'serial', 'numpy', 'cv2', 'mediapipe', 'gui_app']
+MARKS = ['imports', 'window_shown', 'event_loop', 'interactive', 'first_frame']
+
+
+def import_time(module):
+    """Segundos que tarda 'import module' en un intérprete nuevo (None si falla)."""
+    code = ("import time; t = time.perf_counter(); "
+            f"import {module}; print(time.perf_counter() - t)")
+    result = subprocess.run([sys.executable, '-c', code], cwd=HERE,
+                            capture_output=True, text=True)
+    if result.returncode != 0:
+        return None
+    return float(result.stdout.strip().splitlines()[-1])
+
+
+def run_app(timeout):
+    """Arranca main.py una vez y devuelve sus marcas (segundos desde el inicio)."""
+    fd, path = tempfile.mkstemp(suffix='.json')
+    os.close(fd)
+    env = dict(os.environ, **{STARTUP_BENCHMARK_ENV: path})
+    try:
+        process = subprocess.Popen([sys.executable, os.path.join(HERE, 'main.py')],
+                                   cwd=HERE, env=env,
+                                   stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        try:
+            process.wait(timeout=timeout)
+        except subprocess.TimeoutExpired:
+            process.terminate()
+            process.wait()
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+    finally:
+        os.remove(path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark del arranque de la interfaz.")
+    parser.add_argument('--runs', type=int, default=3, help="Arranques completos a medir")
+    parser.add_argument('--timeout', type=float, default=30.0,
+                        help="Segundos máximos por arranque")
+    parser.add_argument('--skip-imports', action='store_true',
+                        help="No medir los imports por separado")
+    parser.add_argument('--json', help="Guardar los resultados en este archivo")
+    args = parser.parse_args()
+
+    results = {'imports': {}, 'runs': []}
+
+    if not args.skip_imports:
+        print("Importación en un intérprete nuevo:")
+        for module in MODULES:
+            elapsed = import_time(module)
+            results['imports'][module] = elapsed
+            shown = f"{elapsed * 1000:8.1f} ms" if elapsed is not None else "   no disponible"
+            print(f"  {module:<16} {shown}")
+
+    for i in range(args.runs):
+        start = time.perf_counter()
+        marks = run_app(args.timeout)
+        results['runs'].append(marks)
+        print(f"Arranque {i + 1}/{args.runs}: {time.perf_counter() - start:.1f} s, "
+              f"marcas: {', '.join(m for m in MARKS if m in marks) or 'ninguna'}")
+
+    if args.runs:
+        print("Mediana de las marcas (desde el inicio de main.py):")
+        for name in MARKS:
+            values = [run[name] for run in results['runs'] if name in run]
+            if values:
+                print(f"  {name:<14} {statistics.median(values) * 1000:8.1f} ms"
+                      f"  ({len(values)}/{args.runs} arranques)")
+            else:
+                print(f"  {name:<14}      --")
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
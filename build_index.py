@@ -0,0 +1,139 @@
+"""
+Precarga el índice del IRDB analizando todos los .ir en paralelo.
+
+Uso:
+    python build_index.py [--root ./IRDB] [--db ./irdb_index.sqlite] [--jobs N] [--full]
+"""
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from irdb_index import INDEX_PATH, IRDB_ROOT, IRDBIndex
+from irdb_parser import iter_ir_file, validate_command
+
+# Archivos por tarea enviada a cada proceso
+SHARD_SIZE = 256
+
+
+def parse_shard(shard):
+    """
+    Analiza un lote de archivos en un proceso trabajador.
+
+    Args:
+        shard (list): Pares (clave, ruta).
+
+    Returns:
+        list: Tuplas (clave, comandos válidos, errores) por archivo.
+    """
+    results = []
+    for key, path in shard:
+        commands = []
+        errors = []
+        try:
+            for cmd in iter_ir_file(path):
+                problem = validate_command(cmd)
+                if problem:
+                    errors.append(problem)
+                else:
+                    commands.append(cmd)
+        except Exception as e:
+            errors.append(f"error de lectura: {e}")
+        if not commands and not errors:
+            errors.append("archivo sin comandos")
+        results.append((key, commands, errors))
+    return results
+
+
+def build(root=IRDB_ROOT, db_path=INDEX_PATH, jobs=None, full=False, verbose=True):
+    """
+    Analiza en paralelo los archivos nuevos o modificados y los escribe en el índice.
+
+    Returns:
+        dict: Estadísticas de la ejecución (archivos, comandos, fallos, tiempos).
+    """
+    start = time.perf_counter()
+    index = IRDBIndex(db_path, root)
+    known = {} if full else index.known_files()
+
+    stats_by_key = {}
+    pending = []
+    seen = set()
+    for key, path, st in index.iter_ir_files():
+        seen.add(key)
+        if known.get(key) != (st.st_mtime_ns, st.st_size):
+            stats_by_key[key] = st
+            pending.append((key, path))
+
+    removed = [key for key in index.known_files() if key not in seen]
+    index.remove(removed)
+
+    shards = [pending[i:i + SHARD_SIZE] for i in range(0, len(pending), SHARD_SIZE)]
+    n_files = n_commands = 0
+    failures = []
+
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        for results in executor.map(parse_shard, shards):
+            for key, commands, errors in results:
+                index.store(key, stats_by_key[key], commands)
+                n_files += 1
+                n_commands += len(commands)
+                failures.extend(f"{key}: {e}" for e in errors)
+            index.conn.commit()
+            if verbose:
+                print(f"\r{n_files}/{len(pending)} archivos", end='', file=sys.stderr)
+
+    if n_files or removed:
+        index.prune()
+        index.conn.commit()
+    dedup = index.dedup_stats()
+    index.close()
+    elapsed = time.perf_counter() - start
+    if verbose and pending:
+        print(file=sys.stderr)
+
+    return {
+        'scanned': len(seen),
+        'files': n_files,
+        'commands': n_commands,
+        'removed': len(removed),
+        'dedup': dedup,
+        'failures': failures,
+        'elapsed': elapsed,
+        'files_per_s': n_files / elapsed if elapsed else 0.0,
+        'commands_per_s': n_commands / elapsed if elapsed else 0.0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Construye el índice del IRDB en paralelo.")
+    parser.add_argument('--root', default=IRDB_ROOT, help="Carpeta del IRDB")
+    parser.add_argument('--db', default=INDEX_PATH, help="Archivo SQLite del índice")
+    parser.add_argument('--jobs', type=int, default=os.cpu_count(), help="Procesos trabajadores")
+    parser.add_argument('--full', action='store_true', help="Reanalizar todo, no solo lo modificado")
+    parser.add_argument('--show-failures', type=int, default=20,
+                        help="Máximo de fallos a listar")
+    args = parser.parse_args()
+
+    if not os.path.isdir(args.root):
+        print(f"No existe la carpeta del IRDB: {args.root}")
+        sys.exit(1)
+
+    stats = build(args.root, args.db, args.jobs, args.full)
+
+    print(f"Escaneados: {stats['scanned']} archivos "
+          f"({stats['files']} analizados, {stats['removed']} eliminados)")
+    print(f"Comandos:   {stats['commands']}")
+    dedup = stats['dedup']
+    print(f"Índice:     {dedup['files']} archivos -> {dedup['command_sets']} conjuntos únicos, "
+          f"{dedup['commands']} comandos -> {dedup['signals']} señales únicas")
+    print(f"Tiempo:     {stats['elapsed']:.2f} s "
+          f"({stats['files_per_s']:.0f} archivos/s, {stats['commands_per_s']:.0f} comandos/s)")
+    print(f"Fallos:     {len(stats['failures'])}")
+    for failure in stats['failures'][:args.show_failures]:
+        print(f"  - {failure}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,206 @@
+"""
+Barrido universal de códigos: cuando no se sabe el modelo del equipo, envía
+uno tras otro todos los códigos distintos de un botón (POWER por defecto) que
+hay en el IRDB, del más al menos usado. El operador lo detiene con un gesto
+cuando el equipo reacciona y se informa de qué código estaba activo.
+
+Sin dependencias de Qt: lo usan la interfaz y el modo headless.
+"""
+import threading
+import time
+from collections import deque
+
+from gestures import GESTURE_TO_IR_NAMES, build_serial_command, normalize_command_name
+from ir_encoder import encode_command
+
+# Canal de SerialLink del barrido (no compite con la cola de las sesiones)
+SWEEP_CHANNEL = 'sweep'
+
+# Silencio entre dos códigos para que el receptor los separe (s)
+SWEEP_GAP = 0.06
+
+# Duración supuesta de una trama IR si el protocolo no se sabe codificar (s)
+DEFAULT_FRAME_DURATION = 0.08
+
+# Códigos enviados hasta este tiempo antes del gesto de parada también son
+# candidatos (reacción del operador + suavizado del gesto) (s)
+REACTION_WINDOW = 0.8
+
+
+class SweepCode:
+    """Un código del barrido con lo necesario para enviarlo y acompasarlo."""
+    __slots__ = ('index', 'command', 'message', 'n_files', 'duration')
+
+    def __init__(self, index, command, message, n_files, duration):
+        self.index = index
+        self.command = command
+        self.message = message
+        self.n_files = n_files
+        self.duration = duration
+
+    def __repr__(self):
+        return f"#{self.index + 1} {self.message!r} ({self.n_files} archivos)"
+
+
+def frame_duration(ir_cmd):
+    """Duración de la trama IR de un comando (s), a partir de sus tiempos."""
+    encoded = encode_command(ir_cmd)
+    if encoded is None or not encoded[1]:
+        return DEFAULT_FRAME_DURATION
+    return sum(encoded[1]) / 1e6
+
+
+def gather_sweep_codes(ir_index, gesture="ENCENDIDO"):
+    """
+    Códigos distintos del botón asociado a 'gesture' en todo el índice.
+
+    Se aceptan los nombres de GESTURE_TO_IR_NAMES normalizados ('POWER',
+    'power', 'Power'...). Los códigos que acaban en el mismo mensaje (alias de
+    protocolo) se envían una sola vez.
+
+    Returns:
+        list: SweepCode ordenados de más a menos archivos que los usan.
+    """
+    aliases = {normalize_command_name(name) for name in GESTURE_TO_IR_NAMES.get(gesture, ())}
+    names = [name for name in ir_index.command_names()
+             if normalize_command_name(name) in aliases]
+
+    codes = []
+    seen = set()
+    for cmd, n_files in ir_index.signals_for_names(names):
+        message = build_serial_command(cmd)
+        if message in seen:
+            continue
+        seen.add(message)
+        codes.append(SweepCode(len(codes), cmd, message, n_files, frame_duration(cmd)))
+    return codes
+
+
+class CodeSweep:
+    """
+    Envía los códigos por SerialLink en su propio hilo.
+
+    Tras encolar un código se espera a que el enlace lo haya escrito en el
+    puerto (SerialLink.pending); desde ese momento cuenta la duración de su
+    trama IR más SWEEP_GAP antes de encolar el siguiente. Así el intervalo no
+    depende de lo que tarde el puerto y el barrido nunca acumula cola.
+
+    Args:
+        link (SerialLink): Enlace ya arrancado.
+        codes (list): SweepCode en el orden de envío (ver gather_sweep_codes).
+        on_progress (callable, opcional): on_progress(código, total) al enviar cada uno.
+        on_finished (callable, opcional): on_finished(resultado) al terminar o
+            detenerse, con resultado = dict (ver stop()).
+
+    Los callbacks se llaman desde el hilo del barrido.
+    """
+
+    def __init__(self, link, codes, on_progress=None, on_finished=None,
+                 channel=SWEEP_CHANNEL, gap=SWEEP_GAP):
+        self.link = link
+        self.codes = codes
+        self.on_progress = on_progress
+        self.on_finished = on_finished
+        self.channel = channel
+        self.gap = gap
+
+        self.active_index = None
+        self.result = None
+        self._sent = deque(maxlen=64)  # (instante de envío, índice)
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self._thread = None
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive() and not self._stop.is_set()
+
+    def start(self, start_index=0):
+        self._thread = threading.Thread(target=self._run, args=(start_index,),
+                                        name="CodeSweep", daemon=True)
+        self._thread.start()
+
+    def stop(self, at=None):
+        """
+        Detener el barrido (p. ej. al detectar un gesto).
+
+        Args:
+            at (float, opcional): perf_counter() del momento en que el operador
+                reaccionó (el fotograma del gesto); por defecto, ahora.
+
+        Returns:
+            dict: 'index' (código activo en ese momento, o None), 'code',
+            'candidates' (índices enviados en la REACTION_WINDOW anterior, del
+            más reciente al más antiguo), 'stopped' y 'total'.
+        """
+        at = time.perf_counter() if at is None else at
+        with self._lock:
+            if self.result is None:
+                self.result = self._result(at, stopped=True)
+        self._stop.set()
+        return self.result
+
+    def wait(self, timeout=None):
+        if self._thread:
+            self._thread.join(timeout)
+
+    def interval(self, code):
+        """Segundos hasta el siguiente código desde que el enlace escribió 'code'."""
+        return code.duration + self.gap
+
+    def _run(self, start_index):
+        link = self.link
+        for i in range(start_index, len(self.codes)):
+            # Sin ESP32: esperar sin perder el turno
+            while not self._stop.is_set() and not link.connected:
+                self._stop.wait(0.005)
+            if self._stop.is_set():
+                break
+
+            code = self.codes[i]
+            link.send(code.message, channel=self.channel)
+            # El intervalo cuenta desde que el enlace lo escribió, no desde la cola
+            while not self._stop.is_set() and link.pending(self.channel):
+                self._stop.wait(0.002)
+            if self._stop.is_set():
+                break
+            with self._lock:
+                self._sent.append((time.perf_counter(), i))
+                self.active_index = i
+            if self.on_progress:
+                self.on_progress(code, len(self.codes))
+            if self._stop.wait(self.interval(code)):
+                break
+
+        with self._lock:
+            if self.result is None:
+                self.result = self._result(time.perf_counter(), stopped=False)
+        if self.on_finished:
+            self.on_finished(self.result)
+
+    def _result(self, at, stopped):
+        """Resultado a partir de los códigos enviados hasta 'at' (con self._lock)."""
+        sent = [(t, i) for t, i in self._sent if t <= at]
+        index = sent[-1][1] if sent else None
+        candidates = [i for t, i in reversed(sent) if t >= at - REACTION_WINDOW]
+        return {
+            'index': index,
+            'code': self.codes[index] if index is not None else None,
+            'candidates': candidates or ([index] if index is not None else []),
+            'stopped': stopped,
+            'total': len(self.codes),
+        }
+
+
+def describe_result(result):
+    """Texto para el operador con el código activo y los candidatos."""
+    if result['index'] is None:
+        return "Barrido detenido antes de enviar ningún código"
+    code = result['code']
+    text = (f"{'Barrido detenido' if result['stopped'] else 'Barrido terminado'} en el código "
+            f"{result['index'] + 1}/{result['total']}: {code.message!r} "
+            f"(botón '{code.command.name}', {code.n_files} archivos)")
+    others = [i + 1 for i in result['candidates'] if i != result['index']][:5]
+    if result['stopped'] and others:
+        text += f"; si no era ese, probar {', '.join(f'#{i}' for i in others)}"
+    return text
@@ -0,0 +1,200 @@
+"""
+Bucle de control por gestos sin Qt: cámara -> MediaPipe -> sesiones -> SerialLink.
+
+Lo usan tanto la interfaz (gui_app.VideoThread, que añade el render) como el
+modo sin pantalla (headless.py, que no dibuja nada).
+"""
+import threading
+import time
+
+import cv2
+import mediapipe as mp
+
+from gestures import landmarks_to_array
+from landmark_log import LandmarkRecorder
+from video_pipeline import AdaptiveInferenceScheduler, CaptureWorker, LatestSlot
+
+mp_hands = mp.solutions.hands
+
+
+class GestureEngine:
+    """
+    Procesa la cámara y envía los comandos IR de cada sesión.
+
+    Args:
+        sessions (SessionManager): Sesiones de control (mano/zona -> dispositivo).
+        link (SerialLink): Enlace con el ESP32 (se arranca y para con el motor).
+        metrics (PipelineMetrics): Instrumentación por etapa.
+        on_frame (callable, opcional): on_frame(image_rgb, multi_hand_landmarks,
+            overlay) por fotograma, con overlay = [(sesión, gesto mostrado)].
+            Sin él no se hace ningún trabajo de visualización.
+        on_gesture (callable, opcional): on_gesture(sesión, gesto) al disparar.
+        on_metrics (callable, opcional): on_metrics(snapshot) cada metrics_interval s.
+        on_progress (callable, opcional): on_progress(texto) en cada paso del arranque.
+
+    Los callbacks se llaman desde el hilo que ejecuta run().
+    """
+
+    def __init__(self, sessions, link, metrics, camera_index=0, adaptive=True,
+                 on_frame=None, on_gesture=None, on_metrics=None, metrics_interval=1.0,
+                 on_progress=None):
+        self.sessions = sessions
+        self.link = link
+        self.metrics = metrics
+        self.camera_index = camera_index
+        self.adaptive = adaptive
+        self.on_frame = on_frame
+        self.on_gesture = on_gesture
+        self.on_metrics = on_metrics
+        self.metrics_interval = metrics_interval
+        self.on_progress = on_progress
+
+        self.last_gesture_latency = None
+        # Grabación opcional de landmarks (ver landmark_log); se abre y cierra
+        # desde otros hilos, así que escribir y cerrar van con el mismo lock
+        self.recorder = None
+        self._recorder_lock = threading.Lock()
+        # Barrido de códigos en curso (code_sweep.CodeSweep): un gesto lo detiene
+        self.sweep = None
+        self._run_flag = True
+
+    def make_hands(self, model_complexity):
+        return mp_hands.Hands(
+            model_complexity=model_complexity,
+            min_detection_confidence=0.8,
+            min_tracking_confidence=0.5,
+            max_num_hands=self.sessions.max_hands
+        )
+
+    def run(self):
+        """Bucle principal; vuelve cuando se llama a stop()."""
+        # Pipeline por etapas: captura -> inferencia (este hilo) -> on_frame.
+        # La captura deja su salida en un buzón de un elemento, así una
+        # inferencia lenta descarta fotogramas viejos en vez de acumular retraso.
+        # La cámara se abre y el ESP32 se busca en sus hilos mientras se carga el modelo
+        self._progress("Abriendo cámara y cargando modelo de manos...")
+        capture_slot = LatestSlot()
+        capture = CaptureWorker(self.camera_index, capture_slot, self.metrics)
+        capture.start()
+        self.link.start()
+
+        scheduler = AdaptiveInferenceScheduler() if self.adaptive else None
+        with self.metrics.time('startup_model_load'):
+            hands = self.make_hands(1)
+        self._progress("Esperando a la cámara...")
+
+        last_metrics_emit = time.perf_counter()
+        metrics = self.metrics
+        sessions = self.sessions.sessions
+
+        while self._run_flag:
+            frame = capture_slot.get(timeout=0.1)
+            if frame is None:
+                continue
+            metrics.record('queue_wait', time.perf_counter() - frame.timestamp)
+
+            with metrics.time('convert'):
+                image_rgb = cv2.cvtColor(frame.image, cv2.COLOR_BGR2RGB)
+
+            # Sin mano a la vista: saltar fotogramas (solo se muestran)
+            if scheduler and not scheduler.should_process():
+                metrics.count('frames_skipped')
+                if self.on_frame:
+                    self.on_frame(image_rgb, None, [(s.name, "...") for s in sessions])
+                continue
+
+            # Sin mano: detectar a resolución reducida (los landmarks son normalizados)
+            inference_image = image_rgb
+            if scheduler and scheduler.scale != 1.0:
+                inference_image = cv2.resize(image_rgb, None, fx=scheduler.scale, fy=scheduler.scale,
+                                             interpolation=cv2.INTER_AREA)
+
+            inference_start = time.perf_counter()
+            results = hands.process(inference_image)
+            inference_time = time.perf_counter() - inference_start
+            metrics.record('hands', inference_time)
+
+            if scheduler and scheduler.report(bool(results.multi_hand_landmarks), inference_time):
+                # Fuera de presupuesto: modelo más ligero
+                hands.close()
+                hands = self.make_hands(scheduler.model_complexity)
+                metrics.count('model_downgrades')
+                print(f"Inferencia lenta: cambiando a model_complexity={scheduler.model_complexity}")
+
+            # Landmarks -> array (21, 3) una vez por mano, con su lateralidad
+            hands_found = []
+            labels = []
+            if results.multi_hand_landmarks:
+                for i, hand_landmarks in enumerate(results.multi_hand_landmarks):
+                    hands_found.append(landmarks_to_array(hand_landmarks.landmark))
+                    labels.append(results.multi_handedness[i].classification[0].label
+                                  if results.multi_handedness else None)
+
+            with self._recorder_lock:
+                if self.recorder is not None:
+                    with metrics.time('record'):
+                        # El formato .lmk guarda una mano por fotograma: la primera
+                        self.recorder.write(frame.timestamp,
+                                            hands_found[0] if hands_found else None)
+
+            # --- Clasificación y suavizado por sesión ---
+            with metrics.time('classify'):
+                fired_events = self.sessions.update(hands_found, labels)
+            for session, fired in fired_events:
+                fired_time = time.perf_counter()
+                sweep = self.sweep
+                if sweep is not None and sweep.running:
+                    # Durante un barrido el gesto solo lo detiene; el código
+                    # activo es el del instante en que se capturó el fotograma
+                    sweep.stop(frame.timestamp)
+                else:
+                    # Envío directo desde este hilo; SerialLink reparte los turnos entre sesiones
+                    entry = session.dispatch_table.get(fired)
+                    if entry:
+                        self.link.send(entry[1], fired_time, channel=session.name)
+                if self.on_gesture:
+                    self.on_gesture(session, fired)
+                # Latencia extremo a extremo: captura del fotograma -> gesto emitido
+                self.last_gesture_latency = fired_time - frame.timestamp
+                metrics.record('capture_to_gesture', self.last_gesture_latency)
+                metrics.count('gestures_emitted')
+
+            if self.on_frame:
+                self.on_frame(image_rgb, results.multi_hand_landmarks,
+                              [(s.name, s.display_gesture) for s in sessions])
+            metrics.frame_done()
+
+            # Publicar métricas periódicamente
+            now = time.perf_counter()
+            if self.on_metrics and now - last_metrics_emit >= self.metrics_interval:
+                last_metrics_emit = now
+                self.on_metrics(metrics.snapshot(advance_cpu=True))
+
+        hands.close()
+        capture.stop()
+        self.stop_recording()
+        self.link.stop()
+
+    def stop(self):
+        self._run_flag = False
+
+    def _progress(self, text):
+        if self.on_progress:
+            self.on_progress(text)
+
+    def start_recording(self, path):
+        """Empezar a grabar los landmarks de cada fotograma en 'path' (.lmk)"""
+        recorder = LandmarkRecorder(path)
+        with self._recorder_lock:
+            previous, self.recorder = self.recorder, recorder
+            if previous is not None:
+                previous.close()
+
+    def stop_recording(self):
+        """Terminar la grabación. Devuelve el número de fotogramas grabados."""
+        with self._recorder_lock:
+            recorder, self.recorder = self.recorder, None
+            if recorder is None:
+                return 0
+            recorder.close()
+            return recorder.frames
@@ -0,0 +1,377 @@
+import difflib
+import math
+import re
+import time
+from collections import deque
+
+import numpy as np
+
+from ir_encoder import encode, firmware_approximates
+from ir_protocol import IRMessage, RawMessage
+
+# --- Mapeo de Gestos a Comandos ---
+GESTURE_TO_IR_NAMES = {
+    "ENCENDIDO": ["Power", "power", "POWER", "On", "Off", "On/Off"],
+    "SILENCIAR": ["Mute", "mute", "MUTE", "Silence", "A/V_Mute"],
+    "SUBIR VOLUMEN": ["Vol_up", "Vol+", "Volume_up", "Volume+", "vol_up", "VOL_UP", "VOL+"],
+    "BAJAR VOLUMEN": ["Vol_dn", "Vol-", "Volume_down", "Volume-", "vol_dn", "VOL_DN", "Vol_down", "VOL-"],
+    "CANAL SIGUIENTE": ["Ch_next", "Ch+", "Channel_up", "Channel+", "ch_next", "CH_NEXT", "Up"],
+    "CANAL ANTERIOR": ["Ch_prev", "Ch-", "Channel_down", "Channel-", "ch_prev", "CH_PREV", "Down"],
+    "FUENTE": ["Source", "source", "SOURCE", "Input", "input", "INPUT", "Hdmi_1", "HDMI"]
+}
+
+# --- Lógica de Gestos ---
+# Todo el cálculo se hace sobre arrays (21, 3) o (N, 21, 3): los landmarks se
+# convierten una sola vez y las distancias de los 4 dedos salen de una operación.
+NUM_LANDMARKS = 21
+
+WRIST, THUMB_IP, THUMB_TIP, INDEX_MCP, INDEX_PIP, INDEX_TIP = 0, 3, 4, 5, 6, 8
+FINGER_TIPS = [8, 12, 16, 20]   # Índice, Medio, Anular, Meñique
+FINGER_PIPS = [6, 10, 14, 18]
+# Puntas y PIPs juntas: una sola indexación y una sola resta contra la muñeca
+_TIPS_AND_PIPS = np.array(FINGER_TIPS + FINGER_PIPS)
+
+# El dedo está extendido si la punta está más lejos de la muñeca que la PIP (x1.1)
+FINGER_EXTENSION_RATIO = 1.1
+# Distancia punta del pulgar - MCP del índice para considerarlo extendido
+THUMB_EXTENSION_DIST = 0.15
+# Desplazamiento horizontal mínimo del índice para apuntar a un lado
+POINTING_DX = 0.05
+
+GESTURE_NAMES = np.array(["NINGUNO", "ENCENDIDO", "SILENCIAR", "SUBIR VOLUMEN", "BAJAR VOLUMEN",
+                          "CANAL SIGUIENTE", "CANAL ANTERIOR", "FUENTE"], dtype=object)
+(NINGUNO, ENCENDIDO, SILENCIAR, SUBIR_VOLUMEN, BAJAR_VOLUMEN,
+ CANAL_SIGUIENTE, CANAL_ANTERIOR, FUENTE) = range(len(GESTURE_NAMES))
+
+
+def landmarks_to_array(landmarks, dtype=None):
+    """Landmarks de MediaPipe (objetos con x, y, z) -> array (21, 3)."""
+    return np.fromiter((c for p in landmarks for c in (p.x, p.y, p.z)),
+                       dtype=dtype or np.float32, count=NUM_LANDMARKS * 3).reshape(NUM_LANDMARKS, 3)
+
+
+def finger_extensions(hands):
+    """
+    Dedos extendidos (Índice, Medio, Anular, Meñique) usando lógica de distancia.
+    Funciona independientemente de la rotación de la mano.
+
+    Args:
+        hands: array (..., 21, 3).
+
+    Returns:
+        array bool (..., 4).
+    """
+    delta = hands[..., _TIPS_AND_PIPS, :2] - hands[..., WRIST:WRIST + 1, :2]
+    dist = np.sqrt((delta * delta).sum(axis=-1))
+    return dist[..., :4] > dist[..., 4:] * FINGER_EXTENSION_RATIO
+
+
+def classify_array(hand):
+    """
+    Clasifica una mano (array (21, 3)) y devuelve el nombre del gesto.
+
+    Detecta: Encendido (5), Mute (0), Vol+/- (Pulgar), Canal+/- (Índice), Fuente (3)
+    """
+    extended = finger_extensions(hand)
+    fingers_up = int(extended.sum())
+
+    # El pulgar es complicado. Comprobamos si la punta está 'lejos' de la base del índice (MCP)
+    thumb_tip_x, thumb_tip_y = float(hand[THUMB_TIP, 0]), float(hand[THUMB_TIP, 1])
+    thumb_extended = math.hypot(thumb_tip_x - hand[INDEX_MCP, 0],
+                                thumb_tip_y - hand[INDEX_MCP, 1]) > THUMB_EXTENSION_DIST
+
+    # 1. Palma Abierta (Encender)
+    if fingers_up + thumb_extended == 5:
+        return "ENCENDIDO"
+
+    # 2. Puño / Gestos con Pulgar (0 dedos arriba)
+    if fingers_up == 0:
+        if thumb_extended:
+            # Pulgar Arriba/Abajo: la punta está por encima/debajo de IP y MCP del Índice
+            # (en coords de imagen, y aumenta hacia abajo)
+            if thumb_tip_y < hand[THUMB_IP, 1] and thumb_tip_y < hand[INDEX_MCP, 1]:
+                return "SUBIR VOLUMEN"
+            if thumb_tip_y > hand[THUMB_IP, 1] and thumb_tip_y > hand[INDEX_MCP, 1]:
+                return "BAJAR VOLUMEN"
+        return "SILENCIAR" # Puño Cerrado
+
+    # 3. Apuntando (1 dedo: Índice)
+    if fingers_up == 1 and extended[0]:
+        dx = hand[INDEX_TIP, 0] - hand[INDEX_PIP, 0]
+        # Izquierda (en pantalla); vertical u horizontal a la derecha es Siguiente
+        if abs(dx) > POINTING_DX and dx < 0:
+            return "CANAL ANTERIOR"
+        return "CANAL SIGUIENTE"
+
+    if fingers_up == 2:
+        return "CANAL ANTERIOR"
+
+    if fingers_up == 3:
+        return "FUENTE"
+
+    if fingers_up == 4:
+        return "ENCENDIDO" # Alternativa para 4 dedos
+
+    return "NINGUNO"
+
+
+def classify_batch(hands):
+    """
+    Clasifica muchas manos a la vez (p. ej. una grabación completa).
+
+    Args:
+        hands: array (N, 21, 3). Las filas con NaN (sin mano) dan "NINGUNO".
+
+    Returns:
+        array (N,) con el nombre del gesto de cada fila.
+    """
+    hands = np.asarray(hands)
+    extended = finger_extensions(hands)
+    fingers_up = extended.sum(axis=-1)
+
+    thumb_tip_y = hands[:, THUMB_TIP, 1]
+    thumb_delta = hands[:, THUMB_TIP, :2] - hands[:, INDEX_MCP, :2]
+    thumb_extended = np.sqrt((thumb_delta * thumb_delta).sum(axis=-1)) > THUMB_EXTENSION_DIST
+    thumb_up = (thumb_tip_y < hands[:, THUMB_IP, 1]) & (thumb_tip_y < hands[:, INDEX_MCP, 1])
+    thumb_down = (thumb_tip_y > hands[:, THUMB_IP, 1]) & (thumb_tip_y > hands[:, INDEX_MCP, 1])
+    dx = hands[:, INDEX_TIP, 0] - hands[:, INDEX_PIP, 0]
+    valid = ~np.isnan(hands).any(axis=(1, 2))
+
+    # Mismo árbol de decisión que classify_array, en orden de prioridad
+    conditions = [
+        ~valid,
+        fingers_up + thumb_extended == 5,
+        (fingers_up == 0) & thumb_extended & thumb_up,
+        (fingers_up == 0) & thumb_extended & thumb_down,
+        fingers_up == 0,
+        (fingers_up == 1) & extended[:, 0] & (np.abs(dx) > POINTING_DX) & (dx < 0),
+        (fingers_up == 1) & extended[:, 0],
+        fingers_up == 2,
+        fingers_up == 3,
+        fingers_up == 4,
+    ]
+    choices = [NINGUNO, ENCENDIDO, SUBIR_VOLUMEN, BAJAR_VOLUMEN, SILENCIAR,
+               CANAL_ANTERIOR, CANAL_SIGUIENTE, CANAL_ANTERIOR, FUENTE, ENCENDIDO]
+    return GESTURE_NAMES[np.select(conditions, choices, default=NINGUNO)]
+
+
+def get_gesture_robust(landmarks):
+    """Gesto a partir de los landmarks de MediaPipe (hand_landmarks.landmark)."""
+    return classify_array(landmarks_to_array(landmarks))
+
+
+# --- Suavizado temporal ---
+# Gestos que se repiten mientras se mantienen: gesto -> (retardo, intervalo) en s
+REPEAT_GESTURES = {
+    "SUBIR VOLUMEN": (0.6, 0.25),
+    "BAJAR VOLUMEN": (0.6, 0.25),
+}
+# Enfriamiento propio de algunos gestos (el resto usa el de GestureSmoother)
+GESTURE_COOLDOWNS = {
+    "ENCENDIDO": 2.0,   # Un doble disparo apagaría y encendería el equipo
+}
+
+
+class GestureSmoother:
+    """
+    Suavizado de gestos por votación en una ventana deslizante, con histéresis.
+
+    Los votos de cada gesto se actualizan al entrar y salir cada fotograma de
+    la ventana, así que update() es O(1). Un gesto se activa (y dispara) en
+    cuanto reúne 'threshold' votos, sin esperar a que se llene la ventana, y
+    sigue activo mientras conserve al menos 'release' votos: mantenerlo no
+    vuelve a dispararlo salvo que esté en 'repeat'.
+
+    Args:
+        window (int): Fotogramas de la ventana de votación.
+        threshold (int): Votos para activar un gesto.
+        release (int, opcional): Votos por debajo de los cuales se suelta el
+            gesto activo. Por defecto threshold - 2.
+        cooldown (float): Segundos mínimos entre dos disparos del mismo gesto.
+        cooldowns (dict, opcional): Enfriamiento por gesto (GESTURE_COOLDOWNS).
+        repeat (dict, opcional): gesto -> (retardo, intervalo) para repetir
+            mientras se mantiene (REPEAT_GESTURES).
+    """
+
+    def __init__(self, window=7, threshold=5, release=None, cooldown=0.8,
+                 cooldowns=None, repeat=None, clock=time.time):
+        self.window = deque()
+        self.size = window
+        self.threshold = threshold
+        self.release = max(threshold - 2, 1) if release is None else release
+        self.cooldown = cooldown
+        self.cooldowns = GESTURE_COOLDOWNS if cooldowns is None else cooldowns
+        self.repeat = REPEAT_GESTURES if repeat is None else repeat
+        self.clock = clock
+
+        self.votes = {}
+        self.active = None
+        self.last_fired = {}    # gesto -> instante del último disparo
+        self._pending = False   # Activo pero aún en enfriamiento
+        self._next_repeat = None
+
+    def confidence(self, gesture):
+        """Fracción de la ventana que vota por 'gesture'."""
+        return self.votes.get(gesture, 0) / self.size
+
+    def reset(self):
+        self.window.clear()
+        self.votes.clear()
+        self.active = None
+        self._pending = False
+        self._next_repeat = None
+
+    def update(self, gesture, now=None):
+        """
+        Añade el gesto crudo de un fotograma.
+
+        Returns:
+            tuple: (gesto a mostrar, gesto disparado o None)
+        """
+        votes = self.votes
+        window = self.window
+        if len(window) == self.size:
+            votes[window.popleft()] -= 1
+        window.append(gesture)
+        count = votes.get(gesture, 0) + 1
+        votes[gesture] = count
+
+        active = self.active
+        if active is not None and votes[active] < self.release:
+            active = self.active = None
+        # Solo el gesto recién añadido puede haber alcanzado el umbral
+        if gesture != active and count >= self.threshold:
+            active = self.active = gesture
+            self._pending = gesture != "NINGUNO"
+            self._next_repeat = None
+
+        if active is None or active == "NINGUNO":
+            return ("..." if active is None else active), None
+
+        now = self.clock() if now is None else now
+        if self._pending:
+            last = self.last_fired.get(active)
+            if last is not None and now - last < self.cooldowns.get(active, self.cooldown):
+                return active, None
+            self._pending = False
+            return active, self._fire(active, now)
+
+        if self._next_repeat is not None and now >= self._next_repeat:
+            return active, self._fire(active, now)
+        return active, None
+
+    def _fire(self, gesture, now):
+        self.last_fired[gesture] = now
+        repeat = self.repeat.get(gesture)
+        if repeat:
+            delay, interval = repeat
+            if self._next_repeat is None:
+                self._next_repeat = now + delay
+            else:
+                self._next_repeat += interval
+                # Tras un fotograma lento no se recuperan las repeticiones perdidas
+                if self._next_repeat <= now:
+                    self._next_repeat = now + interval
+        return gesture
+
+
+# --- Comandos IR ---
+# Parecido mínimo (difflib) para aceptar un nombre de comando como alias
+ALIAS_FUZZY_CUTOFF = 0.85
+
+
+def normalize_command_name(name):
+    """'Vol_Up', 'VOL UP' y 'vol.up' -> 'volup' (se conservan '+' y '-')."""
+    return ''.join(c for c in name.lower() if c.isalnum() or c in '+-')
+
+
+# Palabras que indican el sentido de un botón; el parecido difuso no puede
+# cruzar de un sentido al otro (Vol+ nunca es Vol-)
+_DIRECTION_TOKENS = {
+    '+': 1, 'up': 1, 'plus': 1, 'next': 1,
+    '-': -1, 'down': -1, 'dn': -1, 'minus': -1, 'prev': -1, 'previous': -1,
+}
+_NAME_TOKEN_RE = re.compile(r"[A-Z]?[a-z]+|[A-Z]+(?![a-z])|\d+|[+-]")
+
+
+def command_direction(name):
+    """1 (subir/siguiente), -1 (bajar/anterior) o None según el nombre del botón."""
+    for token in _NAME_TOKEN_RE.findall(name):
+        direction = _DIRECTION_TOKENS.get(token.lower())
+        if direction is not None:
+            return direction
+    return None
+
+
+def resolve_ir_command(ir_commands, gesture_name):
+    """
+    Comando IR (por nombre) que corresponde al gesto.
+
+    Se prueba, por orden de alias: nombre exacto, nombre normalizado
+    (sin mayúsculas ni separadores) y, si nada coincide, el nombre más
+    parecido a algún alias con el mismo sentido (ver command_direction).
+    """
+    aliases = GESTURE_TO_IR_NAMES.get(gesture_name, [])
+
+    for name in aliases:
+        if name in ir_commands:
+            return ir_commands[name]
+
+    by_normalized = {}
+    for name, cmd in ir_commands.items():
+        by_normalized.setdefault(normalize_command_name(name), cmd)
+    for name in aliases:
+        cmd = by_normalized.get(normalize_command_name(name))
+        if cmd is not None:
+            return cmd
+
+    for name in aliases:
+        direction = command_direction(name)
+        for close in difflib.get_close_matches(normalize_command_name(name), by_normalized,
+                                               n=len(by_normalized), cutoff=ALIAS_FUZZY_CUTOFF):
+            cmd = by_normalized[close]
+            if command_direction(cmd.name) == direction:
+                return cmd
+
+    return None
+
+
+def compile_dispatch_table(ir_commands):
+    """
+    Tabla gesto -> (comando IR, IRMessage/RawMessage listo para enviar) de un
+    dispositivo.
+
+    Se construye una vez al cargar el dispositivo; después cada gesto es una
+    sola consulta al diccionario. Los gestos sin comando no aparecen, y los
+    comandos que resuelven a la misma señal comparten el mensaje compilado.
+    """
+    table = {}
+    compiled = {}
+    for gesture_name in GESTURE_TO_IR_NAMES:
+        ir_cmd = resolve_ir_command(ir_commands, gesture_name)
+        if ir_cmd is None:
+            continue
+        message = build_serial_command(ir_cmd)
+        table[gesture_name] = (ir_cmd, compiled.setdefault(message, message))
+    return table
+
+
+def build_serial_command(ir_cmd):
+    """
+    Comando para el ESP32 (ver ir_protocol): SerialLink lo envía como trama
+    binaria con ACK o como texto !PROTOCOLO:DIRECCION:COMANDO según el firmware.
+    Las señales raw se comprimen y se envían en varias tramas.
+
+    Los protocolos que el firmware solo aproxima se codifican aquí a tiempos
+    (ir_encoder) y se envían como raw, con el texto aproximado como alternativa
+    para firmware sin soporte raw.
+    """
+    if ir_cmd.is_raw:
+        return RawMessage(ir_cmd.data or (), ir_cmd.frequency, ir_cmd.name)
+    # (dirección y comando ya vienen decodificados a enteros por el parser)
+    message = IRMessage(ir_cmd.protocol, ir_cmd.address, ir_cmd.command)
+    if firmware_approximates(ir_cmd.protocol, ir_cmd.command):
+        frequency, timings = encode(ir_cmd.protocol, ir_cmd.address, ir_cmd.command)
+        return RawMessage(timings, frequency, ir_cmd.name, text=message.text)
+    return message
+
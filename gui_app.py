@@ -1,25 +1,54 @@
 import sys
-import cv2
 import time
-import serial
-import mediapipe as mp
 import os
 from PyQt6.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout, 
                              QHBoxLayout, QLabel, QPushButton, QFileDialog, 
-                             QTableWidget, QTableWidgetItem, QHeaderView, QTextEdit,
-                             QTreeView, QSplitter, QLineEdit, QFrame, QListWidget,
-                             QListWidgetItem, QStackedWidget)
-from PyQt6.QtCore import Qt, QThread, pyqtSignal, pyqtSlot, QDir, QSortFilterProxyModel, QTimer
-from PyQt6.QtGui import QImage, QPixmap, QFileSystemModel, QFont, QPalette, QColor
+                             QTableView, QHeaderView, QTextEdit,
+                             QTreeView, QSplitter, QLineEdit, QListWidget,
+                             QListWidgetItem, QStackedWidget, QComboBox)
+from PyQt6.QtCore import Qt, QThread, pyqtSignal, pyqtSlot, QEvent, QTimer, QModelIndex
+from PyQt6.QtGui import QImage, QPainter, QColor
 
-# Import the parser
-from irdb_parser import parse_ir_file
+# Índice persistente de archivos IR y buscador de dispositivos
+from irdb_index import IRDBIndex
+from irdb_search import DeviceSearch, describe_key
+
+# Modelos Qt de las vistas (árbol de dispositivos y tabla de comandos)
+from gui_models import CommandFilterModel, CommandTableModel, DeviceTreeModel
+
+# Métricas del pipeline y del arranque (las etapas de video, que necesitan
+# OpenCV y MediaPipe, se importan en el hilo de video: ver load_video_modules)
+from pipeline_metrics import (STARTUP_BENCHMARK_ENV, PipelineMetrics, StartupTimeline,
+                              format_summary)
+
+# Lógica de gestos (sin dependencias de Qt)
+from code_sweep import CodeSweep, describe_result, gather_sweep_codes
+from gestures import compile_dispatch_table
+from serial_link import SerialLink
+from sessions import SessionManager, make_sessions
+
+# Cada cuánto se publican las métricas del pipeline en la UI (segundos)
+METRICS_INTERVAL = 1.0
+
+# Mientras se indexa, el árbol se recarga como mucho cada tanto (ms)
+TREE_REFRESH_INTERVAL_MS = 2000
 
 # --- Configuración ---
-SERIAL_PORT = '/dev/ttyUSB0'
+# Puerto fijo del ESP32 (None = detectarlo). Un puerto fijo se acepta aunque el
+# firmware sea anterior al handshake (solo comandos de texto)
+SERIAL_PORT = None
 BAUD_RATE = 115200
 CAMERA_INDEX = 0
 
+# Inferencia adaptativa: menos resolución/frecuencia sin mano, complejidad 0 si no da tiempo
+ADAPTIVE_INFERENCE = True
+
+# Sesiones de control: cada una con su mano/zona y su dispositivo IR.
+# 'zones' divide la imagen en SESSION_COUNT franjas verticales; 'hands' usa la
+# mano derecha y la izquierda (máximo 2). Con 1 sesión, una mano controla un dispositivo.
+SESSION_MODE = 'zones'
+SESSION_COUNT = 1
+
 # --- Tema Claro ---
 LIGHT_STYLE = """
 QMainWindow {
@@ -91,16 +120,16 @@ QTextEdit {
     font-family: 'Consolas', monospace;
     font-size: 12px;
 }
-QTableWidget {
+QTableView {
     background-color: #ffffff;
     border: 1px solid #dfe6e9;
     border-radius: 8px;
     gridline-color: #dfe6e9;
 }
-QTableWidget::item {
+QTableView::item {
     padding: 8px;
 }
-QTableWidget::item:alternate {
+QTableView::item:alternate {
     background-color: #f8f9fa;
 }
 QHeaderView::section {
@@ -146,285 +175,288 @@ QScrollBar::add-line:vertical, QScrollBar::sub-line:vertical {
 }
 """
 
-# --- Mapeo de Gestos a Comandos ---
-GESTURE_TO_IR_NAMES = {
-    "ENCENDIDO": ["Power", "power", "POWER", "On", "Off", "On/Off"],
-    "SILENCIAR": ["Mute", "mute", "MUTE", "Silence", "A/V_Mute"],
-    "SUBIR VOLUMEN": ["Vol_up", "Vol+", "Volume_up", "Volume+", "vol_up", "VOL_UP", "VOL+"],
-    "BAJAR VOLUMEN": ["Vol_dn", "Vol-", "Volume_down", "Volume-", "vol_dn", "VOL_DN", "Vol_down", "VOL-"],
-    "CANAL SIGUIENTE": ["Ch_next", "Ch+", "Channel_up", "Channel+", "ch_next", "CH_NEXT", "Up"],
-    "CANAL ANTERIOR": ["Ch_prev", "Ch-", "Channel_down", "Channel-", "ch_prev", "CH_PREV", "Down"],
-    "FUENTE": ["Source", "source", "SOURCE", "Input", "input", "INPUT", "Hdmi_1", "HDMI"]
-}
-
-# --- Lógica de Gestos ---
-mp_hands = mp.solutions.hands
-mp_drawing = mp.solutions.drawing_utils
-
-def get_euclidean_distance(p1, p2):
-    return math.sqrt((p1.x - p2.x)**2 + (p1.y - p2.y)**2)
-
-def is_finger_extended(landmarks, finger_tip_idx, finger_pip_idx, wrist_idx=0):
-    """
-    Comprobación robusta: El dedo está extendido si la punta está más lejos de la muñeca que la articulación PIP.
-    Funciona independientemente de la rotación de la mano.
-    """
-    wrist = landmarks[wrist_idx]
-    tip = landmarks[finger_tip_idx]
-    pip = landmarks[finger_pip_idx]
-    
-    return get_euclidean_distance(tip, wrist) > get_euclidean_distance(pip, wrist) * 1.1
-
-def count_fingers_robust(landmarks):
-    """Cuenta los dedos extendidos (Índice, Medio, Anular, Meñique) usando lógica de distancia."""
-    # Tips: 8, 12, 16, 20. PIPs: 6, 10, 14, 18
-    tips = [8, 12, 16, 20]
-    pips = [6, 10, 14, 18]
-    count = 0
-    for tip, pip in zip(tips, pips):
-        if is_finger_extended(landmarks, tip, pip):
-            count += 1
-    return count
-
-def get_gesture_robust(landmarks):
-    import math
-    
-    # 1. Analizar Dedos
-    fingers_up = count_fingers_robust(landmarks)
-    
-    # 2. Analizar Pulgar
-    # El pulgar es complicado. Comprobamos si la punta está 'lejos' de la base del índice (MCP)
-    # y si el ángulo sugiere 'Arriba' o 'Abajo' relativo a la mano.
-    wrist = landmarks[0]
-    thumb_tip = landmarks[4]
-    thumb_ip = landmarks[3]
-    index_mcp = landmarks[5]
-    
-    # Comprobación de Extensión del Pulgar
-    thumb_extended = get_euclidean_distance(thumb_tip, index_mcp) > 0.15
-    
-    # Total de dedos efectivos
-    total_fingers = fingers_up + (1 if thumb_extended else 0)
-    
-    # --- Árbol de Lógica ---
-    # Detecta: Encendido (5), Mute (0), Vol+/- (Pulgar), Canal+/- (Índice), Fuente (3)
-    
-    # 1. Palma Abierta (Encender)
-    if total_fingers == 5:
-        return "ENCENDIDO"
-        
-    # 2. Puño / Gestos con Pulgar (0 dedos arriba)
-    if fingers_up == 0:
-        # Comprobar Orientación del Pulgar
-        # Vector desde Muñeca a Punta del Pulgar
-        dy = thumb_tip.y - wrist.y
-        dx = thumb_tip.x - wrist.x
-        
-        # Si el pulgar está extendido significativamente
-        if thumb_extended:
-            # Comprobación de ángulo: -90 es Arriba, +90 es Abajo (en coords de imagen y aumenta hacia abajo)
-            # Pero más simple: comparar Y relativo a otros nudillos
-            
-            # Pulgar Arriba: La punta está significativamente arriba de IP y MCP del Índice
-            if thumb_tip.y < thumb_ip.y and thumb_tip.y < index_mcp.y:
-                return "SUBIR VOLUMEN"
-            
-            # Pulgar Abajo: La punta está significativamente abajo de IP y MCP del Índice
-            if thumb_tip.y > thumb_ip.y and thumb_tip.y > index_mcp.y:
-                return "BAJAR VOLUMEN"
-                
-        return "SILENCIAR" # Puño Cerrado
-        
-    # 3. Apuntando (1 dedo: Índice)
-    if fingers_up == 1 and is_finger_extended(landmarks, 8, 6):
-        # Comprobar si apunta a Izquierda o Derecha
-        index_tip = landmarks[8]
-        index_pip = landmarks[6]
-        
-        # Umbral para apuntar horizontalmente
-        if abs(index_tip.x - index_pip.x) > 0.05:
-            if index_tip.x < index_pip.x: # Izquierda (en pantalla)
-                return "CANAL ANTERIOR"
-            else:
-                return "CANAL SIGUIENTE"
-        
-        # If vertical
-        # Apuntando verticalmente (por defecto Siguiente)
-        return "CANAL SIGUIENTE"
-    
-    if fingers_up == 2:
-        return "CANAL ANTERIOR"
-        
-    if fingers_up == 3:
-        return "FUENTE"
-        
-    if fingers_up == 4:
-        return "ENCENDIDO" # Alternativa para 4 dedos
+# --- Módulos de video (carga diferida) ---
+# OpenCV y MediaPipe tardan en importarse; se cargan en el hilo de video para
+# que la ventana aparezca antes
+cv2 = None
+mp_hands = None
+mp_drawing = None
 
-    return "NINGUNO"
 
-from collections import deque
-import math
+def load_video_modules():
+    """Importa OpenCV, MediaPipe y las etapas del pipeline (lento; fuera del hilo de la UI)."""
+    global cv2, mp_hands, mp_drawing
+    import cv2
+    import mediapipe as mp
+    mp_hands = mp.solutions.hands
+    mp_drawing = mp.solutions.drawing_utils
 
 # --- Hilo de Video ---
 class VideoThread(QThread):
-    change_pixmap_signal = pyqtSignal(QImage)
-    gesture_signal = pyqtSignal(str)
-    send_serial_signal = pyqtSignal(str)
+    change_pixmap_signal = pyqtSignal(QImage, object)  # (imagen, buffer del FrameRing)
+    gesture_signal = pyqtSignal(object, str)  # (sesión, gesto disparado)
+    send_serial_signal = pyqtSignal(object, object)  # (str o mensaje IR, canal)
     serial_response_signal = pyqtSignal(str)
     connection_status_signal = pyqtSignal(bool)
+    metrics_signal = pyqtSignal(object)
+    progress_signal = pyqtSignal(str)
+    sweep_progress_signal = pyqtSignal(object, object, int)  # (CodeSweep, SweepCode, total)
+    sweep_finished_signal = pyqtSignal(object, object)  # (CodeSweep, resultado de stop())
 
     def __init__(self):
         super().__init__()
-        self._run_flag = True
-        self.ser = None
-        self.last_reconnect_attempt = 0
-        self.RECONNECT_INTERVAL = 5.0
         self.send_serial_signal.connect(self.send_serial)
         
-        self.gesture_buffer = deque(maxlen=7)
-
-    def try_connect(self):
-        """Intenta auto-descubrir y conectar al puerto serial"""
-        if self.ser is not None:
-            return True
-            
-        import serial.tools.list_ports
-        ports = serial.tools.list_ports.comports()
+        # Suavizado y enfriamiento propios por sesión (respuesta ligeramente más rápida)
+        self.sessions = SessionManager(make_sessions(SESSION_MODE, SESSION_COUNT,
+                                                     window=7, threshold=5, cooldown=0.8))
         
-        candidate_ports = [p.device for p in ports if 'USB' in p.description or 'ACM' in p.description or 'USB' in p.device or 'ACM' in p.device]
+        # Instrumentación por etapa
+        self.metrics = PipelineMetrics()
         
-        if not candidate_ports:
-            candidate_ports = [p.device for p in ports]
-            
-        print(f"Buscando ESP32 en: {candidate_ports}")
-        
-        for port in candidate_ports:
-            try:
-                print(f"Intentando conectar a {port}...")
-                self.ser = serial.Serial(port, BAUD_RATE, timeout=1)
-                time.sleep(2) 
-                
-                
-                print(f"¡Conectado exitosamente a {port}!")
-                self.connection_status_signal.emit(True)
-                return True
-            except Exception as e:
-                print(f"Falló conexión a {port}: {e}")
-                if self.ser:
-                    self.ser.close()
-                self.ser = None
-        
-        self.connection_status_signal.emit(False)
-        return False
+        # E/S serial en su propio hilo: nunca bloquea el procesamiento de video
+        self.link = SerialLink(BAUD_RATE, device=SERIAL_PORT,
+                               on_line=self.serial_response_signal.emit,
+                               on_status=self.connection_status_signal.emit,
+                               metrics=self.metrics)
+        
+        # No renderizar si la vista no se ve
+        self.render_enabled = True
+        
+        # Motor de captura/inferencia y etapa de render: se crean en run(),
+        # después de importar los módulos de video
+        self.engine = None
+        self.frame_ring = None
+        self.render_slot = None
+        self._stop_requested = False
+        
+        # Barrido de códigos en curso (ver code_sweep)
+        self.sweep = None
 
-    @pyqtSlot(str)
-    def send_serial(self, command):
-        if self.ser:
-            try:
-                self.ser.write(command.encode())
-                self.ser.flush() # Asegurar que se envía inmediatamente
-            except Exception as e:
-                print(f"Error enviando serial: {e}")
+    @property
+    def last_gesture_latency(self):
+        return self.engine.last_gesture_latency if self.engine else None
+
+    @pyqtSlot(object, object)
+    def send_serial(self, command, channel=None):
+        self.link.send(command, channel=channel)
 
     def run(self):
-        cap = cv2.VideoCapture(CAMERA_INDEX)
-        
-        hands = mp_hands.Hands(
-            model_complexity=1, 
-            min_detection_confidence=0.8,
-            min_tracking_confidence=0.5,
-            max_num_hands=1
-        )
-        
-        last_sent_time = 0
-        SEND_COOLDOWN = 0.8 # Respuesta ligeramente más rápida
-
-        # Intento de conexión inicial (en hilo, para no bloquear UI)
-        self.try_connect()
-
-        while self._run_flag:
-            success, image = cap.read()
-            if not success:
-                continue
-
-            image = cv2.flip(image, 1)
-            image_rgb = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
-            results = hands.process(image_rgb)
-
-            current_gesture = "NINGUNO"
-            display_gesture = "..."
-
-            if results.multi_hand_landmarks:
-                for hand_landmarks in results.multi_hand_landmarks:
-                    mp_drawing.draw_landmarks(
-                        image_rgb,
-                        hand_landmarks,
-                        mp_hands.HAND_CONNECTIONS)
-                    
-                    # Obtener gesto crudo de la geometría
-                    current_gesture = get_gesture_robust(hand_landmarks.landmark)
-            
-            # --- Suavizado / Debouncing ---
-            self.gesture_buffer.append(current_gesture)
-            
-            # Encontrar gesto más común en buffer
-            from collections import Counter
-            if len(self.gesture_buffer) == self.gesture_buffer.maxlen:
-                most_common, count = Counter(self.gesture_buffer).most_common(1)[0]
-                
-                # Umbral de confianza: 5 de 7 frames deben coincidir
-                if count >= 5:
-                    display_gesture = most_common
-                    
-                    # Solo enviar si es un comando válido y pasó el enfriamiento
-                    if display_gesture != "NINGUNO" and (time.time() - last_sent_time > SEND_COOLDOWN):
-                        self.gesture_signal.emit(display_gesture)
-                        last_sent_time = time.time()
-                        # Limpiar buffer para evitar doble disparo
-                        self.gesture_buffer.clear()
-
-            # Superposición UI
-            cv2.putText(image_rgb, f"Gesto: {display_gesture}", (10, 50), 
+        self.progress_signal.emit("Cargando OpenCV y MediaPipe...")
+        with self.metrics.time('startup_imports'):
+            load_video_modules()
+            from gesture_engine import GestureEngine
+            from video_pipeline import FrameRing, LatestSlot, SlotWorker
+        
+        # Buffers de display reutilizados
+        self.frame_ring = FrameRing(640, 480)
+        self.render_slot = LatestSlot()
+        
+        # Captura, inferencia y envío (compartido con el modo headless)
+        self.engine = GestureEngine(self.sessions, self.link, self.metrics,
+                                    camera_index=CAMERA_INDEX, adaptive=ADAPTIVE_INFERENCE,
+                                    on_frame=self.queue_render,
+                                    on_gesture=self.gesture_signal.emit,
+                                    on_metrics=self.metrics_signal.emit,
+                                    metrics_interval=METRICS_INTERVAL,
+                                    on_progress=self.progress_signal.emit)
+        self.engine.sweep = self.sweep
+        if self._stop_requested:
+            return
+        
+        # El dibujo y la conversión a QImage van en su propia etapa; la
+        # inferencia solo deja el fotograma en el buzón
+        render = SlotWorker(self.render_slot, self.render_frame)
+        render.start()
+        self.engine.run()
+        render.stop()
+
+    def queue_render(self, image_rgb, multi_hand_landmarks, overlay):
+        if self.render_slot.put((image_rgb, multi_hand_landmarks, overlay)):
+            self.metrics.count('render_dropped')
+
+    def start_recording(self, path):
+        """Empezar a grabar los landmarks de cada fotograma en 'path' (.lmk)"""
+        self.engine.start_recording(path)
+
+    def start_sweep(self, codes):
+        """Enviar 'codes' uno tras otro hasta que un gesto (o stop_sweep) lo detenga"""
+        self.stop_sweep()
+        # Las señales llevan el barrido que las emite: las de uno ya
+        # reemplazado llegan tarde y la UI las ignora
+        sweep = CodeSweep(self.link, codes)
+        sweep.on_progress = lambda code, total: self.sweep_progress_signal.emit(sweep, code, total)
+        sweep.on_finished = lambda result: self.sweep_finished_signal.emit(sweep, result)
+        self.sweep = sweep
+        if self.engine:
+            self.engine.sweep = self.sweep
+        self.sweep.start()
+
+    def stop_sweep(self):
+        if self.sweep is not None:
+            self.sweep.stop()
+
+    def stop_recording(self):
+        """Terminar la grabación. Devuelve el número de fotogramas grabados."""
+        return self.engine.stop_recording() if self.engine else 0
+
+    def render_frame(self, job):
+        """Etapa de render: dibujar landmarks y gesto, y enviar el QImage a la UI"""
+        if not self.render_enabled:
+            return
+        image_rgb, multi_hand_landmarks, overlay = job
+        render_start = time.perf_counter()
+        
+        # Redimensionar primero (en un buffer preasignado) y dibujar sobre la
+        # imagen pequeña: menos píxeles que dibujar y ninguna asignación nueva
+        display = self.frame_ring.resize_into(image_rgb)
+        if display is None:
+            # La UI aún muestra todos los buffers: saltar este fotograma
+            self.metrics.count('frames_render_skipped')
+            return
+        
+        if multi_hand_landmarks:
+            for hand_landmarks in multi_hand_landmarks:
+                mp_drawing.draw_landmarks(
+                    display,
+                    hand_landmarks,
+                    mp_hands.HAND_CONNECTIONS)
+
+        # Superposición UI: gesto de cada sesión (y límites de las zonas)
+        h, w = display.shape[:2]
+        if len(overlay) == 1:
+            cv2.putText(display, f"Gesto: {overlay[0][1]}", (10, 50), 
                         cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 0), 2, cv2.LINE_AA)
-
-            h, w, ch = image_rgb.shape
-            bytes_per_line = ch * w
-            convert_to_Qt_format = QImage(image_rgb.data, w, h, bytes_per_line, QImage.Format.Format_RGB888)
-            p = convert_to_Qt_format.scaled(640, 480, Qt.AspectRatioMode.KeepAspectRatio)
-            self.change_pixmap_signal.emit(p)
-            
-            # Leer respuestas ESP32
-            if self.ser and self.ser.in_waiting > 0:
-                try:
-                    response = self.ser.readline().decode('utf-8').strip()
-                    if response:
-                        self.serial_response_signal.emit(response)
-                except Exception:
-                    self.ser = None
-                    self.connection_status_signal.emit(False)
-            
-            # Auto-reconectar
-            if self.ser is None and (time.time() - self.last_reconnect_attempt > self.RECONNECT_INTERVAL):
-                self.last_reconnect_attempt = time.time()
-                self.try_connect()
-
-        cap.release()
-        if self.ser:
-            self.ser.close()
+        else:
+            for i, (name, gesture) in enumerate(overlay):
+                cv2.putText(display, f"{name}: {gesture}", (10, 30 + 28 * i),
+                            cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 0), 2, cv2.LINE_AA)
+            for session in self.sessions.sessions[1:]:
+                if session.handedness is None:
+                    x = int(session.zone[0] * w)
+                    cv2.line(display, (x, 0), (x, h), (255, 255, 0), 1)
+
+        # QImage sobre el buffer del anillo, sin copiar los píxeles; la vista
+        # devuelve el buffer al anillo (FrameRing.release) al dejar de mostrarlo
+        ch = display.shape[2]
+        qt_image = QImage(display.data, w, h, ch * w, QImage.Format.Format_RGB888)
+        self.metrics.record('render', time.perf_counter() - render_start)
+        self.change_pixmap_signal.emit(qt_image, display)
 
     def stop(self):
-        self._run_flag = False
+        self._stop_requested = True
+        self.stop_sweep()
+        if self.engine:
+            self.engine.stop()
         self.wait()
 
+class IndexLoader(QThread):
+    """
+    Actualiza el índice del IRDB y construye el buscador en segundo plano,
+    con su propia conexión SQLite (las conexiones no se comparten entre hilos).
+    """
+    progress_signal = pyqtSignal(int, int)  # (procesados, actualizados), tras cada commit
+    loaded_signal = pyqtSignal(object, int, int)  # (DeviceSearch, actualizados, eliminados)
+
+    class Interrupted(Exception):
+        pass
+
+    def run(self):
+        ir_index = IRDBIndex()
+        try:
+            updated, removed = ir_index.update(progress=self._progress)
+            search = DeviceSearch.from_index(ir_index)
+        except IndexLoader.Interrupted:
+            return
+        finally:
+            ir_index.close()
+        self.loaded_signal.emit(search, updated, removed)
+
+    def _progress(self, processed, updated):
+        if self.isInterruptionRequested():
+            raise IndexLoader.Interrupted()
+        self.progress_signal.emit(processed, updated)
+
+class SweepCodeLoader(QThread):
+    """
+    Reúne los códigos del barrido (gather_sweep_codes) en segundo plano, con
+    su propia conexión SQLite: en un IRDB grande la consulta tarda.
+    """
+    loaded_signal = pyqtSignal(object)  # lista de SweepCode
+
+    def run(self):
+        ir_index = IRDBIndex()
+        try:
+            codes = gather_sweep_codes(ir_index)
+        finally:
+            ir_index.close()
+        self.loaded_signal.emit(codes)
+
+class VideoView(QWidget):
+    """
+    Vista del video que pinta el QImage recibido directamente con QPainter,
+    sin convertirlo antes a QPixmap.
+    """
+    visibility_changed = pyqtSignal(bool)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.image = None
+        self.buffer = None  # memoria de 'image' (buffer del FrameRing)
+        self.placeholder = ""
+        self.setAttribute(Qt.WidgetAttribute.WA_OpaquePaintEvent)
+
+    def set_frame(self, image, buffer=None):
+        """Mostrar 'image'; devuelve el buffer de la imagen anterior, ya sin usar."""
+        previous = self.buffer
+        self.image, self.buffer = image, buffer
+        self.update()
+        return previous
+
+    def setText(self, text):
+        self.placeholder = text
+        self.update()
+
+    def paintEvent(self, event):
+        painter = QPainter(self)
+        painter.fillRect(self.rect(), QColor("#16213e"))
+        if self.image is None:
+            painter.setPen(QColor("#dfe6e9"))
+            painter.drawText(self.rect(), Qt.AlignmentFlag.AlignCenter, self.placeholder)
+        else:
+            # Centrar la imagen sin reescalarla (ya viene al tamaño de display)
+            x = (self.width() - self.image.width()) // 2
+            y = (self.height() - self.image.height()) // 2
+            painter.drawImage(x, y, self.image)
+        painter.end()
+
+    def showEvent(self, event):
+        super().showEvent(event)
+        self.visibility_changed.emit(True)
+
+    def hideEvent(self, event):
+        super().hideEvent(event)
+        self.visibility_changed.emit(False)
+
 class MainWindow(QMainWindow):
-    def __init__(self):
+    def __init__(self, timeline=None):
         super().__init__()
+        # Marcas del arranque (primer fotograma, búsqueda lista...)
+        self.timeline = timeline or StartupTimeline()
+
         self.setWindowTitle("Control IR por Gestos")
         self.resize(1300, 750)
         
-        # Guardar comandos IR cargados
+        # Comandos IR del último dispositivo cargado (tabla de la derecha);
+        # la tabla gesto -> comando vive en la sesión a la que se asignó
         self.ir_commands = {}
+
+        # Índice persistente: evita re-analizar los .ir en cada clic. Abrirlo
+        # es inmediato; la actualización va en segundo plano (IndexLoader)
+        self.ir_index = IRDBIndex()
+        
+        # Buscador en memoria (lo construye IndexLoader; None hasta entonces)
+        self.device_search = None
         
         # Todos los archivos IR para búsqueda
         self.all_ir_files = []
@@ -455,29 +487,27 @@ class MainWindow(QMainWindow):
         self.search_box.setPlaceholderText("Buscar dispositivo (ej: Samsung, Epson...)")
         self.search_box.textChanged.connect(self.filter_files)
         file_browser_layout.addWidget(self.search_box)
-
-        # --- Vista de Árbol con Búsqueda ---
-        self.file_model = QFileSystemModel()
-        self.file_model.setRootPath(os.path.abspath("./IRDB"))
-        self.file_model.setNameFilters(["*.ir"])
-        self.file_model.setNameFilterDisables(False)
-        
-        self.proxy_model = QSortFilterProxyModel()
-        self.proxy_model.setSourceModel(self.file_model)
-        self.proxy_model.setRecursiveFilteringEnabled(True)
-        self.proxy_model.setFilterCaseSensitivity(Qt.CaseSensitivity.CaseInsensitive)
         
+        # Progreso de la indexación en segundo plano
+        self.index_status = QLabel("Indexando IRDB...")
+        self.index_status.setStyleSheet("color: #636e72; font-size: 11px;")
+        file_browser_layout.addWidget(self.index_status)
+
+        # --- Vista de Árbol (el modelo se crea tras mostrar la ventana) ---
+        self.file_model = None
         self.tree_view = QTreeView()
-        self.tree_view.setModel(self.proxy_model)
-        self.tree_view.setRootIndex(self.proxy_model.mapFromSource(self.file_model.index(os.path.abspath("./IRDB"))))
-        
-        # Ocultar columnas excepto Nombre
         self.tree_view.setHeaderHidden(True)
-        for i in range(1, 4):
-            self.tree_view.setColumnHidden(i, True)
-            
         self.tree_view.clicked.connect(self.on_tree_clicked)
-        file_browser_layout.addWidget(self.tree_view)
+        
+        # --- Lista de Resultados de Búsqueda ---
+        self.search_results = QListWidget()
+        self.search_results.itemClicked.connect(self.on_search_result_clicked)
+        
+        # El árbol se muestra sin búsqueda; los resultados, al escribir
+        self.browser_stack = QStackedWidget()
+        self.browser_stack.addWidget(self.tree_view)
+        self.browser_stack.addWidget(self.search_results)
+        file_browser_layout.addWidget(self.browser_stack)
         
         splitter.addWidget(file_browser_widget)
 
@@ -492,12 +522,28 @@ class MainWindow(QMainWindow):
         self.status_label.setObjectName("title")
         video_layout.addWidget(self.status_label)
         
-        self.image_label = QLabel(self)
-        self.image_label.setMinimumSize(640, 480)
-        self.image_label.setText("Iniciando Cámara...")
-        self.image_label.setAlignment(Qt.AlignmentFlag.AlignCenter)
-        self.image_label.setStyleSheet("background-color: #16213e; border-radius: 12px;")
-        video_layout.addWidget(self.image_label)
+        # Métricas del pipeline (FPS, latencias por etapa)
+        metrics_layout = QHBoxLayout()
+        self.metrics_label = QLabel("Métricas: esperando datos...")
+        self.metrics_label.setWordWrap(True)
+        self.metrics_label.setStyleSheet("color: #636e72; font-size: 11px;")
+        metrics_layout.addWidget(self.metrics_label, 1)
+        
+        btn_export_metrics = QPushButton("Exportar métricas")
+        btn_export_metrics.clicked.connect(self.export_metrics)
+        metrics_layout.addWidget(btn_export_metrics)
+        
+        self.btn_record = QPushButton("Grabar landmarks")
+        self.btn_record.setCheckable(True)
+        self.btn_record.setEnabled(False)  # hasta que llegue el primer fotograma
+        self.btn_record.toggled.connect(self.toggle_recording)
+        metrics_layout.addWidget(self.btn_record)
+        video_layout.addLayout(metrics_layout)
+        
+        self.video_view = VideoView(self)
+        self.video_view.setMinimumSize(640, 480)
+        self.video_view.setText("Iniciando...")
+        video_layout.addWidget(self.video_view)
         
         self.gesture_log = QTextEdit()
         self.gesture_log.setReadOnly(True)
@@ -518,10 +564,40 @@ class MainWindow(QMainWindow):
         self.file_label.setWordWrap(True)
         commands_layout.addWidget(self.file_label)
 
-        self.table = QTableWidget()
-        self.table.setColumnCount(3)
-        self.table.setHorizontalHeaderLabels(["Nombre", "Protocolo", "Comando"])
+        # Sesión a la que se asigna el próximo dispositivo (solo con varias sesiones)
+        self.session_combo = QComboBox()
+        commands_layout.addWidget(self.session_combo)
+
+        # Barrido universal: para equipos sin modelo conocido
+        self.btn_sweep = QPushButton("Barrido POWER (IRDB)")
+        self.btn_sweep.setCheckable(True)
+        self.btn_sweep.setToolTip("Envía todos los códigos POWER del IRDB, del más usado al menos; "
+                                  "haz cualquier gesto cuando el equipo reaccione")
+        self.btn_sweep.toggled.connect(self.toggle_sweep)
+        commands_layout.addWidget(self.btn_sweep)
+        self.sweep_label = QLabel()
+        self.sweep_label.setStyleSheet("color: #636e72; font-size: 11px;")
+        self.sweep_label.setVisible(False)
+        commands_layout.addWidget(self.sweep_label)
+
+        # Filtro de la tabla (nombre, protocolo o comando)
+        self.command_filter = QLineEdit()
+        self.command_filter.setPlaceholderText("Filtrar comandos...")
+        commands_layout.addWidget(self.command_filter)
+
+        # Tabla model/view: las celdas se formatean al pintarse
+        self.command_model = CommandTableModel(self)
+        self.command_proxy = CommandFilterModel(self)
+        self.command_proxy.setSourceModel(self.command_model)
+        self.command_filter.textChanged.connect(self.command_proxy.setFilterFixedString)
+
+        self.table = QTableView()
+        self.table.setModel(self.command_proxy)
+        self.table.setSortingEnabled(True)
+        self.table.sortByColumn(-1, Qt.SortOrder.AscendingOrder)  # orden del archivo
+        self.table.verticalHeader().setVisible(False)
         self.table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeMode.Stretch)
+        self.table.setSelectionBehavior(QTableView.SelectionBehavior.SelectRows)
         self.table.setAlternatingRowColors(True)
         commands_layout.addWidget(self.table)
         
@@ -536,37 +612,231 @@ class MainWindow(QMainWindow):
         self.thread.gesture_signal.connect(self.on_gesture_detected)
         self.thread.serial_response_signal.connect(self.on_serial_response)
         self.thread.connection_status_signal.connect(self.on_connection_status)
+        self.thread.metrics_signal.connect(self.on_metrics)
+        self.thread.progress_signal.connect(self.video_view.setText)
+        self.thread.sweep_progress_signal.connect(self.on_sweep_progress)
+        self.thread.sweep_finished_signal.connect(self.on_sweep_finished)
+        self.sweep_loader = SweepCodeLoader()
+        self.sweep_loader.loaded_signal.connect(self.on_sweep_codes_loaded)
+        self.video_view.visibility_changed.connect(self.update_render_enabled)
+        
+        for session in self.thread.sessions.sessions:
+            self.session_combo.addItem(f"Asignar a: {session.name}", session.name)
+        self.session_combo.setVisible(self.session_combo.count() > 1)
+        
+        self.index_loader = IndexLoader()
+        self.tree_updated = 0
+        self.tree_refresh_timer = QTimer(self)
+        self.tree_refresh_timer.setSingleShot(True)
+        self.tree_refresh_timer.setInterval(TREE_REFRESH_INTERVAL_MS)
+        self.tree_refresh_timer.timeout.connect(self.refresh_tree)
+        self.index_loader.progress_signal.connect(self.on_index_progress)
+        self.index_loader.loaded_signal.connect(self.on_index_loaded)
+        
+        # Todo lo lento (modelos, cámara, serial, IRDB) arranca cuando la
+        # ventana ya se ha pintado
+        QTimer.singleShot(0, self.start_background_tasks)
+
+    def start_background_tasks(self):
+        self.startup_mark('event_loop')
         self.thread.start()
+        self.index_loader.start()
+        self.setup_tree_model()
+
+    def setup_tree_model(self):
+        # Árbol leído del índice (sin recorrer ni vigilar la carpeta del IRDB)
+        self.file_model = DeviceTreeModel(self.ir_index, self)
+        self.tree_view.setModel(self.file_model)
+
+    @pyqtSlot(int, int)
+    def on_index_progress(self, processed, updated):
+        self.index_status.setText(f"Indexando IRDB... {processed} archivos")
+        # Lo ya guardado es visible: mostrarlo sin esperar al final (como mucho
+        # una recarga cada TREE_REFRESH_INTERVAL_MS)
+        if updated > self.tree_updated:
+            self.tree_updated = updated
+            if not self.tree_refresh_timer.isActive():
+                self.tree_refresh_timer.start()
+
+    def refresh_tree(self):
+        """Volver a leer el árbol del índice conservando las carpetas abiertas."""
+        model = self.file_model
+        expanded = []
+        parents = [QModelIndex()]
+        while parents:
+            parent = parents.pop()
+            for row in range(model.rowCount(parent)):
+                index = model.index(row, 0, parent)
+                if self.tree_view.isExpanded(index):
+                    expanded.append(model.path_for_index(index))
+                    parents.append(index)
+        model.reload()
+        for path in expanded:
+            index = model.index_for_path(path)
+            if index.isValid():
+                self.tree_view.expand(index)
+
+    @pyqtSlot(object, int, int)
+    def on_index_loaded(self, search, updated, removed):
+        self.device_search = search
+        self.index_status.hide()
+        self.tree_refresh_timer.stop()
+        if updated or removed:
+            # El árbol refleja el índice: volver a leerlo (solo se cargan las ramas que se abran)
+            self.refresh_tree()
+            self.gesture_log.append(f"Índice IRDB actualizado: {updated} archivos nuevos o modificados, "
+                                    f"{removed} eliminados")
+        self.startup_mark('interactive')
+        # Repetir la búsqueda que se escribió mientras se indexaba
+        if self.search_box.text().strip():
+            self.filter_files(self.search_box.text())
+
+    def startup_mark(self, name):
+        """Marca del arranque; en modo benchmark se guardan y se cierra al final."""
+        if not self.timeline.mark(name):
+            return
+        path = os.environ.get(STARTUP_BENCHMARK_ENV)
+        if path:
+            self.timeline.dump_json(path)
+            if self.timeline.has('interactive', 'first_frame'):
+                QTimer.singleShot(0, self.close)
 
     def filter_files(self, text):
-        """Filtrar vista de árbol"""
-        self.proxy_model.setFilterFixedString(text)
-        # Expandir todo si se busca
-        if text:
-            self.tree_view.expandAll()
-        else:
-            self.tree_view.collapseAll()
+        """Buscar dispositivos en el índice invertido y mostrar resultados"""
+        if not text.strip():
+            self.browser_stack.setCurrentWidget(self.tree_view)
+            return
+        
+        self.search_results.clear()
+        self.browser_stack.setCurrentWidget(self.search_results)
+        if self.device_search is None:
+            item = QListWidgetItem("Índice en construcción...")
+            item.setFlags(Qt.ItemFlag.NoItemFlags)
+            self.search_results.addItem(item)
+            return
+        for key in self.device_search.search(text):
+            info = describe_key(key)
+            origin = " / ".join(p for p in (info['category'], info['brand']) if p)
+            item = QListWidgetItem(f"{info['model']}  —  {origin}")
+            item.setData(Qt.ItemDataRole.UserRole, key)
+            self.search_results.addItem(item)
+
+    def on_search_result_clicked(self, item):
+        """Cargar dispositivo elegido en los resultados de búsqueda"""
+        key = item.data(Qt.ItemDataRole.UserRole)
+        if key:
+            self.load_ir_file(self.ir_index.path_for(key))
 
     def on_tree_clicked(self, index):
-        """Manejar clic en nodo del árbol"""
-        source_index = self.proxy_model.mapToSource(index)
-        file_path = self.file_model.filePath(source_index)
-        
-        if os.path.isfile(file_path) and file_path.endswith('.ir'):
-            self.load_ir_file(file_path)
+        """Manejar clic en nodo del árbol (solo los archivos tienen clave)"""
+        key = self.file_model.key_for_index(index)
+        if key:
+            self.load_ir_file(self.ir_index.path_for(key))
 
     @pyqtSlot(bool)
     def on_connection_status(self, connected):
-        if connected and self.thread.ser:
-            self.status_label.setText(f"ESP32 Conectado ({self.thread.ser.port})")
+        if connected and self.thread.link.connected:
+            self.status_label.setText(f"ESP32 Conectado ({self.thread.link.port})")
             self.status_label.setStyleSheet("color: #00ff88;")
         else:
             self.status_label.setText("ESP32 No Conectado (Modo Simulación)")
             self.status_label.setStyleSheet("color: #ff6b6b;")
 
-    @pyqtSlot(QImage)
-    def update_image(self, qt_img):
-        self.image_label.setPixmap(QPixmap.fromImage(qt_img))
+    @pyqtSlot(object)
+    def on_metrics(self, snapshot):
+        self.metrics_label.setText(format_summary(snapshot))
+
+    def export_metrics(self):
+        """Guardar métricas actuales del pipeline en JSON o CSV"""
+        path, _ = QFileDialog.getSaveFileName(
+            self, "Exportar métricas", "metricas.json", "JSON (*.json);;CSV (*.csv)")
+        if not path:
+            return
+        self.thread.metrics.dump(path)
+        self.gesture_log.append(f"📊 Métricas exportadas a {path}")
+
+    def toggle_recording(self, checked):
+        """Iniciar/detener la grabación de landmarks para reproducirlos offline"""
+        if checked:
+            path, _ = QFileDialog.getSaveFileName(
+                self, "Grabar landmarks", "gestos.lmk", "Landmarks (*.lmk)")
+            if not path:
+                self.btn_record.setChecked(False)
+                return
+            self.thread.start_recording(path)
+            self.btn_record.setText("Detener grabación")
+            self.gesture_log.append(f"⏺ Grabando landmarks en {path}")
+        else:
+            frames = self.thread.stop_recording()
+            self.btn_record.setText("Grabar landmarks")
+            if frames:
+                self.gesture_log.append(f"⏹ Grabación terminada ({frames} fotogramas)")
+
+    def toggle_sweep(self, checked):
+        """Iniciar/detener el barrido de códigos POWER de todo el IRDB"""
+        if not checked:
+            sweep = self.thread.sweep
+            if sweep is not None and sweep.running:
+                self.thread.stop_sweep()  # on_sweep_finished restaura el botón
+            else:
+                self.reset_sweep_button()  # aún se estaban reuniendo los códigos
+            return
+        self.btn_sweep.setText("Buscando códigos...")
+        if not self.sweep_loader.isRunning():
+            self.sweep_loader.start()
+
+    @pyqtSlot(object)
+    def on_sweep_codes_loaded(self, codes):
+        if not self.btn_sweep.isChecked():
+            return  # cancelado mientras se reunían
+        if not codes:
+            self.gesture_log.append("🔁 No hay códigos POWER en el índice (¿sigue indexando?)")
+            self.reset_sweep_button()
+            return
+        self.gesture_log.append(f"🔁 Barrido de {len(codes)} códigos POWER: "
+                                "haz cualquier gesto cuando el equipo reaccione")
+        self.btn_sweep.setText("Detener barrido")
+        self.sweep_label.setVisible(True)
+        self.thread.start_sweep(codes)
+
+    @pyqtSlot(object, object, int)
+    def on_sweep_progress(self, sweep, code, total):
+        if sweep is not self.thread.sweep:
+            return
+        self.sweep_label.setText(f"Código {code.index + 1}/{total}: {code.message!r} "
+                                 f"({code.n_files} archivos)")
+
+    @pyqtSlot(object, object)
+    def on_sweep_finished(self, sweep, result):
+        if sweep is not self.thread.sweep:
+            return  # final tardío de un barrido ya reemplazado
+        self.gesture_log.append(f"🔁 {describe_result(result)}")
+        self.reset_sweep_button()
+
+    def reset_sweep_button(self):
+        self.btn_sweep.blockSignals(True)
+        self.btn_sweep.setChecked(False)
+        self.btn_sweep.blockSignals(False)
+        self.btn_sweep.setText("Barrido POWER (IRDB)")
+        self.sweep_label.setVisible(False)
+
+    @pyqtSlot(QImage, object)
+    def update_image(self, qt_img, buffer):
+        previous = self.video_view.set_frame(qt_img, buffer)
+        if previous is not None:
+            self.thread.frame_ring.release(previous)
+        if not self.btn_record.isEnabled():
+            self.btn_record.setEnabled(True)
+            self.startup_mark('first_frame')
+
+    def update_render_enabled(self, *_):
+        """Solo renderizar video si la vista está visible y la ventana no está minimizada"""
+        self.thread.render_enabled = self.video_view.isVisible() and not self.isMinimized()
+
+    def changeEvent(self, event):
+        if event.type() == QEvent.Type.WindowStateChange:
+            self.update_render_enabled()
+        super().changeEvent(event)
 
     @pyqtSlot(str)
     def on_serial_response(self, response):
@@ -575,85 +845,63 @@ class MainWindow(QMainWindow):
         sb = self.gesture_log.verticalScrollBar()
         sb.setValue(sb.maximum())
 
-    @pyqtSlot(str)
-    def on_gesture_detected(self, gesture_name):
-        """Manejar detección de gesto y enviar comando IR"""
-        if not self.ir_commands:
-            self.gesture_log.append(f"<span style='color:#ffaa00;'>{gesture_name}</span> - No hay archivo IR cargado")
+    @pyqtSlot(object, str)
+    def on_gesture_detected(self, session, gesture_name):
+        """Registrar el gesto disparado (el hilo de video ya envió el comando IR)"""
+        prefix = f"[{session.name}] " if len(self.thread.sessions.sessions) > 1 else ""
+        if session.device_name is None:
+            self.gesture_log.append(f"{prefix}<span style='color:#ffaa00;'>{gesture_name}</span> - No hay archivo IR cargado")
             return
             
-        ir_cmd = self.find_ir_command_for_gesture(gesture_name)
-        
-        if ir_cmd:
-            # Ayudante para analizar cadena hex Little Endian de IRDB
-            def parse_ir_hex(hex_str):
-                # "34 12 00 00" -> ["34", "12", "00", "00"]
-                parts = hex_str.strip().split()
-                # Eliminar "00"s finales (pero mantener al menos un byte si todo es 00)
-                while len(parts) > 1 and parts[-1] == "00":
-                    parts.pop()
-                # Invertir para Big Endian (así "34 12" pasa a ser "1234" -> 0x1234)
-                parts.reverse()
-                return "".join(parts)
-
-            # Construir comando extendido: !PROTOCOLO:DIRECCION:COMANDO
-            protocol = ir_cmd.get('protocol', 'NEC')
-            
-            raw_address = ir_cmd.get('address', '00 00 00 00')
-            raw_command = ir_cmd.get('command', '00 00 00 00')
-            
-            address = parse_ir_hex(raw_address)
-            command = parse_ir_hex(raw_command)
-            
-            serial_cmd = f"!{protocol}:{address}:{command}\n"
-            self.thread.send_serial_signal.emit(serial_cmd)
-            
-            self.gesture_log.append(f"<span style='color:#00ff88;'>{gesture_name}</span> → {ir_cmd['name']}")
+        entry = session.dispatch_table.get(gesture_name)
+        
+        if entry:
+            self.gesture_log.append(f"{prefix}<span style='color:#00ff88;'>{gesture_name}</span> → {entry[0].name}")
         else:
-            self.gesture_log.append(f"<span style='color:#ff6b6b;'>{gesture_name}</span> - No hay comando asociado")
+            self.gesture_log.append(f"{prefix}<span style='color:#ff6b6b;'>{gesture_name}</span> - No hay comando asociado")
         
         sb = self.gesture_log.verticalScrollBar()
         sb.setValue(sb.maximum())
 
-    def find_ir_command_for_gesture(self, gesture_name):
-        """Encontrar comando IR que coincida con el gesto"""
-        possible_names = GESTURE_TO_IR_NAMES.get(gesture_name, [])
-        
-        for name in possible_names:
-            if name in self.ir_commands:
-                return self.ir_commands[name]
-        
-        return None
-
     def load_ir_file(self, file_path):
         model_name = os.path.basename(file_path).replace(".ir", "")
         self.file_label.setText(f"{model_name}")
         
+        session = self.thread.sessions.find(self.session_combo.currentData())
+        
         if self.thread.isRunning():
-            self.thread.send_serial_signal.emit(f"#{model_name}\n")
+            self.thread.send_serial_signal.emit(f"#{model_name}\n", session.name)
             
-        commands = parse_ir_file(file_path)
+        # Mientras IndexLoader escribe en el índice, solo leer (sin esperar al bloqueo)
+        commands = self.ir_index.get_commands(file_path, store=not self.index_loader.isRunning())
         
         self.ir_commands = {}
         for cmd in commands:
-            name = cmd.get('name', '')
-            if name:
-                self.ir_commands[name] = cmd
+            if cmd.name:
+                self.ir_commands[cmd.name] = cmd
+        session.set_device(model_name, compile_dispatch_table(self.ir_commands))
         
         self.populate_table(commands)
-        self.gesture_log.append(f"📂 <span style='color:#00d9ff;'>Cargado:</span> {model_name} ({len(commands)} comandos)")
+        target = f" → {session.name}" if self.session_combo.count() > 1 else ""
+        self.gesture_log.append(f"📂 <span style='color:#00d9ff;'>Cargado:</span> {model_name} ({len(commands)} comandos){target}")
+
+        # Modelos con los mismos códigos (el índice guarda cada conjunto una vez)
+        twins = self.ir_index.identical_devices(self.ir_index.key_for(file_path))
+        if twins:
+            names = ", ".join(os.path.basename(k).replace(".ir", "") for k in twins[:5])
+            more = f" y {len(twins) - 5} más" if len(twins) > 5 else ""
+            self.gesture_log.append(f"   Mismos códigos que: {names}{more}")
 
     def populate_table(self, commands):
-        self.table.setRowCount(0)
-        for cmd in commands:
-            row = self.table.rowCount()
-            self.table.insertRow(row)
-            self.table.setItem(row, 0, QTableWidgetItem(cmd.get('name', '')))
-            self.table.setItem(row, 1, QTableWidgetItem(cmd.get('protocol', '')))
-            self.table.setItem(row, 2, QTableWidgetItem(cmd.get('command', '')))
+        # Un solo reset del modelo por dispositivo
+        self.command_model.set_commands(commands)
 
     def closeEvent(self, event):
+        self.index_loader.requestInterruption()
+        self.index_loader.wait()
+        self.sweep_loader.wait()
         self.thread.stop()
+        self.ir_index.close()
         event.accept()
 
 if __name__ == "__main__":
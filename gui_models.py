@@ -0,0 +1,214 @@
+"""
+Modelos Qt (model/view) de la interfaz.
+
+Los modelos leen directamente los objetos ya cargados (IRCommand) o el
+índice del IRDB, y solo formatean las celdas que la vista pide al pintarse.
+"""
+from PyQt6.QtCore import (QAbstractItemModel, QAbstractTableModel, QModelIndex,
+                          QSortFilterProxyModel, Qt)
+
+# Rol con el valor por el que se ordena cada celda (números como números)
+SORT_ROLE = Qt.ItemDataRole.UserRole + 1
+
+
+class CommandTableModel(QAbstractTableModel):
+    """
+    Comandos IR de un dispositivo: nombre, protocolo y comando.
+
+    set_commands() hace un único reset del modelo por cambio de dispositivo;
+    no se crea ningún objeto por celda.
+    """
+
+    HEADERS = ("Nombre", "Protocolo", "Comando")
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._commands = []
+
+    def set_commands(self, commands):
+        self.beginResetModel()
+        self._commands = list(commands)
+        self.endResetModel()
+
+    def command_at(self, row):
+        return self._commands[row]
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._commands)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.HEADERS)
+
+    def headerData(self, section, orientation, role=Qt.ItemDataRole.DisplayRole):
+        if orientation == Qt.Orientation.Horizontal and role == Qt.ItemDataRole.DisplayRole:
+            return self.HEADERS[section]
+        return None
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid():
+            return None
+        cmd = self._commands[index.row()]
+        column = index.column()
+
+        if role == Qt.ItemDataRole.DisplayRole:
+            if column == 0:
+                return cmd.name
+            if column == 1:
+                return "RAW" if cmd.is_raw else cmd.protocol or ''
+            if cmd.is_raw:
+                return f"{len(cmd.data) if cmd.data is not None else 0} tiempos"
+            return f"0x{cmd.command:02X}" if cmd.command is not None else ''
+
+        if role == SORT_ROLE:
+            if column == 0:
+                return (cmd.name or '').lower()
+            if column == 1:
+                return "RAW" if cmd.is_raw else (cmd.protocol or '').upper()
+            # Raw después de los parseados, por número de tiempos
+            if cmd.is_raw:
+                return 1 << 40 | (len(cmd.data) if cmd.data is not None else 0)
+            return cmd.command if cmd.command is not None else -1
+
+        if role == Qt.ItemDataRole.ToolTipRole and not cmd.is_raw:
+            return f"{cmd.protocol} dirección 0x{cmd.address or 0:X} comando 0x{cmd.command or 0:X}"
+        return None
+
+
+class CommandFilterModel(QSortFilterProxyModel):
+    """Ordena por SORT_ROLE y filtra por texto en cualquier columna."""
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setSortRole(SORT_ROLE)
+        self.setFilterKeyColumn(-1)
+        self.setFilterCaseSensitivity(Qt.CaseSensitivity.CaseInsensitive)
+
+
+# Filas que se piden al índice cada vez que la vista necesita más hijos
+TREE_FETCH_BATCH = 200
+
+
+class _TreeNode:
+    __slots__ = ('name', 'key', 'count', 'parent', 'row', 'children', 'exhausted')
+
+    def __init__(self, name, key, count, parent, row):
+        self.name = name
+        self.key = key          # clave del índice si es un archivo .ir; None si es carpeta
+        self.count = count      # comandos del archivo o archivos bajo la carpeta
+        self.parent = parent
+        self.row = row
+        self.children = []
+        self.exhausted = key is not None  # los archivos no tienen hijos
+
+    @property
+    def path(self):
+        """Carpeta en el índice ("TVs/Samsung"); '' en la raíz."""
+        parts = []
+        node = self
+        while node.parent is not None:
+            parts.append(node.name)
+            node = node.parent
+        return '/'.join(reversed(parts))
+
+
+class DeviceTreeModel(QAbstractItemModel):
+    """
+    Árbol categoría / marca / ... / modelo del IRDB leído del índice SQLite.
+
+    Los hijos de cada carpeta se piden al índice al expandirla, por lotes de
+    TREE_FETCH_BATCH (canFetchMore/fetchMore): no hay acceso al disco ni
+    vigilancia del sistema de archivos, y en memoria solo están las ramas
+    abiertas. El rol UserRole devuelve la clave del archivo (como los
+    resultados de búsqueda).
+    """
+
+    def __init__(self, ir_index, parent=None):
+        super().__init__(parent)
+        self.ir_index = ir_index
+        self._root = _TreeNode('', None, 0, None, 0)
+
+    def reload(self):
+        """Descartar lo cargado (p. ej. tras actualizar el índice)."""
+        self.beginResetModel()
+        self._root = _TreeNode('', None, 0, None, 0)
+        self.endResetModel()
+
+    def _node(self, index):
+        return index.internalPointer() if index.isValid() else self._root
+
+    def key_for_index(self, index):
+        return self._node(index).key
+
+    def path_for_index(self, index):
+        return self._node(index).path
+
+    def index_for_path(self, path):
+        """Índice de la carpeta 'path' cargando los lotes necesarios; inválido si no está."""
+        index = QModelIndex()
+        for name in path.split('/') if path else ():
+            node = self._node(index)
+            match = next((child for child in node.children if child.name == name), None)
+            while match is None and not node.exhausted:
+                first = len(node.children)
+                self.fetchMore(index)
+                match = next((child for child in node.children[first:] if child.name == name), None)
+            if match is None:
+                return QModelIndex()
+            index = self.createIndex(match.row, 0, match)
+        return index
+
+    def index(self, row, column, parent=QModelIndex()):
+        node = self._node(parent)
+        if column != 0 or not 0 <= row < len(node.children):
+            return QModelIndex()
+        return self.createIndex(row, 0, node.children[row])
+
+    def parent(self, index):
+        if not index.isValid():
+            return QModelIndex()
+        parent = index.internalPointer().parent
+        if parent is None or parent is self._root:
+            return QModelIndex()
+        return self.createIndex(parent.row, 0, parent)
+
+    def rowCount(self, parent=QModelIndex()):
+        return len(self._node(parent).children)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 1
+
+    def hasChildren(self, parent=QModelIndex()):
+        node = self._node(parent)
+        return node.key is None and (bool(node.children) or not node.exhausted)
+
+    def canFetchMore(self, parent):
+        return not self._node(parent).exhausted
+
+    def fetchMore(self, parent):
+        node = self._node(parent)
+        if node.exhausted:
+            return
+        # Paginación por clave: el siguiente lote empieza tras el último hijo cargado
+        after = node.children[-1].name if node.children else None
+        batch = self.ir_index.tree_children(node.path, TREE_FETCH_BATCH, after)
+        node.exhausted = len(batch) < TREE_FETCH_BATCH
+        if not batch:
+            return
+        first = len(node.children)
+        self.beginInsertRows(parent, first, first + len(batch) - 1)
+        node.children.extend(_TreeNode(name, key, count, node, first + i)
+                             for i, (name, key, count) in enumerate(batch))
+        self.endInsertRows()
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid():
+            return None
+        node = index.internalPointer()
+        if role == Qt.ItemDataRole.DisplayRole:
+            name = node.name[:-3] if node.key and node.name.endswith('.ir') else node.name
+            return f"{name} ({node.count})"
+        if role == Qt.ItemDataRole.ToolTipRole:
+            return f"{node.count} comandos" if node.key else f"{node.count} dispositivos"
+        if role == Qt.ItemDataRole.UserRole:
+            return node.key
+        return None
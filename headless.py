@@ -0,0 +1,174 @@
+"""
+Control por gestos sin pantalla ni Qt (equipos embebidos).
+
+Usa el mismo motor que la interfaz (gesture_engine) pero sin ninguna etapa de
+dibujo: ni draw_landmarks, ni putText, ni conversión a QImage.
+
+Uso:
+    python headless.py --device TVs/Samsung/UE40.ir
+    python headless.py --config headless.json --duration 60 --metrics-out uso.json
+    python headless.py --sweep            # barrido de todos los POWER del IRDB
+
+El archivo de configuración es un JSON con las mismas opciones que la línea de
+comandos (con '_' en lugar de '-'); lo indicado en la línea de comandos manda:
+
+    {"camera": 0, "devices": ["TVs/Samsung/UE40.ir", "ACs/Daikin/ARC433.ir"],
+     "sessions_mode": "hands", "metrics_interval": 5}
+"""
+import argparse
+import json
+import os
+import signal
+import sys
+import threading
+
+from code_sweep import CodeSweep, describe_result, gather_sweep_codes
+from gesture_engine import GestureEngine
+from gestures import compile_dispatch_table
+from irdb_index import INDEX_PATH, IRDB_ROOT, IRDBIndex
+from pipeline_metrics import PipelineMetrics, format_summary
+from serial_link import BAUD_RATE, SerialLink
+from sessions import SessionManager, make_sessions
+
+DEFAULTS = {
+    'camera': 0,
+    'devices': [],
+    'sessions_mode': 'zones',
+    'sessions': None,          # por defecto, una sesión por dispositivo
+    'irdb': IRDB_ROOT,
+    'db': INDEX_PATH,
+    'port': None,              # None = detectar el ESP32
+    'baud_rate': BAUD_RATE,
+    'adaptive': True,
+    'metrics_interval': 5.0,   # 0 = no mostrar métricas periódicas
+    'metrics_out': None,
+    'duration': None,
+    'record': None,
+    'sweep': None,             # gesto cuyo botón se barre (p. ej. "ENCENDIDO")
+}
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Control IR por gestos sin interfaz gráfica.")
+    parser.add_argument('--config', help="Archivo JSON con la configuración")
+    parser.add_argument('--camera', type=int, help="Índice de la cámara")
+    parser.add_argument('--device', dest='devices', action='append',
+                        help="Archivo .ir (ruta o clave del IRDB); repetir para varias sesiones")
+    parser.add_argument('--sessions-mode', choices=['zones', 'hands'],
+                        help="Reparto de sesiones: franjas de la imagen o mano derecha/izquierda")
+    parser.add_argument('--sessions', type=int, help="Número de sesiones")
+    parser.add_argument('--irdb', help="Raíz del IRDB")
+    parser.add_argument('--db', help="Índice SQLite del IRDB")
+    parser.add_argument('--port', help="Puerto serial del ESP32 (se acepta aunque el firmware "
+                                       "no responda al handshake)")
+    parser.add_argument('--baud-rate', type=int)
+    parser.add_argument('--no-adaptive', dest='adaptive', action='store_const', const=False,
+                        help="Procesar todos los fotogramas a resolución completa")
+    parser.add_argument('--metrics-interval', type=float,
+                        help="Segundos entre resúmenes de métricas (0 = ninguno)")
+    parser.add_argument('--metrics-out', help="Guardar las métricas al salir (.json o .csv)")
+    parser.add_argument('--duration', type=float, help="Parar tras estos segundos")
+    parser.add_argument('--record', help="Grabar los landmarks en este archivo .lmk")
+    parser.add_argument('--sweep', nargs='?', const="ENCENDIDO", metavar='GESTO',
+                        help="Enviar todos los códigos del IRDB de ese gesto (ENCENDIDO por "
+                             "defecto) hasta que un gesto detenga el barrido")
+    return parser.parse_args(argv)
+
+
+def load_config(args):
+    """DEFAULTS <- archivo JSON <- línea de comandos."""
+    config = dict(DEFAULTS)
+    if args.config:
+        with open(args.config, 'r', encoding='utf-8') as f:
+            file_config = json.load(f)
+        unknown = set(file_config) - set(DEFAULTS)
+        if unknown:
+            raise ValueError(f"Opciones desconocidas en {args.config}: {', '.join(sorted(unknown))}")
+        config.update(file_config)
+    for key in DEFAULTS:
+        value = getattr(args, key, None)
+        if value is not None:
+            config[key] = value
+    return config
+
+
+def load_devices(sessions, devices, ir_index):
+    """Compilar cada dispositivo y ligarlo a su sesión (en orden)."""
+    for session, device in zip(sessions.sessions, devices):
+        path = device if os.path.exists(device) else ir_index.path_for(device)
+        commands = ir_index.get_commands(path)
+        if not commands:
+            print(f"Aviso: {device} no tiene comandos")
+        ir_commands = {cmd.name: cmd for cmd in commands if cmd.name}
+        model_name = os.path.basename(path).replace(".ir", "")
+        session.set_device(model_name, compile_dispatch_table(ir_commands))
+        mapped = ", ".join(f"{g} → {entry[0].name}" for g, entry in session.dispatch_table.items())
+        print(f"[{session.name}] {model_name}: {mapped or 'ningún gesto con comando'}")
+
+
+def main(argv=None):
+    config = load_config(parse_args(argv))
+    devices = config['devices']
+    count = config['sessions'] or max(len(devices), 1)
+
+    sessions = SessionManager(make_sessions(config['sessions_mode'], count,
+                                            window=7, threshold=5, cooldown=0.8))
+    ir_index = IRDBIndex(config['db'], config['irdb'])
+    try:
+        load_devices(sessions, devices, ir_index)
+        sweep_codes = gather_sweep_codes(ir_index, config['sweep']) if config['sweep'] else []
+    finally:
+        ir_index.close()
+
+    metrics = PipelineMetrics()
+    link = SerialLink(config['baud_rate'], device=config['port'],
+                      on_line=lambda line: print(f"ESP32: {line}"),
+                      on_status=lambda ok: print("ESP32 conectado" if ok else "ESP32 desconectado"),
+                      metrics=metrics)
+
+    def on_gesture(session, gesture):
+        entry = session.dispatch_table.get(gesture)
+        target = entry[0].name if entry else "sin comando"
+        print(f"[{session.name}] {gesture} → {target}")
+
+    interval = config['metrics_interval']
+    engine = GestureEngine(sessions, link, metrics,
+                           camera_index=config['camera'], adaptive=config['adaptive'],
+                           on_gesture=on_gesture,
+                           on_metrics=(lambda snap: print(format_summary(snap))) if interval else None,
+                           metrics_interval=interval or 1.0)
+
+    signal.signal(signal.SIGINT, lambda *_: engine.stop())
+    signal.signal(signal.SIGTERM, lambda *_: engine.stop())
+    if config['duration']:
+        timer = threading.Timer(config['duration'], engine.stop)
+        timer.daemon = True
+        timer.start()
+    if config['record']:
+        engine.start_recording(config['record'])
+    if config['sweep']:
+        print(f"Barrido de {len(sweep_codes)} códigos de {config['sweep']}: "
+              "haz cualquier gesto cuando el equipo reaccione")
+        engine.sweep = CodeSweep(link, sweep_codes,
+                                 on_progress=lambda code, total: print(
+                                     f"Barrido {code.index + 1}/{total}: {code.message!r}"),
+                                 on_finished=lambda result: print(describe_result(result)))
+
+    print("Procesando cámara sin interfaz (Ctrl+C para salir)")
+    if engine.sweep:
+        # El enlace se arranca en engine.run(); el barrido espera a que conecte
+        engine.sweep.start()
+    engine.run()
+    if engine.sweep:
+        engine.sweep.stop()
+
+    process = metrics.snapshot()['process']
+    print(f"CPU media {process['cpu_percent_avg']:.0f}% de un núcleo"
+          + (f", RSS máximo {process['max_rss_mb']:.0f} MB" if process['max_rss_mb'] else ""))
+    if config['metrics_out']:
+        metrics.dump(config['metrics_out'])
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
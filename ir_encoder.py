@@ -0,0 +1,278 @@
+"""
+Codificador de protocolos IR en el host: (protocolo, dirección, comando) ->
+tiempos marca/espacio en µs, listos para enviarse como señal raw.
+
+El firmware solo aproxima algunos protocolos (NEC42, RC5X, RCA y Pioneer se
+emiten como NEC o RC5, Kaseikyo sin fabricante y NECext con el comando
+recortado a 8 bits); con estos tiempos el ESP32 emite la señal exacta.
+
+Las direcciones y comandos siguen el formato de los archivos .ir de Flipper
+Zero (enteros ya decodificados por irdb_parser). Los resultados se guardan en
+memoria: volver a codificar el mismo comando devuelve la misma tupla.
+
+    >>> frequency, timings = encode('NEC', 0x04, 0x08)
+    >>> timings[:3]
+    (9000, 4500, 560)
+"""
+from ir_protocol import PROTOCOL_ALIASES
+
+# Protocolos que arduino_remote.ino emite con otro protocolo parecido
+# (Kaseikyo siempre con fabricante 0)
+APPROXIMATED_PROTOCOLS = {'NEC42', 'RC5X', 'RCA', 'PIONEER', 'KASEIKYO'}
+
+
+def _pulse_distance(bits, header, bit_mark, zero_space, one_space, stop=True):
+    """
+    Codificación por distancia de pulsos (NEC, Samsung, Kaseikyo, RCA...).
+
+    Args:
+        bits (iterable): Bits a enviar, en orden de emisión.
+        header (tuple): (marca, espacio) de la cabecera.
+    """
+    timings = list(header)
+    for bit in bits:
+        timings.append(bit_mark)
+        timings.append(one_space if bit else zero_space)
+    if stop:
+        timings.append(bit_mark)
+    return timings
+
+
+def _lsb(value, count):
+    """Bits de 'value', primero el menos significativo."""
+    return [(value >> i) & 1 for i in range(count)]
+
+
+def _msb(value, count):
+    """Bits de 'value', primero el más significativo."""
+    return [(value >> i) & 1 for i in range(count - 1, -1, -1)]
+
+
+def _manchester(levels, unit):
+    """
+    Une niveles (1 = marca, 0 = espacio) de duración 'unit' en tiempos
+    marca/espacio. Los espacios iniciales y finales no se emiten.
+    """
+    timings = []
+    current = None
+    for level, length in levels:
+        if level == current:
+            timings[-1] += length * unit
+        else:
+            timings.append(length * unit)
+            current = level
+    if levels and levels[0][0] == 0:
+        timings.pop(0)
+    if len(timings) % 2 == 0:
+        timings.pop()
+    return timings
+
+
+# --- Protocolos ---
+
+NEC_TIMING = dict(header=(9000, 4500), bit_mark=560, zero_space=560, one_space=1690)
+
+
+def _nec(address, command):
+    bits = (_lsb(address, 8) + _lsb(~address, 8)
+            + _lsb(command, 8) + _lsb(~command, 8))
+    return 38000, _pulse_distance(bits, **NEC_TIMING)
+
+
+def _necext(address, command):
+    # Dirección y comando de 16 bits tal cual (sin bytes invertidos)
+    return 38000, _pulse_distance(_lsb(address, 16) + _lsb(command, 16), **NEC_TIMING)
+
+
+def _nec42(address, command):
+    bits = (_lsb(address, 13) + _lsb(~address, 13)
+            + _lsb(command, 8) + _lsb(~command, 8))
+    return 38000, _pulse_distance(bits, **NEC_TIMING)
+
+
+def _pioneer(address, command):
+    # Estructura de NEC a 40 kHz, con cabecera y bits propios
+    bits = (_lsb(address, 8) + _lsb(~address, 8)
+            + _lsb(command, 8) + _lsb(~command, 8))
+    return 40000, _pulse_distance(bits, header=(8500, 4225), bit_mark=500,
+                                  zero_space=500, one_space=1500)
+
+
+def _samsung32(address, command):
+    bits = (_lsb(address, 8) + _lsb(address, 8)
+            + _lsb(command, 8) + _lsb(~command, 8))
+    return 38000, _pulse_distance(bits, header=(4500, 4500), bit_mark=560,
+                                  zero_space=560, one_space=1690)
+
+
+def _rc5(address, command, extended=False):
+    # Bit de campo: 1 en RC5; en RC5X es el bit 6 del comando invertido
+    field = 0 if extended and command & 0x40 else 1
+    bits = [1, field, 0] + _msb(address, 5) + _msb(command, 6)
+    levels = []
+    for bit in bits:
+        # '1' = espacio -> marca; '0' = marca -> espacio
+        levels += [(0, 1), (1, 1)] if bit else [(1, 1), (0, 1)]
+    return 36000, _manchester(levels, 889)
+
+
+def _rc5x(address, command):
+    return _rc5(address, command, extended=True)
+
+
+def _rc6(address, command):
+    # Modo 0: cabecera, bit de inicio, 3 bits de modo, toggle (doble) y 16 bits
+    levels = [(1, 6), (0, 2)]
+    bits = [(1, 1), (0, 1), (0, 1), (0, 1), (0, 2)]
+    bits += [(bit, 1) for bit in _msb(address, 8) + _msb(command, 8)]
+    for bit, length in bits:
+        # '1' = marca -> espacio; '0' = espacio -> marca
+        levels += [(1, length), (0, length)] if bit else [(0, length), (1, length)]
+    return 36000, _manchester(levels, 444)
+
+
+def _sirc(address, command, address_bits):
+    timings = [2400, 600]
+    for bit in _lsb(command, 7) + _lsb(address, address_bits):
+        timings.append(1200 if bit else 600)
+        timings.append(600)
+    timings.pop()  # Sin espacio final
+    return 40000, timings
+
+
+def _sirc12(address, command):
+    return _sirc(address, command, 5)
+
+
+def _sirc15(address, command):
+    return _sirc(address, command, 8)
+
+
+def _sirc20(address, command):
+    return _sirc(address, command, 13)
+
+
+def _kaseikyo(address, command):
+    """
+    48 bits: fabricante (16), paridad del fabricante (4), genre1 (4),
+    genre2 (4), comando (10), id (2) y paridad (8). Como en Flipper, la
+    dirección lleva el fabricante en los bits 8-23, genre1 en 4-7, genre2 en
+    0-3 y el id en 24-25 ('80 02 20 00' = Panasonic 0x2002, genre1 8).
+    """
+    vendor = (address >> 8) & 0xFFFF
+    genre1 = (address >> 4) & 0x0F
+    genre2 = address & 0x0F
+    device_id = (address >> 24) & 0x03
+    command &= 0x3FF
+    vendor_parity = vendor ^ (vendor >> 8)
+    vendor_parity = (vendor_parity ^ (vendor_parity >> 4)) & 0x0F
+    data = [vendor & 0xFF, vendor >> 8,
+            vendor_parity | genre1 << 4,
+            genre2 | (command & 0x0F) << 4,
+            device_id << 6 | command >> 4]
+    data.append(data[2] ^ data[3] ^ data[4])
+    bits = [bit for byte in data for bit in _lsb(byte, 8)]
+    return 37000, _pulse_distance(bits, header=(3456, 1728), bit_mark=432,
+                                  zero_space=432, one_space=1296)
+
+
+def _rca(address, command):
+    bits = (_msb(address, 4) + _msb(command, 8)
+            + _msb(~address, 4) + _msb(~command, 8))
+    return 56000, _pulse_distance(bits, header=(4000, 4000), bit_mark=500,
+                                  zero_space=1000, one_space=2000)
+
+
+ENCODERS = {
+    'NEC': _nec,
+    'NECEXT': _necext,
+    'NEC42': _nec42,
+    'SAMSUNG32': _samsung32,
+    'RC5': _rc5,
+    'RC5X': _rc5x,
+    'RC6': _rc6,
+    'SIRC': _sirc12,
+    'SIRC15': _sirc15,
+    'SIRC20': _sirc20,
+    'KASEIKYO': _kaseikyo,
+    'RCA': _rca,
+    'PIONEER': _pioneer,
+}
+
+# (protocolo, dirección, comando) -> (frecuencia, tiempos)
+_cache = {}
+
+
+def canonical_protocol(name):
+    """Nombre del protocolo tal como aparece en ENCODERS ('Samsung' -> 'SAMSUNG32')."""
+    key = (name or 'NEC').upper()
+    return PROTOCOL_ALIASES.get(key, key)
+
+
+def can_encode(protocol):
+    return canonical_protocol(protocol) in ENCODERS
+
+
+def firmware_approximates(protocol, command):
+    """
+    True si el modo texto del firmware no emitiría este comando tal cual
+    (hay que enviarlo codificado como raw).
+    """
+    name = canonical_protocol(protocol)
+    if name in APPROXIMATED_PROTOCOLS:
+        return True
+    # sendNEC solo admite comandos de 8 bits
+    return name == 'NECEXT' and (command or 0) > 0xFF
+
+
+def encode(protocol, address, command):
+    """
+    Tiempos de un comando.
+
+    Returns:
+        tuple: (frecuencia en Hz, tupla de tiempos en µs empezando por una marca),
+        o None si el protocolo no se sabe codificar.
+    """
+    name = canonical_protocol(protocol)
+    key = (name, address or 0, command or 0)
+    try:
+        return _cache[key]
+    except KeyError:
+        pass
+    encoder = ENCODERS.get(name)
+    if encoder is None:
+        return None
+    frequency, timings = encoder(key[1], key[2])
+    result = _cache[key] = (frequency, tuple(timings))
+    return result
+
+
+def encode_command(ir_cmd):
+    """Como encode() para un IRCommand; las señales raw devuelven sus propios tiempos."""
+    if ir_cmd.is_raw:
+        return (ir_cmd.frequency or 38000, tuple(ir_cmd.data or ()))
+    return encode(ir_cmd.protocol, ir_cmd.address, ir_cmd.command)
+
+
+def encode_device(ir_commands):
+    """
+    Codificar todos los comandos de un dispositivo de una vez.
+
+    Args:
+        ir_commands (dict | iterable): {nombre: IRCommand} o lista de IRCommand.
+
+    Returns:
+        dict: {nombre: (frecuencia, tiempos)}; los comandos que no se saben
+        codificar no aparecen.
+    """
+    commands = ir_commands.values() if isinstance(ir_commands, dict) else ir_commands
+    encoded = {}
+    for cmd in commands:
+        result = encode_command(cmd)
+        if result is not None:
+            encoded[cmd.name] = result
+    return encoded
+
+
+def clear_cache():
+    _cache.clear()
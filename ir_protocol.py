@@ -0,0 +1,324 @@
+"""
+Protocolo binario host <-> ESP32 (arduino_remote.ino, firmware v2+).
+
+Trama:
+    SOF(0xA5) | tipo | seq | len | payload (len bytes) | CRC-16 (LE)
+
+El CRC-16/CCITT-FALSE cubre tipo, seq, len y payload. Las tramas solo empiezan
+al principio de una línea, así que las respuestas de texto del firmware
+("IR: ...", "Modelo Cargado: ...") pueden seguir mezcladas en el mismo puerto.
+
+Las señales raw (capturas de Flipper sin protocolo) se comprimen con una tabla
+de duraciones + índices de 4 u 8 bits y se envían en varias tramas:
+RAW_BEGIN (tabla), RAW_CHUNK (índices) y RAW_END (emitir).
+"""
+import struct
+from array import array
+from collections import Counter
+
+SOF = 0xA5
+
+# Tipos de trama
+FRAME_IR_SEND = 0x01   # payload: protocolo u8, dirección u32 LE, comando u32 LE
+FRAME_RAW_BEGIN = 0x02  # payload: kHz u8, tiempos u16 LE, bits u8, n u8, tabla n x u16 LE
+FRAME_RAW_CHUNK = 0x03  # payload: posición u16 LE, índices empaquetados
+FRAME_RAW_END = 0x04    # sin payload: el ESP32 emite la señal
+FRAME_ACK = 0x81       # payload: estado u8
+
+# Estado en el ACK
+ACK_OK = 0
+ACK_UNKNOWN_PROTOCOL = 1
+ACK_BAD_LENGTH = 2
+ACK_TOO_LONG = 3
+ACK_BAD_SEQUENCE = 4
+
+ACK_STATUS_TEXT = {
+    ACK_OK: "OK",
+    ACK_UNKNOWN_PROTOCOL: "protocolo desconocido",
+    ACK_BAD_LENGTH: "longitud inválida",
+    ACK_TOO_LONG: "señal raw demasiado larga",
+    ACK_BAD_SEQUENCE: "trama raw fuera de secuencia",
+}
+
+# Versión mínima del firmware (handshake "ID:IRHAND:<v>") que entiende tramas
+MIN_BINARY_FIRMWARE = 2
+# ... y que acepta señales raw
+MIN_RAW_FIRMWARE = 3
+
+IR_SEND_PAYLOAD = struct.Struct("<BII")
+MAX_PAYLOAD = 255
+
+# --- Señales raw ---
+# Duraciones que difieren menos de esto (relativo) comparten entrada en la tabla;
+# los receptores IR toleran bastante más (~20 %)
+RAW_TOLERANCE = 0.06
+# Tamaño del buffer de tiempos del firmware (RAW_MAX_TIMINGS en arduino_remote.ino)
+MAX_RAW_TIMINGS = 1024
+# Entradas de la tabla que caben en la trama RAW_BEGIN
+MAX_RAW_TABLE = (MAX_PAYLOAD - 5) // 2
+# Bytes de índices por trama RAW_CHUNK (el buffer serial del ESP32 es de 256)
+RAW_CHUNK_BYTES = 200
+
+# Identificadores de protocolo (mismos valores que en arduino_remote.ino)
+PROTOCOL_IDS = {
+    'NEC': 1,
+    'NECEXT': 2,
+    'NEC42': 3,
+    'RC5': 4,
+    'RC5X': 5,
+    'RC6': 6,
+    'SAMSUNG32': 7,
+    'SIRC': 8,
+    'SIRC15': 9,
+    'SIRC20': 10,
+    'KASEIKYO': 11,
+    'RCA': 12,
+    'PIONEER': 13,
+    'LG': 14,
+    'JVC': 15,
+    'SHARP': 16,
+    'DENON': 17,
+}
+
+# Nombres alternativos que acepta también el modo texto del firmware
+PROTOCOL_ALIASES = {
+    'NEC1': 'NEC',
+    'NEC2': 'NECEXT',
+    'NECX': 'NECEXT',
+    'SAMSUNG': 'SAMSUNG32',
+    'SIRC12': 'SIRC',
+    'SONY12': 'SIRC',
+    'SONY15': 'SIRC15',
+    'SONY20': 'SIRC20',
+    'SONY': 'SIRC20',
+    'PANASONIC': 'KASEIKYO',
+    'KASEIKYO_DENON': 'KASEIKYO',
+    'LG32': 'LG',
+}
+
+
+def protocol_id(name):
+    """Identificador numérico de un protocolo del IRDB, o None si no se conoce."""
+    key = (name or 'NEC').upper()
+    return PROTOCOL_IDS.get(PROTOCOL_ALIASES.get(key, key))
+
+
+def crc16(data, crc=0xFFFF):
+    """CRC-16/CCITT-FALSE (polinomio 0x1021, valor inicial 0xFFFF)."""
+    for byte in data:
+        crc ^= byte << 8
+        for _ in range(8):
+            crc = ((crc << 1) ^ 0x1021) if crc & 0x8000 else (crc << 1)
+            crc &= 0xFFFF
+    return crc
+
+
+def encode_frame(frame_type, seq, payload=b""):
+    """Trama completa lista para escribir en el puerto."""
+    if len(payload) > MAX_PAYLOAD:
+        raise ValueError(f"payload demasiado largo ({len(payload)} bytes)")
+    body = bytes((frame_type, seq & 0xFF, len(payload))) + payload
+    return bytes([SOF]) + body + crc16(body).to_bytes(2, 'little')
+
+
+def encode_ir_body(protocol, address, command):
+    """
+    Payload de FRAME_IR_SEND.
+
+    Raises:
+        ValueError: si el protocolo no tiene identificador binario.
+    """
+    pid = protocol_id(protocol)
+    if pid is None:
+        raise ValueError(f"protocolo sin identificador binario: {protocol}")
+    return IR_SEND_PAYLOAD.pack(pid, (address or 0) & 0xFFFFFFFF, (command or 0) & 0xFFFFFFFF)
+
+
+def encode_ir_text(protocol, address, command):
+    """Comando extendido de texto: !PROTOCOLO:DIRECCION:COMANDO"""
+    return f"!{protocol or 'NEC'}:{address or 0:02X}:{command or 0:02X}\n".encode()
+
+
+class IRMessage:
+    """
+    Comando IR con sus dos codificaciones ya calculadas.
+
+    SerialLink elige al escribir: trama binaria si el firmware la entiende y
+    el protocolo tiene identificador, línea de texto en caso contrario.
+    """
+    __slots__ = ('protocol', 'address', 'command', 'text', 'body', 'frames')
+
+    min_firmware = MIN_BINARY_FIRMWARE
+
+    def __init__(self, protocol, address, command):
+        self.protocol = protocol or 'NEC'
+        self.address = address or 0
+        self.command = command or 0
+        self.text = encode_ir_text(self.protocol, self.address, self.command)
+        try:
+            self.body = encode_ir_body(self.protocol, self.address, self.command)
+        except ValueError:
+            self.body = None
+        # (tipo, payload) de cada trama a enviar
+        self.frames = ((FRAME_IR_SEND, self.body),) if self.body is not None else ()
+
+    def __eq__(self, other):
+        return isinstance(other, IRMessage) and self.text == other.text
+
+    def __hash__(self):
+        return hash(self.text)
+
+    def __repr__(self):
+        return f"{self.protocol}:{self.address:02X}:{self.command:02X}"
+
+
+def compress_timings(data, tolerance=RAW_TOLERANCE):
+    """
+    Tabla de duraciones + índices de una señal raw.
+
+    Las duraciones se ordenan y se agrupan mientras no superen en 'tolerance'
+    a la primera del grupo; cada grupo se sustituye por su media ponderada.
+    Las duraciones mayores de 65535 µs (pausas largas) se saturan.
+
+    Returns:
+        tuple: (array('H') con la tabla, bytes con un índice por tiempo).
+    """
+    counts = Counter(min(v, 0xFFFF) for v in data)
+    groups = []
+    for value in sorted(counts):
+        if groups and value <= groups[-1][0] * (1 + tolerance):
+            groups[-1].append(value)
+        else:
+            groups.append([value])
+
+    table = array('H')
+    lookup = {}
+    for i, group in enumerate(groups):
+        total = sum(counts[v] for v in group)
+        table.append(round(sum(v * counts[v] for v in group) / total))
+        for v in group:
+            lookup[v] = i
+    if len(table) > 255:
+        raise ValueError(f"demasiadas duraciones distintas ({len(table)})")
+    return table, bytes(lookup[min(v, 0xFFFF)] for v in data)
+
+
+def pack_indices(indices, bits):
+    """Empaqueta índices de 4 bits (dos por byte, primero el nibble bajo) o de 8 bits."""
+    if bits == 8:
+        return bytes(indices)
+    packed = bytearray((len(indices) + 1) // 2)
+    for i, index in enumerate(indices):
+        packed[i >> 1] |= index << (4 * (i & 1))
+    return bytes(packed)
+
+
+def unpack_timings(table, packed, bits, count):
+    """Inverso de compress_timings + pack_indices (lo que reconstruye el firmware)."""
+    if bits == 8:
+        indices = packed[:count]
+    else:
+        indices = [(packed[i >> 1] >> (4 * (i & 1))) & 0x0F for i in range(count)]
+    return array('H', (table[i] for i in indices))
+
+
+class RawMessage:
+    """
+    Señal raw comprimida y ya troceada en tramas RAW_BEGIN / RAW_CHUNK / RAW_END.
+
+    Las capturas no tienen forma de texto: con firmware anterior a
+    MIN_RAW_FIRMWARE (o si la señal no cabe en el buffer del ESP32) no se
+    pueden enviar. Las señales generadas por ir_encoder llevan en 'text' el
+    comando !PROTOCOLO aproximado como alternativa.
+    """
+    __slots__ = ('name', 'frequency', 'count', 'table', 'bits', 'packed', 'frames', 'text')
+
+    min_firmware = MIN_RAW_FIRMWARE
+
+    def __init__(self, data, frequency, name=None, text=None):
+        self.name = name
+        self.text = text
+        self.frequency = frequency or 38000
+        self.count = len(data)
+        self.table, indices = compress_timings(data)
+        self.bits = 4 if len(self.table) <= 16 else 8
+        self.packed = pack_indices(indices, self.bits)
+
+        if self.count == 0 or self.count > MAX_RAW_TIMINGS or len(self.table) > MAX_RAW_TABLE:
+            self.frames = ()
+            return
+
+        khz = min(max(round(self.frequency / 1000), 1), 255)
+        begin = struct.pack(f"<BHBB{len(self.table)}H", khz, self.count, self.bits,
+                            len(self.table), *self.table)
+        frames = [(FRAME_RAW_BEGIN, begin)]
+        per_byte = 8 // self.bits
+        for start in range(0, len(self.packed), RAW_CHUNK_BYTES):
+            chunk = self.packed[start:start + RAW_CHUNK_BYTES]
+            frames.append((FRAME_RAW_CHUNK, struct.pack("<H", start * per_byte) + chunk))
+        frames.append((FRAME_RAW_END, b""))
+        self.frames = tuple(frames)
+
+    def timings(self):
+        """Tiempos tal como los emitirá el ESP32."""
+        return unpack_timings(self.table, self.packed, self.bits, self.count)
+
+    def _key(self):
+        return (self.frequency, self.count, self.bits, self.table.tobytes(), self.packed)
+
+    def __eq__(self, other):
+        return isinstance(other, RawMessage) and self._key() == other._key()
+
+    def __hash__(self):
+        return hash(self._key())
+
+    def __repr__(self):
+        return f"RAW {self.name!r} ({self.count} tiempos, {len(self.table)} duraciones)"
+
+
+class FrameDecoder:
+    """
+    Separa lo recibido del ESP32 en tramas binarias y líneas de texto.
+
+    feed() devuelve una lista de eventos:
+        ('frame', tipo, seq, payload)  o  ('line', texto)
+    """
+
+    def __init__(self):
+        self.buffer = bytearray()
+        self.crc_errors = 0
+
+    def feed(self, data):
+        self.buffer += data
+        events = []
+        buf = self.buffer
+
+        while buf:
+            if buf[0] == SOF:
+                if len(buf) < 4:
+                    break  # Cabecera incompleta
+                length = buf[3]
+                total = 4 + length + 2
+                if len(buf) < total:
+                    break  # Trama incompleta
+                body = bytes(buf[1:4 + length])
+                received_crc = int.from_bytes(buf[4 + length:total], 'little')
+                if crc16(body) == received_crc:
+                    events.append(('frame', body[0], body[1], body[3:]))
+                    del buf[:total]
+                    continue
+                # CRC incorrecto: descartar el SOF y resincronizar como texto
+                self.crc_errors += 1
+                del buf[:1]
+                continue
+
+            end = buf.find(b'\n')
+            if end < 0:
+                # Texto sin terminar; si llega un SOF tras él, no puede ser trama
+                break
+            line = bytes(buf[:end]).decode('utf-8', errors='replace').strip()
+            del buf[:end + 1]
+            if line:
+                events.append(('line', line))
+
+        return events
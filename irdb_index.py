@@ -0,0 +1,486 @@
+import hashlib
+import os
+import sqlite3
+from array import array
+
+from ir_encoder import canonical_protocol
+from irdb_parser import IRCommand, parse_ir_file, validate_command
+
+# --- Configuración ---
+IRDB_ROOT = "./IRDB"
+INDEX_PATH = "./irdb_index.sqlite"
+
+# Archivos recorridos por transacción en update(): entre lotes se libera el
+# bloqueo de escritura y lo ya indexado es visible para otras conexiones
+UPDATE_BATCH = 500
+
+# Incrementar cuando cambie el esquema: fuerza una reconstrucción completa
+SCHEMA_VERSION = 4
+
+# Campos de la señal (todo IRCommand salvo el nombre): lo que se deduplica
+SIGNAL_FIELDS = tuple(k for k in IRCommand.__slots__ if k != 'name')
+
+# Muchos archivos del IRDB repiten los mismos códigos (o el archivo entero) con
+# otra marca o modelo: cada señal y cada conjunto de comandos se guarda una sola
+# vez, identificado por el hash de su contenido, y los archivos lo referencian.
+# signals.protocol es el nombre canónico (canonical_protocol); commands.protocol
+# conserva el nombre tal como aparece en el archivo ('Samsung32', 'SAMSUNG'...).
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS signals (
+    id INTEGER PRIMARY KEY,
+    hash BLOB UNIQUE NOT NULL,
+    type TEXT,
+    protocol TEXT,
+    address INTEGER,
+    command INTEGER,
+    frequency INTEGER,
+    duty_cycle REAL,
+    data BLOB
+);
+CREATE TABLE IF NOT EXISTS command_sets (
+    id INTEGER PRIMARY KEY,
+    hash BLOB UNIQUE NOT NULL,
+    n_commands INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS commands (
+    set_id INTEGER NOT NULL REFERENCES command_sets(id) ON DELETE CASCADE,
+    position INTEGER NOT NULL,
+    name TEXT,
+    protocol TEXT,
+    signal_id INTEGER NOT NULL REFERENCES signals(id),
+    PRIMARY KEY (set_id, position)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS commands_signal ON commands(signal_id);
+CREATE TABLE IF NOT EXISTS files (
+    id INTEGER PRIMARY KEY,
+    path TEXT UNIQUE NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    set_id INTEGER NOT NULL REFERENCES command_sets(id)
+);
+CREATE INDEX IF NOT EXISTS files_set ON files(set_id);
+"""
+
+
+# Columnas de _load_commands: la señal compartida con el protocolo del archivo
+_COMMAND_COLUMNS = tuple('c.protocol' if k == 'protocol' else 's.' + k for k in SIGNAL_FIELDS)
+
+
+def _signal_row(cmd):
+    """Valores de la señal de un IRCommand en el orden de SIGNAL_FIELDS."""
+    row = [getattr(cmd, k) for k in SIGNAL_FIELDS]
+    if not cmd.is_raw:
+        row[SIGNAL_FIELDS.index('protocol')] = canonical_protocol(cmd.protocol)
+    if cmd.data is not None:
+        row[-1] = cmd.data.tobytes()
+    return row
+
+
+def signal_hash(cmd):
+    """
+    Hash del contenido normalizado de la señal (sin el nombre del botón).
+
+    Los alias de protocolo cuentan como el mismo ('Samsung' == 'SAMSUNG32');
+    en las señales raw solo importan frecuencia, ciclo de trabajo y tiempos.
+    """
+    h = hashlib.blake2b(digest_size=16)
+    if cmd.is_raw:
+        h.update(f"raw|{cmd.frequency}|{cmd.duty_cycle}|".encode())
+        if cmd.data is not None:
+            h.update(cmd.data.tobytes())
+    else:
+        h.update(f"{cmd.type}|{canonical_protocol(cmd.protocol)}|"
+                 f"{cmd.address}|{cmd.command}".encode())
+    return h.digest()
+
+
+def command_set_hash(entries):
+    """
+    Hash de un conjunto de comandos: (nombre, protocolo del archivo, hash de
+    señal) en orden. El nombre del protocolo se incluye tal cual para que
+    cada archivo recupere el suyo.
+    """
+    h = hashlib.blake2b(digest_size=16)
+    for name, protocol, digest in entries:
+        h.update((name or '').encode())
+        h.update(b'\0')
+        h.update((protocol or '').encode())
+        h.update(b'\0')
+        h.update(digest)
+    return h.digest()
+
+
+class IRDBIndex:
+    """
+    Índice persistente (SQLite) de los archivos .ir ya analizados.
+
+    Cada archivo se guarda junto con su mtime y tamaño; al pedir sus comandos
+    solo se vuelve a analizar el texto si el archivo cambió en disco.
+
+    Los archivos referencian un conjunto de comandos compartido (ver SCHEMA):
+    dos modelos con los mismos botones ocupan una sola entrada.
+    """
+
+    def __init__(self, db_path=INDEX_PATH, root=IRDB_ROOT):
+        self.db_path = db_path
+        self.root = os.path.abspath(root)
+        self.conn = sqlite3.connect(db_path)
+        self.conn.execute("PRAGMA foreign_keys = ON")
+        self.conn.execute("PRAGMA journal_mode = WAL")
+        self.conn.execute("PRAGMA synchronous = NORMAL")
+        self._ensure_schema()
+
+    def _ensure_schema(self):
+        version = self.conn.execute("PRAGMA user_version").fetchone()[0]
+        if version != SCHEMA_VERSION:
+            # Esquema antiguo o base nueva: reconstruir desde cero
+            self.conn.executescript(
+                "DROP TABLE IF EXISTS files; DROP TABLE IF EXISTS commands; "
+                "DROP TABLE IF EXISTS command_sets; DROP TABLE IF EXISTS signals;")
+            self.conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+        self.conn.executescript(SCHEMA)
+        self.conn.commit()
+
+    def key_for(self, file_path):
+        """Clave de un archivo: ruta relativa a la raíz del IRDB (si está dentro)."""
+        abs_path = os.path.abspath(file_path)
+        rel = os.path.relpath(abs_path, self.root)
+        if rel.startswith(os.pardir):
+            return abs_path
+        return rel.replace(os.sep, '/')
+
+    def path_for(self, key):
+        """Ruta en disco de una clave del índice."""
+        if os.path.isabs(key):
+            return key
+        return os.path.join(self.root, *key.split('/'))
+
+    def get_commands(self, file_path, store=True):
+        """
+        Devuelve los comandos de un archivo .ir usando el índice.
+
+        Un único stat() decide si la entrada sigue siendo válida; solo se
+        analiza el archivo cuando no está indexado o cambió desde la última vez.
+
+        Args:
+            store (bool): Guardar en el índice lo analizado. Con False (p. ej.
+                mientras otra conexión actualiza el índice) solo se lee; si la
+                base está bloqueada también se devuelve lo analizado sin guardar.
+        """
+        try:
+            st = os.stat(file_path)
+        except OSError:
+            return []
+
+        key = self.key_for(file_path)
+        row = self.conn.execute(
+            "SELECT set_id, mtime_ns, size FROM files WHERE path = ?", (key,)).fetchone()
+
+        if row and row[1] == st.st_mtime_ns and row[2] == st.st_size:
+            return self._load_commands(row[0])
+
+        commands = parse_ir_file(file_path)
+        if not store:
+            return [cmd for cmd in commands if validate_command(cmd) is None]
+        try:
+            commands = self.store(key, st, commands)
+            if row:
+                # El conjunto anterior del archivo puede haberse quedado sin uso
+                self._prune_set(row[0])
+            self.conn.commit()
+        except sqlite3.OperationalError:
+            # Otra conexión tiene el bloqueo de escritura: ya se guardará luego
+            self.conn.rollback()
+            return [cmd for cmd in commands if validate_command(cmd) is None]
+        return commands
+
+    def _load_commands(self, set_id):
+        rows = self.conn.execute(
+            f"SELECT c.name, {', '.join(_COMMAND_COLUMNS)} "
+            "FROM commands c JOIN signals s ON s.id = c.signal_id "
+            "WHERE c.set_id = ? ORDER BY c.position", (set_id,))
+        commands = []
+        for row in rows:
+            cmd = IRCommand(*row)
+            if cmd.data is not None:
+                # Los tiempos raw se guardan como el buffer binario del array('I')
+                cmd.data = array('I', cmd.data)
+            commands.append(cmd)
+        return commands
+
+    def _signal_id(self, cmd, digest):
+        row = self.conn.execute("SELECT id FROM signals WHERE hash = ?", (digest,)).fetchone()
+        if row:
+            return row[0]
+        return self.conn.execute(
+            f"INSERT INTO signals (hash, {', '.join(SIGNAL_FIELDS)}) "
+            f"VALUES (?, {', '.join('?' * len(SIGNAL_FIELDS))})",
+            (digest, *_signal_row(cmd))).lastrowid
+
+    def _command_set_id(self, commands):
+        """Id del conjunto con estos comandos; se crea si es la primera vez que aparece."""
+        digests = [signal_hash(cmd) for cmd in commands]
+        set_hash = command_set_hash(
+            (cmd.name, cmd.protocol, digest) for cmd, digest in zip(commands, digests))
+        row = self.conn.execute(
+            "SELECT id FROM command_sets WHERE hash = ?", (set_hash,)).fetchone()
+        if row:
+            return row[0]
+
+        set_id = self.conn.execute(
+            "INSERT INTO command_sets (hash, n_commands) VALUES (?, ?)",
+            (set_hash, len(commands))).lastrowid
+        self.conn.executemany(
+            "INSERT INTO commands (set_id, position, name, protocol, signal_id) "
+            "VALUES (?, ?, ?, ?, ?)",
+            [(set_id, i, cmd.name, cmd.protocol, self._signal_id(cmd, digest))
+             for i, (cmd, digest) in enumerate(zip(commands, digests))])
+        return set_id
+
+    def store(self, key, st, commands):
+        """
+        Guarda (o reemplaza) los comandos de un archivo como referencia a su
+        conjunto de comandos. No hace commit.
+
+        Los comandos que no pasan validate_command se descartan (igual que en
+        build_index), así el índice no depende de qué camino lo construyó.
+
+        Returns:
+            list: Los comandos guardados.
+        """
+        commands = [cmd for cmd in commands if validate_command(cmd) is None]
+        set_id = self._command_set_id(commands)
+        self.conn.execute(
+            "INSERT INTO files (path, mtime_ns, size, set_id) VALUES (?, ?, ?, ?) "
+            "ON CONFLICT(path) DO UPDATE SET mtime_ns = excluded.mtime_ns, "
+            "size = excluded.size, set_id = excluded.set_id",
+            (key, st.st_mtime_ns, st.st_size, set_id))
+        return commands
+
+    def iter_ir_files(self):
+        """Recorre la raíz del IRDB devolviendo (clave, ruta, stat) de cada .ir."""
+        for dirpath, dirnames, filenames in os.walk(self.root):
+            dirnames.sort()
+            for filename in sorted(filenames):
+                if not filename.endswith('.ir'):
+                    continue
+                path = os.path.join(dirpath, filename)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                yield self.key_for(path), path, st
+
+    def known_files(self):
+        """Diccionario clave -> (mtime_ns, size) de todo lo indexado."""
+        return {path: (mtime, size) for path, mtime, size in
+                self.conn.execute("SELECT path, mtime_ns, size FROM files")}
+
+    def remove(self, keys):
+        """Elimina del índice las claves dadas. No hace commit."""
+        self.conn.executemany("DELETE FROM files WHERE path = ?", [(k,) for k in keys])
+
+    def prune(self):
+        """
+        Borra los conjuntos y señales que ya no usa ningún archivo (tras
+        reemplazar o eliminar archivos). No hace commit.
+        """
+        self.conn.execute(
+            "DELETE FROM command_sets WHERE id NOT IN (SELECT set_id FROM files)")
+        self.conn.execute(
+            "DELETE FROM signals WHERE id NOT IN (SELECT signal_id FROM commands)")
+
+    def _prune_set(self, set_id):
+        """
+        Como prune() pero solo para un conjunto: lo borra si ya no lo usa
+        ningún archivo, junto con las señales que solo usaba él. No hace commit.
+        """
+        if self.conn.execute("SELECT 1 FROM files WHERE set_id = ? LIMIT 1",
+                             (set_id,)).fetchone():
+            return
+        signal_ids = [signal_id for (signal_id,) in self.conn.execute(
+            "SELECT DISTINCT signal_id FROM commands WHERE set_id = ?", (set_id,))]
+        self.conn.execute("DELETE FROM command_sets WHERE id = ?", (set_id,))
+        self.conn.executemany(
+            "DELETE FROM signals WHERE id = ? AND NOT EXISTS "
+            "(SELECT 1 FROM commands WHERE signal_id = signals.id)",
+            [(signal_id,) for signal_id in signal_ids])
+
+    def identical_devices(self, key):
+        """Otros archivos con exactamente los mismos comandos (nombres y códigos)."""
+        return [path for (path,) in self.conn.execute(
+            "SELECT f.path FROM files f JOIN files me ON me.set_id = f.set_id "
+            "WHERE me.path = ? AND f.path != me.path ORDER BY f.path", (key,))]
+
+    def devices_sharing_codes(self, key, limit=20):
+        """
+        Archivos que comparten señales con 'key', con o sin el mismo nombre de botón.
+
+        Returns:
+            list: (clave, señales compartidas) de más a menos compartidas.
+        """
+        return self.conn.execute(
+            "WITH mine AS (SELECT DISTINCT c.signal_id FROM files f "
+            "              JOIN commands c ON c.set_id = f.set_id WHERE f.path = ?), "
+            "sets AS (SELECT c.set_id, COUNT(DISTINCT c.signal_id) AS shared "
+            "         FROM commands c JOIN mine m ON m.signal_id = c.signal_id "
+            "         GROUP BY c.set_id) "
+            "SELECT f.path, sets.shared FROM sets JOIN files f ON f.set_id = sets.set_id "
+            "WHERE f.path != ? ORDER BY sets.shared DESC, f.path LIMIT ?",
+            (key, key, limit)).fetchall()
+
+    def tree_children(self, prefix='', limit=-1, after=None):
+        """
+        Hijos directos de una carpeta del IRDB (categoría, marca, ...) según el índice.
+
+        Se recorre en SQLite el rango de claves que empiezan por 'prefix'
+        (índice UNIQUE de files.path) saltando de hijo en hijo, sin recorrer
+        el disco: cada hijo cuesta una búsqueda en el índice (más el recuento
+        si es carpeta), así que cada lote solo lee lo que devuelve. La
+        paginación es por clave: el lote siguiente empieza tras 'after'.
+
+        Args:
+            prefix (str): Carpeta, p. ej. "TVs/Samsung" ('' = raíz).
+            limit (int): Hijos como máximo (-1 = todos).
+            after (str, opcional): Último hijo del lote anterior.
+
+        Returns:
+            list: (nombre, clave o None si es carpeta, número) en el orden de
+            las claves, carpetas y archivos mezclados. 'número' son los
+            comandos de un archivo o los archivos bajo una carpeta.
+        """
+        start = f"{prefix}/" if prefix else ''
+        end = start + '\U0010ffff'
+        if after is None:
+            bound, op = start, '>='
+        elif self.conn.execute("SELECT 1 FROM files WHERE path = ?", (start + after,)).fetchone():
+            bound, op = start + after, '>'
+        else:
+            bound, op = start + after + '/\U0010ffff', '>'
+
+        children = []
+        while len(children) != limit:
+            row = self.conn.execute(
+                f"SELECT path FROM files WHERE path {op} ? AND path < ? ORDER BY path LIMIT 1",
+                (bound, end)).fetchone()
+            if row is None:
+                break
+            name, is_folder, _ = row[0][len(start):].partition('/')
+            op = '>'
+            if not is_folder:
+                bound = row[0]
+                count = self.conn.execute(
+                    "SELECT s.n_commands FROM files f JOIN command_sets s ON s.id = f.set_id "
+                    "WHERE f.path = ?", (bound,)).fetchone()[0]
+                children.append((name, bound, count))
+                continue
+            folder = start + name + '/'
+            bound = folder + '\U0010ffff'
+            if not name:
+                continue  # claves absolutas (archivos fuera del IRDB) en la raíz
+            count = self.conn.execute(
+                "SELECT COUNT(*) FROM files WHERE path >= ? AND path < ?",
+                (folder, bound)).fetchone()[0]
+            children.append((name, None, count))
+        return children
+
+    def files_with_command_names(self):
+        """
+        Todos los archivos del índice con los nombres de sus botones.
+
+        Los nombres se leen una vez por conjunto de comandos, no por archivo.
+
+        Yields:
+            tuple: (clave, lista de nombres), por orden de clave.
+        """
+        names_by_set = {}
+        for set_id, name in self.conn.execute(
+                "SELECT DISTINCT set_id, name FROM commands WHERE name IS NOT NULL"):
+            names_by_set.setdefault(set_id, []).append(name)
+        for set_id, key in self.conn.execute("SELECT set_id, path FROM files ORDER BY path"):
+            yield key, names_by_set.get(set_id, [])
+
+    def command_names(self):
+        """Nombres de botón distintos de todo el índice."""
+        return [name for (name,) in self.conn.execute(
+            "SELECT DISTINCT name FROM commands WHERE name IS NOT NULL")]
+
+    def signals_for_names(self, names):
+        """
+        Señales distintas de los botones llamados 'names', de la más a la
+        menos usada.
+
+        Returns:
+            list: (IRCommand, archivos que la usan). El nombre del IRCommand es
+            uno cualquiera de los que tiene la señal y el protocolo, el canónico.
+        """
+        names = list(names)
+        if not names:
+            return []
+        rows = self.conn.execute(
+            f"SELECT MIN(c.name), {', '.join('s.' + k for k in SIGNAL_FIELDS)}, "
+            "COUNT(DISTINCT f.id) AS n_files "
+            "FROM commands c JOIN signals s ON s.id = c.signal_id "
+            "JOIN files f ON f.set_id = c.set_id "
+            f"WHERE c.name IN ({', '.join('?' * len(names))}) "
+            "GROUP BY s.id ORDER BY n_files DESC, s.id", names)
+        result = []
+        for *fields, n_files in rows:
+            cmd = IRCommand(*fields)
+            if cmd.data is not None:
+                cmd.data = array('I', cmd.data)
+            result.append((cmd, n_files))
+        return result
+
+    def dedup_stats(self):
+        """Archivos, conjuntos únicos, comandos referenciados y señales únicas."""
+        def count(sql):
+            return self.conn.execute(sql).fetchone()[0]
+
+        return {
+            'files': count("SELECT COUNT(*) FROM files"),
+            'command_sets': count("SELECT COUNT(*) FROM command_sets"),
+            'commands': count("SELECT COALESCE(SUM(s.n_commands), 0) FROM files f "
+                              "JOIN command_sets s ON s.id = f.set_id"),
+            'signals': count("SELECT COUNT(*) FROM signals"),
+        }
+
+    def update(self, progress=None):
+        """
+        Actualiza el índice de forma incremental.
+
+        Solo se analizan los archivos nuevos o modificados, y se eliminan las
+        entradas de archivos que ya no existen. Se hace commit cada
+        UPDATE_BATCH archivos, así otras conexiones pueden leer y escribir
+        entre lotes.
+
+        Args:
+            progress (callable, opcional): se llama con (procesados, actualizados)
+                tras cada commit.
+
+        Returns:
+            tuple: (archivos actualizados, archivos eliminados)
+        """
+        known = self.known_files()
+        seen = set()
+        updated = 0
+
+        for i, (key, path, st) in enumerate(self.iter_ir_files(), 1):
+            seen.add(key)
+            if known.get(key) != (st.st_mtime_ns, st.st_size):
+                self.store(key, st, parse_ir_file(path))
+                updated += 1
+            if i % UPDATE_BATCH == 0:
+                self.conn.commit()
+                if progress:
+                    progress(i, updated)
+
+        removed = [key for key in known if key not in seen]
+        self.remove(removed)
+        if updated or removed:
+            self.prune()
+        self.conn.commit()
+        return updated, len(removed)
+
+    def close(self):
+        self.conn.close()
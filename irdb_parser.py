@@ -1,55 +1,165 @@
 import os
+from array import array
+
+
+class IRCommand:
+    """
+    Comando IR compacto tal como aparece en un archivo .ir de Flipper Zero.
+
+    La dirección y el comando ya vienen decodificados a enteros (los bytes del
+    archivo están en Little Endian: "34 12 00 00" -> 0x1234) y los tiempos de
+    las señales 'raw' se guardan en un array('I') en lugar de una cadena.
+    """
+    __slots__ = ('name', 'type', 'protocol', 'address', 'command',
+                 'frequency', 'duty_cycle', 'data')
+
+    def __init__(self, name, type=None, protocol=None, address=None, command=None,
+                 frequency=None, duty_cycle=None, data=None):
+        self.name = name
+        self.type = type
+        self.protocol = protocol
+        self.address = address
+        self.command = command
+        self.frequency = frequency
+        self.duty_cycle = duty_cycle
+        self.data = data
+
+    @property
+    def is_raw(self):
+        return self.type == 'raw'
+
+    def __eq__(self, other):
+        if not isinstance(other, IRCommand):
+            return NotImplemented
+        return all(getattr(self, k) == getattr(other, k) for k in self.__slots__)
+
+    def __repr__(self):
+        if self.is_raw:
+            n = len(self.data) if self.data is not None else 0
+            return f"IRCommand({self.name!r}, raw, {self.frequency} Hz, {n} tiempos)"
+        return (f"IRCommand({self.name!r}, {self.protocol}, "
+                f"address=0x{self.address or 0:X}, command=0x{self.command or 0:X})")
+
+
+def decode_le_hex(value):
+    """Convierte "34 12 00 00" (Little Endian) en 0x1234. None si no es válido."""
+    try:
+        return int.from_bytes(bytes.fromhex(value), 'little')
+    except ValueError:
+        return None
+
+
+def decode_timings(value):
+    """Convierte la línea 'data:' de una señal raw en un array('I') de microsegundos."""
+    try:
+        return array('I', map(int, value.split()))
+    except (ValueError, OverflowError):
+        return None
+
+
+def _to_number(cast, value):
+    try:
+        return cast(value)
+    except ValueError:
+        return None
+
+
+# Decodificador por clave; las claves no listadas se ignoran (Filetype, Version...)
+FIELD_DECODERS = {
+    'type': str,
+    'protocol': str,
+    'address': decode_le_hex,
+    'command': decode_le_hex,
+    'frequency': lambda v: _to_number(int, v),
+    'duty_cycle': lambda v: _to_number(float, v),
+    'data': decode_timings,
+}
+
+
+def iter_ir_file(file_path):
+    """
+    Lee un archivo .ir línea a línea y va generando sus comandos.
+
+    A diferencia de parse_ir_file, no carga el archivo completo en memoria:
+    cada IRCommand se entrega en cuanto aparece el 'name:' del siguiente.
+
+    Args:
+        file_path (str): La ruta al archivo .ir.
+
+    Yields:
+        IRCommand: Cada comando del archivo, en orden.
+    """
+    current = None
+
+    with open(file_path, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+
+            key, sep, value = line.partition(':')
+            if not sep:
+                continue
+            key = key.strip()
+            value = value.strip()
+
+            if key == 'name':
+                if current is not None:
+                    yield current
+                current = IRCommand(value)
+            elif current is not None:
+                decoder = FIELD_DECODERS.get(key)
+                if decoder:
+                    setattr(current, key, decoder(value))
+
+    if current is not None:
+        yield current
+
+
+def validate_command(cmd):
+    """
+    Comprueba que un comando se pueda enviar.
+
+    Returns:
+        str: Descripción del problema, o None si el comando es válido.
+    """
+    if not cmd.name:
+        return "comando sin nombre"
+    if cmd.type == 'parsed':
+        if not cmd.protocol:
+            return f"{cmd.name}: falta 'protocol'"
+        if cmd.address is None or cmd.command is None:
+            return f"{cmd.name}: 'address'/'command' ausente o mal formado"
+    elif cmd.type == 'raw':
+        if not cmd.frequency:
+            return f"{cmd.name}: falta 'frequency'"
+        if not cmd.data:
+            return f"{cmd.name}: 'data' vacío o mal formado"
+    else:
+        return f"{cmd.name}: tipo desconocido {cmd.type!r}"
+    return None
+
 
 def parse_ir_file(file_path):
     """
     Analiza un archivo .ir de Flipper Zero y devuelve una lista de comandos.
-    
+
     Args:
         file_path (str): La ruta al archivo .ir.
-        
+
     Returns:
-        list: Una lista de diccionarios, donde cada diccionario representa un comando
-              y contiene claves como 'name', 'type', 'protocol', 'address', 'command'.
+        list: Una lista de IRCommand con 'name', 'type', 'protocol', 'address',
+              'command' y, para señales raw, 'frequency', 'duty_cycle' y 'data'.
     """
-    commands = []
-    current_command = {}
-    
     if not os.path.exists(file_path):
         return []
 
     try:
-        with open(file_path, 'r', encoding='utf-8') as f:
-            lines = f.readlines()
-            
-        for line in lines:
-            line = line.strip()
-            if not line or line.startswith('#'):
-                continue
-                
-            if ':' in line:
-                key, value = line.split(':', 1)
-                key = key.strip()
-                value = value.strip()
-                
-                if key == 'name':
-                    if current_command:
-                        commands.append(current_command)
-                    current_command = {}
-                    current_command['name'] = value
-                else:
-                    if current_command is not None:
-                         current_command[key] = value
-                         
-        # Append the last command if exists
-        if current_command:
-            commands.append(current_command)
-            
+        return list(iter_ir_file(file_path))
     except Exception as e:
         print(f"Error parsing file {file_path}: {e}")
         return []
 
-    return commands
-
 if __name__ == "__main__":
     # Test with a dummy file or path if needed
     pass
@@ -0,0 +1,123 @@
+import re
+import unicodedata
+from bisect import bisect_left
+
+# Peso de cada campo al puntuar una coincidencia
+FIELD_WEIGHTS = {
+    'model': 5,
+    'brand': 4,
+    'path': 3,
+    'category': 2,
+    'command': 1,
+}
+
+# Bonificación cuando el término coincide entero y no solo como prefijo
+EXACT_BONUS = 1.5
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+
+def tokenize(text):
+    """Minúsculas, sin acentos, separado por cualquier carácter no alfanumérico."""
+    text = unicodedata.normalize('NFKD', text)
+    text = ''.join(c for c in text if not unicodedata.combining(c))
+    return _TOKEN_RE.findall(text.lower())
+
+
+def describe_key(key):
+    """
+    Divide la clave de un archivo del IRDB ("TVs/Samsung/UE40.ir") en sus partes.
+
+    Returns:
+        dict: 'category', 'brand', 'path' (carpetas intermedias) y 'model'.
+    """
+    parts = key.split('/')
+    model = parts[-1][:-3] if parts[-1].endswith('.ir') else parts[-1]
+    dirs = parts[:-1]
+    return {
+        'category': dirs[0] if len(dirs) > 0 else '',
+        'brand': dirs[1] if len(dirs) > 1 else '',
+        'path': ' '.join(dirs[2:]),
+        'model': model,
+    }
+
+
+class DeviceSearch:
+    """
+    Buscador en memoria sobre categoría, marca, modelo y nombres de comando.
+
+    Índice invertido término -> {dispositivo: peso} más una lista ordenada de
+    términos para resolver prefijos con búsqueda binaria, de modo que cada
+    consulta cuesta lo que sus coincidencias y no lo que el árbol del IRDB.
+    """
+
+    def __init__(self):
+        self.keys = []
+        self.postings = {}
+        self.terms = []
+
+    @classmethod
+    def from_index(cls, ir_index):
+        """Construye el buscador a partir de un IRDBIndex ya actualizado."""
+        search = cls()
+        for key, command_names in ir_index.files_with_command_names():
+            search.add(key, command_names)
+        search.finalize()
+        return search
+
+    def add(self, key, command_names=()):
+        """Añade un dispositivo. Llamar a finalize() al terminar de añadir."""
+        doc = len(self.keys)
+        self.keys.append(key)
+
+        fields = describe_key(key)
+        fields['command'] = ' '.join(command_names)
+        for field, text in fields.items():
+            weight = FIELD_WEIGHTS[field]
+            for token in tokenize(text):
+                docs = self.postings.setdefault(token, {})
+                if docs.get(doc, 0) < weight:
+                    docs[doc] = weight
+
+    def finalize(self):
+        self.terms = sorted(self.postings)
+
+    def _expand(self, prefix):
+        """Términos del índice que empiezan por 'prefix'."""
+        i = bisect_left(self.terms, prefix)
+        while i < len(self.terms) and self.terms[i].startswith(prefix):
+            yield self.terms[i]
+            i += 1
+
+    def search(self, query, limit=200):
+        """
+        Busca dispositivos cuyo texto contenga todos los términos de la consulta
+        (cada término puede ser un prefijo).
+
+        Returns:
+            list: Claves del índice ordenadas de mayor a menor puntuación.
+        """
+        scores = None
+        for qtoken in tokenize(query):
+            token_scores = {}
+            for term in self._expand(qtoken):
+                bonus = EXACT_BONUS if term == qtoken else 1.0
+                for doc, weight in self.postings[term].items():
+                    score = weight * bonus
+                    if token_scores.get(doc, 0) < score:
+                        token_scores[doc] = score
+
+            if scores is None:
+                scores = token_scores
+            else:
+                scores = {doc: s + token_scores[doc] for doc, s in scores.items()
+                          if doc in token_scores}
+            if not scores:
+                return []
+
+        if not scores:
+            return []
+
+        # Mayor puntuación primero; a igualdad, nombres más cortos (más específicos)
+        ranked = sorted(scores, key=lambda d: (-scores[d], len(self.keys[d]), self.keys[d]))
+        return [self.keys[d] for d in ranked[:limit]]
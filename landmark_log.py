@@ -0,0 +1,121 @@
+"""
+Grabación y reproducción de landmarks de mano.
+
+Formato (.lmk): cabecera de 16 bytes seguida de registros de tamaño fijo
+(timestamp float64 + 21 x 3 float32), de modo que el archivo se puede ir
+ampliando mientras se graba y leerse después como un np.memmap sin copiarlo.
+Un fotograma sin mano se guarda con NaN para conservar la cadencia original.
+"""
+import struct
+import time
+
+import numpy as np
+
+from gestures import NUM_LANDMARKS, landmarks_to_array
+
+MAGIC = b"LMKLOG01"
+HEADER = struct.Struct("<8sII")  # magic, puntos por mano, reservado
+HEADER_SIZE = HEADER.size
+
+RECORD_DTYPE = np.dtype([
+    ('t', '<f8'),
+    ('hand', '<f4', (NUM_LANDMARKS, 3)),
+])
+
+# Registros acumulados antes de volcar al disco
+FLUSH_EVERY = 30
+
+
+class LandmarkRecorder:
+    """Añade fotogramas de landmarks a un archivo .lmk."""
+
+    def __init__(self, path):
+        self.path = path
+        self.f = open(path, 'wb')
+        self.f.write(HEADER.pack(MAGIC, NUM_LANDMARKS, 0))
+        self.frames = 0
+        self._record = np.zeros(1, dtype=RECORD_DTYPE)
+
+    def write(self, timestamp, landmarks=None):
+        """
+        Guarda un fotograma.
+
+        Args:
+            timestamp (float): Instante de captura en segundos.
+            landmarks: hand_landmarks.landmark de MediaPipe, array (21, 3) o None.
+        """
+        record = self._record
+        record['t'] = timestamp
+        if landmarks is None:
+            record['hand'] = np.nan
+        elif isinstance(landmarks, np.ndarray):
+            record['hand'] = landmarks
+        else:
+            record['hand'] = landmarks_to_array(landmarks)
+        self.f.write(record.tobytes())
+
+        self.frames += 1
+        if self.frames % FLUSH_EVERY == 0:
+            self.f.flush()
+
+    def close(self):
+        self.f.close()
+
+
+class LandmarkReplay:
+    """Lectura de un archivo .lmk mapeado en memoria."""
+
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            magic, n_points, _ = HEADER.unpack(f.read(HEADER_SIZE))
+            f.seek(0, 2)
+            size = f.tell()
+        if magic != MAGIC or n_points != NUM_LANDMARKS:
+            raise ValueError(f"{path} no es un archivo de landmarks válido")
+
+        # Ignorar un último registro incompleto (grabación interrumpida)
+        count = (size - HEADER_SIZE) // RECORD_DTYPE.itemsize
+        if count:
+            self.records = np.memmap(path, dtype=RECORD_DTYPE, mode='r',
+                                     offset=HEADER_SIZE, shape=(count,))
+        else:
+            self.records = np.zeros(0, dtype=RECORD_DTYPE)
+
+    def __len__(self):
+        return len(self.records)
+
+    @property
+    def timestamps(self):
+        return self.records['t']
+
+    @property
+    def hands(self):
+        """Array (N, 21, 3); las filas sin mano contienen NaN."""
+        return self.records['hand']
+
+    def fps(self):
+        """Cadencia media de la grabación."""
+        t = self.timestamps
+        if len(t) < 2 or t[-1] == t[0]:
+            return 0.0
+        return (len(t) - 1) / float(t[-1] - t[0])
+
+    def frames(self, realtime=False, speed=1.0):
+        """
+        Genera (timestamp, array (21, 3) o None) para cada fotograma.
+
+        Args:
+            realtime (bool): Respetar los intervalos originales (escalados por
+                'speed'); si es False, se entrega todo a máxima velocidad.
+        """
+        start_wall = time.perf_counter()
+        start_t = float(self.timestamps[0]) if len(self) else 0.0
+
+        for record in self.records:
+            t = float(record['t'])
+            if realtime:
+                delay = (t - start_t) / speed - (time.perf_counter() - start_wall)
+                if delay > 0:
+                    time.sleep(delay)
+            hand = record['hand']
+            yield t, (None if np.isnan(hand).any() else hand)
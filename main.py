@@ -1,11 +1,18 @@
+import time
+START = time.perf_counter()  # Referencia para las marcas del arranque
+
 import sys
 from PyQt6.QtWidgets import QApplication
+from pipeline_metrics import StartupTimeline
 from gui_app import MainWindow
 
 def main():
+    timeline = StartupTimeline(START)
+    timeline.mark('imports')
     app = QApplication(sys.argv)
-    window = MainWindow()
+    window = MainWindow(timeline)
     window.show()
+    timeline.mark('window_shown')
     sys.exit(app.exec())
 
 if __name__ == "__main__":
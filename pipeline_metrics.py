@@ -0,0 +1,239 @@
+import csv
+import json
+import math
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# Número de muestras recientes por etapa sobre las que se calculan percentiles
+DEFAULT_WINDOW = 300
+
+PERCENTILES = (50, 95, 99)
+
+# Si está definida, la interfaz guarda en ese JSON las marcas del arranque y se
+# cierra al tener primer fotograma y búsqueda lista (ver benchmark_startup.py)
+STARTUP_BENCHMARK_ENV = "REMOTEIRHAND_STARTUP_JSON"
+
+
+class RollingStat:
+    """Ventana deslizante de duraciones (segundos) de una etapa."""
+
+    def __init__(self, window=DEFAULT_WINDOW):
+        self.samples = deque(maxlen=window)
+        self.total = 0
+
+    def add(self, seconds):
+        self.samples.append(seconds)
+        self.total += 1
+
+    def summary(self):
+        values = sorted(self.samples)
+        result = {'count': self.total}
+        if not values:
+            return result
+        n = len(values)
+        for p in PERCENTILES:
+            # Percentil por rango más cercano, en milisegundos
+            idx = min(n - 1, max(0, math.ceil(p / 100 * n) - 1))
+            result[f'p{p}_ms'] = values[idx] * 1000
+        result['mean_ms'] = sum(values) / n * 1000
+        return result
+
+
+def process_memory():
+    """
+    Memoria del proceso en MB: (residente actual, máximo residente). Cada valor
+    es None si la plataforma no lo ofrece (/proc solo existe en Linux).
+    """
+    rss = peak = None
+    try:
+        with open('/proc/self/statm', 'r') as f:
+            rss = int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 2**20
+    except (OSError, ValueError, IndexError, AttributeError):
+        pass
+    if resource is not None:
+        # ru_maxrss viene en KB en Linux y en bytes en macOS
+        maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        peak = maxrss / 2**20 if os.uname().sysname == 'Darwin' else maxrss / 2**10
+    return rss, peak
+
+
+class PipelineMetrics:
+    """
+    Instrumentación del pipeline de gestos: latencias por etapa (p50/p95/p99),
+    contadores de fotogramas y FPS. Se puede alimentar desde varios hilos.
+    """
+
+    def __init__(self, window=DEFAULT_WINDOW):
+        self.window = window
+        self.stages = {}
+        self.counters = {}
+        self._frame_times = deque(maxlen=window)
+        self._lock = threading.Lock()
+        self._start_cpu = self._last_cpu = (time.perf_counter(), time.process_time())
+
+    def record(self, stage, seconds):
+        with self._lock:
+            stat = self.stages.get(stage)
+            if stat is None:
+                stat = self.stages[stage] = RollingStat(self.window)
+            stat.add(seconds)
+
+    @contextmanager
+    def time(self, stage):
+        """Mide el bloque 'with' como una muestra de 'stage'."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(stage, time.perf_counter() - start)
+
+    def count(self, name, n=1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def frame_done(self):
+        """Marca un fotograma procesado (para el cálculo de FPS)."""
+        now = time.perf_counter()
+        with self._lock:
+            self._frame_times.append(now)
+            self.counters['frames_processed'] = self.counters.get('frames_processed', 0) + 1
+
+    def fps(self):
+        with self._lock:
+            times = list(self._frame_times)
+        if len(times) < 2 or times[-1] == times[0]:
+            return 0.0
+        return (len(times) - 1) / (times[-1] - times[0])
+
+    def process_usage(self, advance=False):
+        """
+        CPU del proceso (todos los hilos, % de un núcleo) reciente y de media
+        desde que se crearon las métricas, y memoria residente actual y máxima
+        en MB.
+
+        Args:
+            advance (bool): Empezar aquí la siguiente ventana de CPU reciente.
+                Solo lo hace el refresco periódico de la barra de estado, así
+                las exportaciones no acortan la ventana que se muestra.
+        """
+        def cpu_percent(since):
+            wall, cpu = now
+            return (cpu - since[1]) / (wall - since[0]) * 100 if wall > since[0] else 0.0
+
+        now = (time.perf_counter(), time.process_time())
+        with self._lock:
+            recent = cpu_percent(self._last_cpu)
+            if advance:
+                self._last_cpu = now
+        rss, peak = process_memory()
+        return {
+            'cpu_percent': recent,
+            'cpu_percent_avg': cpu_percent(self._start_cpu),
+            'rss_mb': rss,
+            'max_rss_mb': peak,
+        }
+
+    def snapshot(self, advance_cpu=False):
+        """Estado actual como diccionario serializable (ver process_usage)."""
+        fps = self.fps()
+        process = self.process_usage(advance_cpu)
+        with self._lock:
+            return {
+                'timestamp': time.time(),
+                'fps': fps,
+                'process': process,
+                'counters': dict(self.counters),
+                'stages': {name: stat.summary() for name, stat in self.stages.items()},
+            }
+
+    def dump_json(self, path):
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.snapshot(), f, indent=2)
+
+    def dump_csv(self, path):
+        """Una fila por etapa con sus percentiles; contadores y FPS como filas extra."""
+        snap = self.snapshot()
+        columns = ['stage', 'count'] + [f'p{p}_ms' for p in PERCENTILES] + ['mean_ms']
+        with open(path, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.writer(f)
+            writer.writerow(columns)
+            for name, summary in sorted(snap['stages'].items()):
+                writer.writerow([name] + [summary.get(c, '') for c in columns[1:]])
+            writer.writerow([])
+            writer.writerow(['counter', 'value'])
+            writer.writerow(['fps', f"{snap['fps']:.2f}"])
+            for name, value in snap['process'].items():
+                writer.writerow([name, '' if value is None else f"{value:.1f}"])
+            for name, value in sorted(snap['counters'].items()):
+                writer.writerow([name, value])
+
+    def dump(self, path):
+        """Exporta a CSV si la extensión es .csv; si no, a JSON."""
+        if path.lower().endswith('.csv'):
+            self.dump_csv(path)
+        else:
+            self.dump_json(path)
+
+
+class StartupTimeline:
+    """
+    Marcas del arranque de la aplicación, en segundos desde 'origin'
+    (time.perf_counter() tomado lo antes posible en main.py).
+
+    Solo cuenta la primera vez que se alcanza cada marca.
+    """
+
+    def __init__(self, origin=None):
+        self.origin = time.perf_counter() if origin is None else origin
+        self.marks = {}
+        self._lock = threading.Lock()
+
+    def mark(self, name):
+        """Registra 'name' si es la primera vez. Devuelve True si era nueva."""
+        elapsed = time.perf_counter() - self.origin
+        with self._lock:
+            if name in self.marks:
+                return False
+            self.marks[name] = elapsed
+            return True
+
+    def has(self, *names):
+        with self._lock:
+            return all(name in self.marks for name in names)
+
+    def as_dict(self):
+        with self._lock:
+            return dict(self.marks)
+
+    def dump_json(self, path):
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.as_dict(), f, indent=2)
+
+
+def format_summary(snapshot):
+    """Línea corta para mostrar en la barra de estado de la UI."""
+    stages = snapshot['stages']
+    counters = snapshot['counters']
+    parts = [f"FPS {snapshot['fps']:.1f}"]
+    for name, label in (('hands', 'MediaPipe'), ('classify', 'gesto'),
+                        ('render', 'render'), ('gesture_to_serial', 'gesto→serial')):
+        s = stages.get(name)
+        if s and 'p50_ms' in s:
+            parts.append(f"{label} p50 {s['p50_ms']:.1f} / p95 {s['p95_ms']:.1f} ms")
+    parts.append(f"descartados {counters.get('frames_dropped', 0)}"
+                 f"/{counters.get('frames_captured', 0)}")
+    process = snapshot.get('process')
+    if process:
+        usage = f"CPU {process['cpu_percent']:.0f}%"
+        if process['rss_mb'] is not None:
+            usage += f" RSS {process['rss_mb']:.0f} MB"
+        parts.append(usage)
+    return " | ".join(parts)
@@ -8,6 +8,17 @@
  * Instalar desde: Sketch → Include Library → Manage Libraries → "IRremote"
  * 
  * Soporta comandos extendidos: !PROTOCOLO:ADDRESS:COMMAND
+ * Identificación para el host: "?" -> "ID:IRHAND:<versión>"
+ *
+ * Protocolo binario (v2, ver ir_protocol.py en el host):
+ *   0xA5 | tipo | seq | len | payload | CRC-16/CCITT-FALSE (LE)
+ *   Tipo 0x01 (enviar IR): protocolo u8, dirección u32 LE, comando u32 LE
+ *   Respuesta 0x81 (ACK): estado u8 con el mismo seq
+ *
+ * Señales raw (v3): tabla de duraciones + índices de 4/8 bits
+ *   0x02 RAW_BEGIN: kHz u8, tiempos u16, bits u8, n u8, tabla n x u16
+ *   0x03 RAW_CHUNK: posición u16, índices empaquetados (nibble bajo primero)
+ *   0x04 RAW_END:   emite la señal
  */
 
 #include <Arduino.h>
@@ -17,6 +28,58 @@
 const uint8_t IR_SEND_PIN = 4;  // Pin del LED IR (GPIO4)
 const uint32_t BAUD_RATE = 115200;
 
+// --- Identificación (handshake con el host Python) ---
+const char* FIRMWARE_ID = "IRHAND";
+const int FIRMWARE_VERSION = 3;
+
+// --- Protocolo binario ---
+const uint8_t FRAME_SOF = 0xA5;
+const uint8_t FRAME_IR_SEND = 0x01;
+const uint8_t FRAME_RAW_BEGIN = 0x02;
+const uint8_t FRAME_RAW_CHUNK = 0x03;
+const uint8_t FRAME_RAW_END = 0x04;
+const uint8_t FRAME_ACK = 0x81;
+const uint8_t ACK_OK = 0;
+const uint8_t ACK_UNKNOWN_PROTOCOL = 1;
+const uint8_t ACK_BAD_LENGTH = 2;
+const uint8_t ACK_TOO_LONG = 3;
+const uint8_t ACK_BAD_SEQUENCE = 4;
+const uint8_t IR_SEND_PAYLOAD_LEN = 9;
+const unsigned long FRAME_TIMEOUT_MS = 20;
+
+// --- Señal raw en recepción (se expande directamente en rawBuffer) ---
+const uint16_t RAW_MAX_TIMINGS = 1024;
+uint16_t rawBuffer[RAW_MAX_TIMINGS];
+uint16_t rawTable[255];
+uint8_t rawTableLen = 0;
+uint8_t rawBits = 4;
+uint8_t rawKhz = 38;
+uint16_t rawCount = 0;
+uint16_t rawReceived = 0;
+bool rawActive = false;
+
+// Identificadores de protocolo (mismos valores que PROTOCOL_IDS en ir_protocol.py)
+enum ProtocolId : uint8_t {
+  PROTO_UNKNOWN = 0,
+  PROTO_NEC = 1,
+  PROTO_NECEXT = 2,
+  PROTO_NEC42 = 3,
+  PROTO_RC5 = 4,
+  PROTO_RC5X = 5,
+  PROTO_RC6 = 6,
+  PROTO_SAMSUNG32 = 7,
+  PROTO_SIRC = 8,
+  PROTO_SIRC15 = 9,
+  PROTO_SIRC20 = 10,
+  PROTO_KASEIKYO = 11,
+  PROTO_RCA = 12,
+  PROTO_PIONEER = 13,
+  PROTO_LG = 14,
+  PROTO_JVC = 15,
+  PROTO_SHARP = 16,
+  PROTO_DENON = 17
+};
+
 // --- Default Samsung IR Codes (fallback) ---
 // Samsung TV usa Address 0x07, pero algunos modelos usan 0xE0E0
 // Probado con códigos universales de Samsung
@@ -41,10 +104,101 @@ uint32_t hexStringToUint(String hexStr) {
   return strtoul(hexStr.c_str(), NULL, 16);
 }
 
-// --- Send IR based on protocol ---
+// --- Protocol name (text commands) -> ProtocolId ---
+uint8_t protocolIdFromName(String protocol) {
+  protocol.toUpperCase();
+  if (protocol == "NECEXT" || protocol == "NEC2" || protocol == "NECX") return PROTO_NECEXT;
+  if (protocol == "NEC" || protocol == "NEC1") return PROTO_NEC;
+  if (protocol == "NEC42") return PROTO_NEC42;
+  if (protocol == "RC5") return PROTO_RC5;
+  if (protocol == "RC5X") return PROTO_RC5X;
+  if (protocol == "RC6") return PROTO_RC6;
+  if (protocol == "SAMSUNG" || protocol == "SAMSUNG32") return PROTO_SAMSUNG32;
+  if (protocol == "SIRC" || protocol == "SIRC12" || protocol == "SONY12") return PROTO_SIRC;
+  if (protocol == "SIRC15" || protocol == "SONY15") return PROTO_SIRC15;
+  if (protocol == "SIRC20" || protocol == "SONY20" || protocol == "SONY") return PROTO_SIRC20;
+  if (protocol == "KASEIKYO" || protocol == "PANASONIC" || protocol == "KASEIKYO_DENON") return PROTO_KASEIKYO;
+  if (protocol == "LG" || protocol == "LG32") return PROTO_LG;
+  if (protocol == "RCA") return PROTO_RCA;
+  if (protocol == "PIONEER") return PROTO_PIONEER;
+  if (protocol == "JVC") return PROTO_JVC;
+  if (protocol == "SHARP") return PROTO_SHARP;
+  if (protocol == "DENON") return PROTO_DENON;
+  return PROTO_UNKNOWN;
+}
+
+// --- Send IR based on protocol id ---
 // Supports all protocols found in IRDB:
 // NECext (143816), NEC (8862), RC5 (7589), Samsung32 (2309), Kaseikyo (1543)
 // SIRC/SIRC15/SIRC20 (2605), RC6 (894), RCA (279), RC5X (190), Pioneer (154), NEC42 (124)
+// Returns false if the protocol id is unknown (nothing is sent).
+bool sendIRById(uint8_t protocolId, uint32_t address, uint32_t command) {
+  switch (protocolId) {
+    // === NEC Family (most common) ===
+    case PROTO_NECEXT:   // NECext: 16-bit address, 8-bit command (most used in IRDB)
+    case PROTO_NEC:
+    case PROTO_NEC42:    // NEC with 42-bit format - use standard NEC
+    case PROTO_RCA:      // RCA protocol - use NEC as fallback (similar timing)
+    case PROTO_PIONEER:  // Pioneer uses NEC protocol with specific timing
+      IrSender.sendNEC(address, command, 0);
+      return true;
+
+    // === RC5/RC6 Family ===
+    case PROTO_RC5:
+    case PROTO_RC5X:     // RC5 extended - use RC5 with toggle bit
+      IrSender.sendRC5(address, command, 0);
+      return true;
+    case PROTO_RC6:
+      IrSender.sendRC6(address, command, 0);
+      return true;
+
+    // === Samsung ===
+    case PROTO_SAMSUNG32:
+      IrSender.sendSamsung(address, command, 0);
+      return true;
+
+    // === Sony SIRC Family ===
+    case PROTO_SIRC:
+      IrSender.sendSony(address, command, 0, 12);  // 12 bits
+      return true;
+    case PROTO_SIRC15:
+      IrSender.sendSony(address, command, 0, 15);  // 15 bits
+      return true;
+    case PROTO_SIRC20:
+      IrSender.sendSony(address, command, 0, 20);  // 20 bits
+      return true;
+
+    // === Kaseikyo / Panasonic ===
+    case PROTO_KASEIKYO:
+      IrSender.sendKaseikyo(address, command, 0, 0);  // vendorID = 0
+      return true;
+
+    // === LG ===
+    case PROTO_LG:
+      IrSender.sendLG(address, command, 0);
+      return true;
+
+    // === JVC ===
+    case PROTO_JVC:
+      IrSender.sendJVC((uint8_t)address, (uint8_t)command, 0);
+      return true;
+
+    // === Sharp ===
+    case PROTO_SHARP:
+      IrSender.sendSharp(address, command, 0);
+      return true;
+
+    // === Denon ===
+    case PROTO_DENON:
+      IrSender.sendDenon(address, command, 0);
+      return true;
+
+    default:
+      return false;
+  }
+}
+
+// --- Send IR based on protocol name (text commands) ---
 void sendIRCommand(String protocol, uint32_t address, uint32_t command) {
   protocol.toUpperCase();
   
@@ -55,89 +209,151 @@ void sendIRCommand(String protocol, uint32_t address, uint32_t command) {
   Serial.print(" C:0x");
   Serial.println(command, HEX);
   
-  // === NEC Family (most common) ===
-  if (protocol == "NECEXT" || protocol == "NEC2" || protocol == "NECX") {
-    // NECext: 16-bit address, 8-bit command (most used in IRDB)
-    IrSender.sendNEC(address, command, 0);
-  }
-  else if (protocol == "NEC" || protocol == "NEC1") {
-    IrSender.sendNEC(address, command, 0);
-  }
-  else if (protocol == "NEC42") {
-    // NEC with 42-bit format - use standard NEC
+  // === Default: NEC (most compatible) ===
+  if (!sendIRById(protocolIdFromName(protocol), address, command)) {
+    Serial.print("Protocolo desconocido: ");
+    Serial.println(protocol);
     IrSender.sendNEC(address, command, 0);
   }
-  
-  // === RC5/RC6 Family ===
-  else if (protocol == "RC5") {
-    IrSender.sendRC5(address, command, 0);
-  }
-  else if (protocol == "RC5X") {
-    // RC5 extended - use RC5 with toggle bit
-    IrSender.sendRC5(address, command, 0);
-  }
-  else if (protocol == "RC6") {
-    IrSender.sendRC6(address, command, 0);
-  }
-  
-  // === Samsung ===
-  else if (protocol == "SAMSUNG" || protocol == "SAMSUNG32") {
-    IrSender.sendSamsung(address, command, 0);
-  }
-  
-  // === Sony SIRC Family ===
-  else if (protocol == "SIRC" || protocol == "SIRC12" || protocol == "SONY12") {
-    IrSender.sendSony(address, command, 0, 12);  // 12 bits
-  }
-  else if (protocol == "SIRC15" || protocol == "SONY15") {
-    IrSender.sendSony(address, command, 0, 15);  // 15 bits
-  }
-  else if (protocol == "SIRC20" || protocol == "SONY20" || protocol == "SONY") {
-    IrSender.sendSony(address, command, 0, 20);  // 20 bits
-  }
-  
-  // === Kaseikyo / Panasonic ===
-  else if (protocol == "KASEIKYO" || protocol == "PANASONIC" || protocol == "KASEIKYO_DENON") {
-    IrSender.sendKaseikyo(address, command, 0, 0);  // vendorID = 0
-  }
-  
-  // === LG ===
-  else if (protocol == "LG" || protocol == "LG32") {
-    IrSender.sendLG(address, command, 0);
+}
+
+// --- CRC-16/CCITT-FALSE (same as crc16() in ir_protocol.py) ---
+uint16_t crc16(const uint8_t* data, size_t len, uint16_t crc = 0xFFFF) {
+  for (size_t i = 0; i < len; i++) {
+    crc ^= (uint16_t)data[i] << 8;
+    for (uint8_t b = 0; b < 8; b++) {
+      crc = (crc & 0x8000) ? (crc << 1) ^ 0x1021 : (crc << 1);
+    }
   }
-  
-  // === RCA ===
-  else if (protocol == "RCA") {
-    // RCA protocol - use NEC as fallback (similar timing)
-    IrSender.sendNEC(address, command, 0);
+  return crc;
+}
+
+uint32_t readUint32LE(const uint8_t* p) {
+  return (uint32_t)p[0] | ((uint32_t)p[1] << 8) | ((uint32_t)p[2] << 16) | ((uint32_t)p[3] << 24);
+}
+
+void sendFrame(uint8_t type, uint8_t seq, const uint8_t* payload, uint8_t len) {
+  uint8_t frame[4 + 255 + 2];
+  frame[0] = FRAME_SOF;
+  frame[1] = type;
+  frame[2] = seq;
+  frame[3] = len;
+  memcpy(frame + 4, payload, len);
+  uint16_t crc = crc16(frame + 1, 3 + len);
+  frame[4 + len] = crc & 0xFF;
+  frame[5 + len] = crc >> 8;
+  Serial.write(frame, 6 + len);
+}
+
+void sendAck(uint8_t seq, uint8_t status) {
+  sendFrame(FRAME_ACK, seq, &status, 1);
+}
+
+void blinkLed() {
+  digitalWrite(LED_PIN, HIGH);
+  ledTimer = millis();
+  ledOn = true;
+}
+
+// --- Raw signal frames ---
+uint8_t handleRawBegin(const uint8_t* payload, uint8_t len) {
+  if (len < 5) return ACK_BAD_LENGTH;
+  uint16_t count = payload[1] | ((uint16_t)payload[2] << 8);
+  uint8_t bits = payload[3];
+  uint8_t tableLen = payload[4];
+  if (len != 5 + 2 * tableLen || (bits != 4 && bits != 8) || tableLen == 0) return ACK_BAD_LENGTH;
+  if (count == 0 || count > RAW_MAX_TIMINGS) return ACK_TOO_LONG;
+
+  rawKhz = payload[0];
+  rawCount = count;
+  rawBits = bits;
+  rawTableLen = tableLen;
+  for (uint8_t i = 0; i < tableLen; i++) {
+    rawTable[i] = payload[5 + 2 * i] | ((uint16_t)payload[6 + 2 * i] << 8);
   }
-  
-  // === Pioneer ===
-  else if (protocol == "PIONEER") {
-    // Pioneer uses NEC protocol with specific timing
-    IrSender.sendNEC(address, command, 0);
+  rawReceived = 0;
+  rawActive = true;
+  return ACK_OK;
+}
+
+uint8_t handleRawChunk(const uint8_t* payload, uint8_t len) {
+  if (!rawActive) return ACK_BAD_SEQUENCE;
+  if (len < 2) return ACK_BAD_LENGTH;
+  uint16_t offset = payload[0] | ((uint16_t)payload[1] << 8);
+  if (offset != rawReceived) {
+    rawActive = false;
+    return ACK_BAD_SEQUENCE;
   }
-  
-  // === JVC ===
-  else if (protocol == "JVC") {
-    IrSender.sendJVC((uint8_t)address, (uint8_t)command, 0);
+  for (uint8_t i = 2; i < len; i++) {
+    uint8_t indices[2] = {payload[i], 0};
+    uint8_t n = 1;
+    if (rawBits == 4) {
+      indices[0] = payload[i] & 0x0F;
+      indices[1] = payload[i] >> 4;
+      n = 2;
+    }
+    for (uint8_t k = 0; k < n && rawReceived < rawCount; k++) {
+      if (indices[k] >= rawTableLen) {
+        rawActive = false;
+        return ACK_BAD_LENGTH;
+      }
+      rawBuffer[rawReceived++] = rawTable[indices[k]];
+    }
   }
-  
-  // === Sharp ===
-  else if (protocol == "SHARP") {
-    IrSender.sendSharp(address, command, 0);
+  return ACK_OK;
+}
+
+uint8_t handleRawEnd() {
+  if (!rawActive || rawReceived != rawCount) {
+    rawActive = false;
+    return ACK_BAD_SEQUENCE;
   }
-  
-  // === Denon ===
-  else if (protocol == "DENON") {
-    IrSender.sendDenon(address, command, 0);
+  rawActive = false;
+  blinkLed();
+  IrSender.sendRaw(rawBuffer, rawCount, rawKhz);
+  return ACK_OK;
+}
+
+// --- Parse and handle binary frame (starts with FRAME_SOF) ---
+void handleBinaryFrame() {
+  uint8_t buf[3 + 255 + 2];  // tipo, seq, len, payload, crc
+  Serial.read();  // SOF
+
+  if (Serial.readBytes(buf, 3) != 3) return;
+  uint8_t len = buf[2];
+  if (Serial.readBytes(buf + 3, len + 2) != (size_t)(len + 2)) return;
+
+  uint16_t received = buf[3 + len] | ((uint16_t)buf[4 + len] << 8);
+  if (crc16(buf, 3 + len) != received) {
+    return;  // Trama corrupta: sin ACK, el host la da por perdida
   }
-  
-  // === Default: NEC (most compatible) ===
-  else {
-    Serial.print("Protocolo desconocido: ");
-    Serial.println(protocol);
-    IrSender.sendNEC(address, command, 0);
+
+  uint8_t type = buf[0];
+  uint8_t seq = buf[1];
+  const uint8_t* payload = buf + 3;
+
+  switch (type) {
+    case FRAME_IR_SEND: {
+      if (len != IR_SEND_PAYLOAD_LEN) {
+        sendAck(seq, ACK_BAD_LENGTH);
+        return;
+      }
+      blinkLed();
+      bool sent = sendIRById(payload[0], readUint32LE(payload + 1), readUint32LE(payload + 5));
+      sendAck(seq, sent ? ACK_OK : ACK_UNKNOWN_PROTOCOL);
+      break;
+    }
+    case FRAME_RAW_BEGIN:
+      sendAck(seq, handleRawBegin(payload, len));
+      break;
+    case FRAME_RAW_CHUNK:
+      sendAck(seq, handleRawChunk(payload, len));
+      break;
+    case FRAME_RAW_END:
+      sendAck(seq, handleRawEnd());
+      break;
+    default:
+      break;
   }
 }
 
@@ -169,9 +385,11 @@ void handleExtendedCommand(String input) {
 // --- Setup ---
 void setup() {
   Serial.begin(BAUD_RATE);
+  Serial.setTimeout(FRAME_TIMEOUT_MS);
   Serial.println("ESP32 IR Remote - Multi Protocol");
   Serial.println("Comandos simples: P, M, U, D, N, L, S");
   Serial.println("Comandos extendidos: !PROTOCOLO:ADDR:CMD");
+  Serial.println("Protocolo binario: tramas 0xA5 con ACK");
   
   IrSender.begin(IR_SEND_PIN);
   
@@ -188,10 +406,25 @@ void loop() {
   }
 
   if (Serial.available() > 0) {
+    // Binary frame: no String parsing, answered with an ACK
+    if (Serial.peek() == FRAME_SOF) {
+      handleBinaryFrame();
+      return;
+    }
+
     String input = Serial.readStringUntil('\n');
     input.trim();
 
     if (input.length() > 0) {
+      // Handshake: el host comprueba que este puerto es nuestro firmware
+      if (input == "?") {
+        Serial.print("ID:");
+        Serial.print(FIRMWARE_ID);
+        Serial.print(":");
+        Serial.println(FIRMWARE_VERSION);
+        return;
+      }
+
       // Turn on LED indicator
       digitalWrite(LED_PIN, HIGH);
       ledTimer = millis();
@@ -44,39 +44,41 @@ def count_fingers(landmarks):
             count += 1
     return count
 
-def is_thumb_up(landmarks):
+# The helpers below take the finger count computed once in get_gesture
+# instead of calling count_fingers again for every check.
+def is_thumb_up(landmarks, finger_count):
     # Thumb tip (4) above Thumb IP (3) and Index MCP (5)
     # And other fingers folded
     if (landmarks[4].y < landmarks[3].y and 
         landmarks[4].y < landmarks[5].y and
-        count_fingers(landmarks) == 0):
+        finger_count == 0):
         return True
     return False
 
-def is_thumb_down(landmarks):
+def is_thumb_down(landmarks, finger_count):
     # Thumb tip (4) below Thumb IP (3)
     # And other fingers folded
     if (landmarks[4].y > landmarks[3].y and 
         landmarks[4].y > landmarks[5].y and
-        count_fingers(landmarks) == 0):
+        finger_count == 0):
         return True
     return False
 
-def is_pointing_up(landmarks):
+def is_pointing_up(landmarks, finger_count):
     # Index extended, others folded
     if (landmarks[8].y < landmarks[6].y and 
-        count_fingers(landmarks) == 1): # Only index is up (technically count_fingers checks 4 fingers)
+        finger_count == 1): # Only index is up (technically count_fingers checks 4 fingers)
         # Double check it's the index
         if landmarks[8].y < landmarks[6].y and landmarks[12].y > landmarks[10].y:
             return True
     return False
 
-def is_pointing_right(landmarks):
+def is_pointing_right(landmarks, finger_count):
     # Index tip x > Index MCP x (assuming right hand facing camera, right is larger x)
     # Note: Mirror effect might flip this. Let's assume non-mirrored for logic first, or handle both.
     # Actually, let's just check x difference.
     if (abs(landmarks[8].x - landmarks[5].x) > 0.1 and # Significant horizontal extension
-        count_fingers(landmarks) <= 1): # Mostly folded
+        finger_count <= 1): # Mostly folded
         if landmarks[8].x < landmarks[5].x: # Tip is to the left of knuckle (on screen) -> Pointing Left
              return "LEFT"
         else:
@@ -90,7 +92,8 @@ def get_gesture(landmarks):
     if abs(landmarks[4].x - landmarks[9].x) > 0.1: # Thumb tip far from middle finger mcp
         thumb_extended = True
     
-    finger_count = count_fingers(landmarks)
+    fingers_up = count_fingers(landmarks)  # Computed once per frame
+    finger_count = fingers_up
     if thumb_extended:
         finger_count += 1
         
@@ -99,16 +102,16 @@ def get_gesture(landmarks):
     
     if finger_count == 0:
         # Check for Thumb Up/Down specifically
-        if is_thumb_up(landmarks):
+        if is_thumb_up(landmarks, fingers_up):
             return "VOL_UP", 'U'
-        if is_thumb_down(landmarks):
+        if is_thumb_down(landmarks, fingers_up):
             return "VOL_DOWN", 'D'
         return "MUTE", 'M' # Fist
         
-    if is_pointing_up(landmarks):
+    if is_pointing_up(landmarks, fingers_up):
         return "SOURCE", 'S'
         
-    direction = is_pointing_right(landmarks)
+    direction = is_pointing_right(landmarks, fingers_up)
     if direction == "RIGHT":
         return "CH_NEXT", 'N'
     elif direction == "LEFT":
@@ -0,0 +1,527 @@
+import json
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import serial
+import serial.tools.list_ports
+
+from ir_protocol import (ACK_OK, ACK_STATUS_TEXT, FRAME_ACK, MIN_BINARY_FIRMWARE, FrameDecoder,
+                         IRMessage, RawMessage, encode_frame)
+
+BAUD_RATE = 115200
+
+# Comandos pendientes como máximo por canal; si se llena se descarta el más antiguo
+QUEUE_SIZE = 32
+
+# Antigüedad máxima de un comando en cola: uno más viejo ya no corresponde al
+# gesto (p. ej. encolado justo antes de un corte) y se descarta sin enviarlo
+COMMAND_TTL = 1.0
+
+# Segundos entre intentos de reconexión
+RECONNECT_INTERVAL = 5.0
+
+# Reintento rápido contra el último puerto bueno (p. ej. tras un corte USB)
+FAST_RECONNECT_INTERVAL = 0.25
+
+# Espera máxima del hilo de E/S cuando no hay nada que escribir (latencia de lectura)
+POLL_INTERVAL = 0.01
+
+# Tiempo máximo para recibir el ACK de una trama antes de darla por perdida
+ACK_TIMEOUT = 0.5
+
+# --- Handshake con arduino_remote.ino ---
+# El host envía "?" y el firmware responde "ID:IRHAND:<versión>"
+HANDSHAKE_REQUEST = b"?\n"
+HANDSHAKE_PREFIX = "ID:IRHAND"
+# Tiempo máximo por puerto (incluye el arranque del ESP32 si se reinicia al abrir)
+HANDSHAKE_TIMEOUT = 2.5
+HANDSHAKE_RETRY = 0.2
+# Versión que se asigna al firmware anterior al handshake (no responde a "?"):
+# solo entiende texto. Se acepta únicamente en el puerto indicado o en el de la
+# caché si al guardarlo ya era ese firmware (VID:PID solo no identifica la placa).
+LEGACY_FIRMWARE = "0"
+
+# Último puerto bueno (nombre, VID:PID y versión del firmware), para reconectar sin escanear
+PORT_CACHE_PATH = os.path.join(os.path.expanduser("~"), ".remoteirhand_port.json")
+
+
+def candidate_ports():
+    """Puertos donde puede estar el ESP32 (USB/ACM primero; si no hay, todos)."""
+    ports = serial.tools.list_ports.comports()
+    candidates = [p for p in ports if 'USB' in p.description or 'ACM' in p.description
+                  or 'USB' in p.device or 'ACM' in p.device]
+    return candidates or list(ports)
+
+
+def load_port_cache(path=PORT_CACHE_PATH):
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def save_port_cache(port_info, firmware_version=None, path=PORT_CACHE_PATH):
+    cache = {
+        'device': port_info.device,
+        'vid': port_info.vid,
+        'pid': port_info.pid,
+        'serial_number': port_info.serial_number,
+        'firmware': firmware_version,
+    }
+    try:
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(cache, f)
+    except OSError as e:
+        print(f"No se pudo guardar el puerto en caché: {e}")
+    return cache
+
+
+def match_cached_port(ports, cache):
+    """
+    Puerto actual que corresponde al de la caché: mismo VID:PID (y número de
+    serie si lo hay), aunque haya cambiado de nombre tras reconectar el USB.
+    """
+    if not cache:
+        return None
+    for p in ports:
+        if cache.get('vid') is not None and (p.vid, p.pid) == (cache['vid'], cache['pid']):
+            if not cache.get('serial_number') or p.serial_number == cache['serial_number']:
+                return p
+    for p in ports:
+        if p.device == cache.get('device'):
+            return p
+    return None
+
+
+def probe_port(device, baud_rate=BAUD_RATE, timeout=HANDSHAKE_TIMEOUT, cancel=None,
+               accept_silent=False):
+    """
+    Abre 'device' y comprueba que responde el firmware arduino_remote.ino.
+
+    Se abre sin activar DTR/RTS para no reiniciar el ESP32 cuando la placa lo
+    permite; si se reinicia igualmente, se reintenta el handshake hasta 'timeout'.
+
+    Con accept_silent, un puerto que se abre pero no responde se acepta como
+    firmware LEGACY_FIRMWARE (anterior al handshake).
+
+    Returns:
+        tuple: (serial.Serial abierto, versión del firmware) o (None, None).
+    """
+    ser = serial.Serial()
+    ser.port = device
+    ser.baudrate = baud_rate
+    ser.timeout = 0
+    ser.write_timeout = 1
+    ser.dtr = False
+    ser.rts = False
+    try:
+        ser.open()
+    except (serial.SerialException, OSError):
+        return None, None
+
+    buffer = bytearray()
+    deadline = time.perf_counter() + timeout
+    next_request = 0
+    try:
+        while time.perf_counter() < deadline and not (cancel and cancel.is_set()):
+            now = time.perf_counter()
+            if now >= next_request:
+                ser.write(HANDSHAKE_REQUEST)
+                next_request = now + HANDSHAKE_RETRY
+            buffer += ser.read(ser.in_waiting or 1)
+            while b'\n' in buffer:
+                line, _, rest = bytes(buffer).partition(b'\n')
+                buffer = bytearray(rest)
+                text = line.decode('utf-8', errors='replace').strip()
+                if text.startswith(HANDSHAKE_PREFIX):
+                    version = text[len(HANDSHAKE_PREFIX):].lstrip(':') or "1"
+                    ser.reset_input_buffer()
+                    return ser, version
+            time.sleep(0.01)
+        else:
+            if accept_silent and not (cancel and cancel.is_set()):
+                ser.reset_input_buffer()
+                return ser, LEGACY_FIRMWARE
+    except (serial.SerialException, OSError):
+        pass
+
+    ser.close()
+    return None, None
+
+
+def discover_port(ports, baud_rate=BAUD_RATE, timeout=HANDSHAKE_TIMEOUT):
+    """
+    Prueba todos los puertos a la vez y devuelve el primero que supera el handshake.
+
+    Returns:
+        tuple: (ListPortInfo, serial.Serial abierto, versión) o (None, None, None).
+    """
+    if not ports:
+        return None, None, None
+
+    cancel = threading.Event()
+    winner = (None, None, None)
+    with ThreadPoolExecutor(max_workers=len(ports)) as executor:
+        futures = {executor.submit(probe_port, p.device, baud_rate, timeout, cancel): p
+                   for p in ports}
+        for future in as_completed(futures):
+            ser, version = future.result()
+            if ser is None:
+                continue
+            if winner[0] is None:
+                winner = (futures[future], ser, version)
+                cancel.set()
+            else:
+                ser.close()
+    return winner
+
+
+class SerialLink:
+    """
+    Enlace serial con el ESP32 en su propio hilo.
+
+    - send() nunca bloquea: encola el comando (cola acotada, los comandos
+      idénticos ya pendientes se fusionan). Sin ESP32 conectado el comando se
+      descarta, y los que pasan más de COMMAND_TTL en cola no se envían.
+    - Cada canal (p. ej. una sesión de control) tiene su cola y se atienden por
+      turnos, un comando cada vez: una sesión muy activa no retrasa a las demás,
+      y si solo una tiene pendientes se envían sin espera adicional.
+    - Los IRMessage se envían como trama binaria con ACK si el firmware es
+      v2 o posterior, y como línea de texto en caso contrario.
+    - Los RawMessage (firmware v3+) se envían trama a trama, esperando el ACK
+      de cada una antes de la siguiente para no desbordar el buffer del ESP32.
+    - Las respuestas se leen sin bloquear y se entregan línea a línea a on_line;
+      los ACK perdidos o con error también se notifican por on_line.
+    - La detección de puerto y la reconexión ocurren en segundo plano. El
+      puerto indicado ('device') se acepta aunque no responda al handshake
+      (firmware antiguo, solo texto); el de la caché, solo si se guardó así.
+
+    Los callbacks se llaman desde el hilo del enlace.
+    """
+
+    def __init__(self, baud_rate=BAUD_RATE, on_line=None, on_status=None, metrics=None,
+                 queue_size=QUEUE_SIZE, device=None):
+        self.baud_rate = baud_rate
+        self.device = device
+        self.on_line = on_line
+        self.on_status = on_status
+        self.metrics = metrics
+        self.queue_size = queue_size
+
+        self.ser = None
+        self.firmware_version = None
+        self._port_cache = load_port_cache()
+        self._last_full_scan = 0
+        self._pending = {}     # canal -> deque de (payload, encolado, origen)
+        self._turns = deque()  # canales con pendientes, en orden de turno
+        self._cond = threading.Condition()
+        self._decoder = FrameDecoder()
+        self._seq = 0
+        self._awaiting_ack = {}  # seq -> (instante de escritura, IRMessage)
+        self._writing = None  # (canal,) del comando que se está escribiendo
+        self._run_flag = False
+        self._thread = None
+
+    # --- API pública (cualquier hilo) ---
+
+    @property
+    def connected(self):
+        return self.ser is not None
+
+    @property
+    def binary(self):
+        """True si el firmware conectado entiende el protocolo binario."""
+        return self.firmware_at_least(MIN_BINARY_FIRMWARE)
+
+    def firmware_at_least(self, version):
+        try:
+            return int(self.firmware_version) >= version
+        except (TypeError, ValueError):
+            return False
+
+    def pending(self, channel=None):
+        """
+        Comandos de 'channel' aún no escritos en el puerto: los de su cola más
+        el que se está escribiendo (hasta el flush y, con tramas, los ACK
+        intermedios).
+        """
+        with self._cond:
+            queue = self._pending.get(channel)
+            return (len(queue) if queue else 0) + (self._writing == (channel,))
+
+    @property
+    def port(self):
+        ser = self.ser
+        return ser.port if ser else None
+
+    def start(self):
+        self._run_flag = True
+        self._thread = threading.Thread(target=self._run, name="SerialLink", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._run_flag = False
+        with self._cond:
+            self._cond.notify()
+        if self._thread:
+            self._thread.join()
+        self._close()
+
+    def send(self, payload, origin_time=None, channel=None):
+        """
+        Encola un comando para el ESP32.
+
+        Args:
+            payload (str | bytes | IRMessage | RawMessage): Comando para el
+                ESP32; los mensajes IR se codifican al escribir según el firmware.
+            origin_time (float, opcional): perf_counter() del gesto que lo
+                originó, para medir la latencia gesto -> serial.
+            channel (opcional): Cola en la que se encola (por defecto, la común).
+
+        Returns:
+            bool: False si no se encoló: sin ESP32 conectado (modo simulación)
+            o fusionado con un comando idéntico ya pendiente.
+        """
+        if isinstance(payload, str):
+            payload = payload.encode()
+
+        with self._cond:
+            # Sin puerto no se acumulan gestos para enviarlos al reconectar
+            if self.ser is None:
+                self._count('serial_offline')
+                return False
+            queue = self._pending.setdefault(channel, deque())
+            # Un mismo comando repetido mientras sigue en cola solo se envía una vez
+            if any(p == payload for p, _, _ in queue):
+                self._count('serial_coalesced')
+                return False
+            # Un canal con pendientes ya está en _turns (aunque se descarte su único comando)
+            was_empty = not queue
+            if len(queue) >= self.queue_size:
+                queue.popleft()
+                self._count('serial_dropped')
+            if was_empty:
+                self._turns.append(channel)
+            queue.append((payload, time.perf_counter(), origin_time))
+            self._cond.notify()
+        return True
+
+    def _next_pending(self):
+        """
+        Siguiente comando por turno rotatorio entre canales (con self._cond
+        tomado). Los que llevan más de COMMAND_TTL en cola se descartan.
+        """
+        limit = time.perf_counter() - COMMAND_TTL
+        while self._turns:
+            channel = self._turns.popleft()
+            queue = self._pending[channel]
+            item = queue.popleft()
+            if queue:
+                self._turns.append(channel)
+            if item[1] < limit:
+                self._count('serial_expired')
+                continue
+            self._writing = (channel,)
+            return item
+        return None
+
+    # --- Hilo de E/S ---
+
+    def _run(self):
+        while self._run_flag:
+            if self.ser is None:
+                self._connect()
+                if self.ser is None:
+                    with self._cond:
+                        self._cond.wait(FAST_RECONNECT_INTERVAL)
+                    continue
+
+            with self._cond:
+                if not self._turns:
+                    self._cond.wait(POLL_INTERVAL)
+                item = self._next_pending()
+
+            try:
+                if item is not None:
+                    self._write(*item)
+                self._read_available()
+                self._expire_acks()
+            except (serial.SerialException, OSError) as e:
+                print(f"Error serial: {e}")
+                self._close()
+                self._set_status(False)
+            finally:
+                if item is not None:
+                    with self._cond:
+                        self._writing = None
+
+    def _write(self, payload, enqueued_at, origin_time):
+        start = time.perf_counter()
+        if isinstance(payload, (IRMessage, RawMessage)):
+            if payload.frames and self.firmware_at_least(payload.min_firmware):
+                self._write_frames(payload)
+            elif payload.text is not None:
+                self._write_bytes(payload.text)
+            else:
+                self._count('serial_unsupported')
+                self._report(f"No se puede enviar {payload!r} (firmware v{self.firmware_version})")
+                return
+        else:
+            self._write_bytes(payload)
+        done = time.perf_counter()
+        if self.metrics:
+            self.metrics.record('serial_queue_wait', start - enqueued_at)
+            self.metrics.record('serial_write', done - start)
+            if origin_time is not None:
+                self.metrics.record('gesture_to_serial', done - origin_time)
+
+    def _write_bytes(self, data):
+        self.ser.write(data)
+        self.ser.flush() # Asegurar que se envía inmediatamente
+
+    def _write_frames(self, message):
+        """
+        Escribe las tramas de 'message'. Todas menos la última esperan su ACK
+        (parada y espera); el ACK de la última se comprueba de forma asíncrona.
+        """
+        last = len(message.frames) - 1
+        for i, (frame_type, body) in enumerate(message.frames):
+            self._seq = (self._seq + 1) & 0xFF
+            seq = self._seq
+            self._awaiting_ack[seq] = (time.perf_counter(), message)
+            self._write_bytes(encode_frame(frame_type, seq, body))
+            if i < last and not self._await_ack(seq):
+                self._count('serial_aborted')
+                return
+
+    def _await_ack(self, seq):
+        """Espera el ACK de 'seq' leyendo el puerto. True si llegó y es OK."""
+        deadline = time.perf_counter() + ACK_TIMEOUT
+        while time.perf_counter() < deadline:
+            acks = self._read_available()
+            if seq in acks:
+                return acks[seq] == ACK_OK
+            time.sleep(0.001)
+        return False  # _expire_acks lo notificará como perdido
+
+    def _read_available(self):
+        """
+        Lee lo que haya en el buffer del puerto sin esperar y entrega líneas y ACK.
+
+        Returns:
+            dict: seq -> estado de los ACK recibidos en esta lectura.
+        """
+        acks = {}
+        waiting = self.ser.in_waiting
+        if not waiting:
+            return acks
+        crc_errors = self._decoder.crc_errors
+        for event in self._decoder.feed(self.ser.read(waiting)):
+            if event[0] == 'line':
+                if self.on_line:
+                    self.on_line(event[1])
+            elif event[1] == FRAME_ACK:
+                status = self._handle_ack(event[2], event[3])
+                if status is not None:
+                    acks[event[2]] = status
+        if self._decoder.crc_errors != crc_errors:
+            self._count('serial_crc_errors')
+        return acks
+
+    def _handle_ack(self, seq, payload):
+        sent = self._awaiting_ack.pop(seq, None)
+        if sent is None:
+            return None  # ACK tardío de una trama ya dada por perdida
+        sent_at, message = sent
+        if self.metrics:
+            self.metrics.record('serial_ack_rtt', time.perf_counter() - sent_at)
+        status = payload[0] if payload else ACK_OK
+        if status != ACK_OK:
+            self._count('serial_nack')
+            self._report(f"ESP32 rechazó {message!r}: "
+                         f"{ACK_STATUS_TEXT.get(status, f'error {status}')}")
+        return status
+
+    def _expire_acks(self):
+        if not self._awaiting_ack:
+            return
+        limit = time.perf_counter() - ACK_TIMEOUT
+        for seq, (sent_at, message) in list(self._awaiting_ack.items()):
+            if sent_at < limit:
+                del self._awaiting_ack[seq]
+                self._count('serial_lost')
+                self._report(f"Sin ACK del ESP32 para {message!r} (seq {seq})")
+
+    def _report(self, text):
+        print(text)
+        if self.on_line:
+            self.on_line(text)
+
+    def _connect(self):
+        """
+        Busca el ESP32: primero el puerto indicado, después el último puerto
+        bueno (reintento rápido) y, como mucho cada RECONNECT_INTERVAL, todos
+        los candidatos en paralelo.
+        """
+        ports = candidate_ports()
+
+        if self.device is not None:
+            explicit = next((p for p in serial.tools.list_ports.comports()
+                             if p.device == self.device), None)
+            if explicit is not None:
+                ser, version = probe_port(explicit.device, self.baud_rate, accept_silent=True)
+                if ser is not None:
+                    self._connected(explicit, ser, version)
+                    return True
+
+        cached = match_cached_port(ports, self._port_cache)
+        if cached is not None:
+            # Silencioso solo si el puerto guardado ya era firmware antiguo
+            legacy = self._port_cache.get('firmware') == LEGACY_FIRMWARE
+            ser, version = probe_port(cached.device, self.baud_rate, accept_silent=legacy)
+            if ser is not None:
+                self._connected(cached, ser, version)
+                return True
+
+        if time.time() - self._last_full_scan < RECONNECT_INTERVAL:
+            return False
+        self._last_full_scan = time.time()
+
+        others = [p for p in ports if cached is None or p.device != cached.device]
+        print(f"Buscando ESP32 en: {[p.device for p in others]}")
+        port_info, ser, version = discover_port(others, self.baud_rate)
+        if ser is not None:
+            self._connected(port_info, ser, version)
+            return True
+
+        self._set_status(False)
+        return False
+
+    def _connected(self, port_info, ser, version):
+        print(f"¡Conectado exitosamente a {port_info.device}! (firmware v{version})")
+        self.ser = ser
+        self.firmware_version = version
+        self._port_cache = save_port_cache(port_info, version)
+        self._set_status(True)
+
+    def _close(self):
+        ser, self.ser = self.ser, None
+        self._decoder = FrameDecoder()
+        self._awaiting_ack.clear()
+        if ser:
+            try:
+                ser.close()
+            except Exception:
+                pass
+
+    def _set_status(self, connected):
+        if self.on_status:
+            self.on_status(connected)
+
+    def _count(self, name):
+        if self.metrics:
+            self.metrics.count(name)
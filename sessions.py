@@ -0,0 +1,122 @@
+"""
+Sesiones de control: cada mano (o franja vertical de la imagen) maneja su
+propio dispositivo IR, con su propio suavizado y enfriamiento.
+
+Sin dependencias de Qt: el hilo de video llama a SessionManager.update() con
+las manos detectadas y envía directamente los comandos disparados.
+"""
+from gestures import WRIST, GestureSmoother, classify_array
+
+# Etiquetas de MediaPipe (multi_handedness) para el modo 'hands'
+HAND_SESSIONS = [("Mano derecha", "Right"), ("Mano izquierda", "Left")]
+
+
+class ControlSession:
+    """
+    Una mano o zona ligada a un dispositivo cargado.
+
+    Args:
+        name (str): Nombre visible (log, superposición del video).
+        zone (tuple): Franja horizontal (x0, x1) en coordenadas normalizadas;
+            se usa la posición de la muñeca.
+        handedness (str, opcional): "Left"/"Right"; si se indica, la sesión
+            se liga a esa mano en vez de a una zona.
+    """
+
+    def __init__(self, name, zone=(0.0, 1.0), handedness=None, smoother=None):
+        self.name = name
+        self.zone = zone
+        self.handedness = handedness
+        self.smoother = smoother or GestureSmoother(window=7, threshold=5, cooldown=0.8)
+        self.device_name = None
+        # gesto -> (IRCommand, mensaje compilado); ver gestures.compile_dispatch_table
+        self.dispatch_table = {}
+        self.display_gesture = "..."
+
+    def set_device(self, device_name, dispatch_table):
+        """Ligar la sesión a un dispositivo (se puede llamar desde otro hilo)."""
+        self.dispatch_table = dispatch_table
+        self.device_name = device_name
+
+    def matches(self, hand, label=None):
+        if self.handedness is not None:
+            return label == self.handedness
+        x0, x1 = self.zone
+        x = min(max(float(hand[WRIST, 0]), 0.0), 1.0)
+        return x0 <= x < x1 or (x1 >= 1.0 and x == 1.0)
+
+    def __repr__(self):
+        return f"ControlSession({self.name!r}, {self.device_name or 'sin dispositivo'})"
+
+
+def make_sessions(mode='zones', count=1, **smoother_args):
+    """
+    Crear las sesiones de control.
+
+    Args:
+        mode (str): 'zones' (franjas verticales de igual ancho, de izquierda
+            a derecha en la imagen volteada) o 'hands' (mano derecha/izquierda).
+        count (int): Número de sesiones ('hands' admite como máximo 2).
+        **smoother_args: Parámetros de GestureSmoother para cada sesión.
+    """
+    if mode == 'hands':
+        return [ControlSession(name, handedness=label,
+                               smoother=GestureSmoother(**smoother_args))
+                for name, label in HAND_SESSIONS[:count]]
+
+    if count == 1:
+        return [ControlSession("Principal", smoother=GestureSmoother(**smoother_args))]
+    width = 1.0 / count
+    return [ControlSession(f"Zona {i + 1}", zone=(i * width, (i + 1) * width),
+                           smoother=GestureSmoother(**smoother_args))
+            for i in range(count)]
+
+
+class SessionManager:
+    """Reparte las manos detectadas entre las sesiones y suaviza cada una por separado."""
+
+    def __init__(self, sessions):
+        self.sessions = sessions
+
+    @property
+    def max_hands(self):
+        return len(self.sessions)
+
+    def assign(self, hands, labels=None):
+        """
+        Mano (array (21, 3)) de cada sesión, o None. Cada mano va a la primera
+        sesión libre que la acepta; las que no encajan en ninguna se ignoran.
+        """
+        assigned = [None] * len(self.sessions)
+        labels = labels or [None] * len(hands)
+        for hand, label in zip(hands, labels):
+            for i, session in enumerate(self.sessions):
+                if assigned[i] is None and session.matches(hand, label):
+                    assigned[i] = hand
+                    break
+        return assigned
+
+    def update(self, hands, labels=None, now=None):
+        """
+        Procesar un fotograma.
+
+        Args:
+            hands (list): Arrays (21, 3) de las manos detectadas.
+            labels (list, opcional): "Left"/"Right" de cada mano.
+
+        Returns:
+            list: (sesión, gesto disparado) de las sesiones que dispararon.
+        """
+        fired_events = []
+        for session, hand in zip(self.sessions, self.assign(hands, labels)):
+            gesture = classify_array(hand) if hand is not None else "NINGUNO"
+            session.display_gesture, fired = session.smoother.update(gesture, now)
+            if fired:
+                fired_events.append((session, fired))
+        return fired_events
+
+    def find(self, name):
+        for session in self.sessions:
+            if session.name == name:
+                return session
+        return None
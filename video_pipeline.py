@@ -0,0 +1,238 @@
+import threading
+import time
+
+import cv2
+import numpy as np
+
+
+class Frame:
+    """Fotograma capturado junto con su instante de captura (time.perf_counter)."""
+    __slots__ = ('image', 'timestamp', 'seq')
+
+    def __init__(self, image, timestamp, seq):
+        self.image = image
+        self.timestamp = timestamp
+        self.seq = seq
+
+
+class LatestSlot:
+    """
+    Buzón de un solo elemento entre dos etapas del pipeline.
+
+    put() siempre sobrescribe: si el consumidor va lento, los elementos
+    viejos se descartan en vez de acumular retraso.
+    """
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._item = None
+        self.dropped = 0
+
+    def put(self, item):
+        """Deja 'item' en el buzón. Devuelve True si se descartó uno sin consumir."""
+        with self._cond:
+            replaced = self._item is not None
+            if replaced:
+                self.dropped += 1
+            self._item = item
+            self._cond.notify()
+        return replaced
+
+    def get(self, timeout=None):
+        """Espera al siguiente elemento y lo saca del buzón (None si vence el timeout)."""
+        with self._cond:
+            if self._item is None:
+                self._cond.wait(timeout)
+            item, self._item = self._item, None
+            return item
+
+
+class CaptureWorker(threading.Thread):
+    """
+    Etapa de captura: lee la cámara sin parar y deja siempre el fotograma
+    más reciente (ya volteado en espejo) en 'slot'.
+    """
+
+    def __init__(self, camera_index, slot, metrics=None):
+        super().__init__(daemon=True)
+        self.camera_index = camera_index
+        self.slot = slot
+        self.metrics = metrics
+        self.frames_captured = 0
+        self._run_flag = True
+
+    def run(self):
+        cap = cv2.VideoCapture(self.camera_index)
+        # Evitar que el driver acumule fotogramas viejos
+        cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+
+        while self._run_flag:
+            start = time.perf_counter()
+            success, image = cap.read()
+            if not success:
+                time.sleep(0.01)
+                continue
+            self.frames_captured += 1
+            frame = Frame(cv2.flip(image, 1), time.perf_counter(), self.frames_captured)
+            dropped = self.slot.put(frame)
+
+            if self.metrics:
+                self.metrics.record('capture', frame.timestamp - start)
+                self.metrics.count('frames_captured')
+                if dropped:
+                    self.metrics.count('frames_dropped')
+
+        cap.release()
+
+    def stop(self):
+        self._run_flag = False
+        self.join()
+
+
+class FrameRing:
+    """
+    Anillo de buffers de imagen preasignados para la etapa de render.
+
+    Cada fotograma se redimensiona con OpenCV directamente dentro del siguiente
+    buffer libre (sin asignar memoria nueva) y la vista lo usa sin copiarlo.
+    Un buffer entregado queda ocupado hasta que la vista lo devuelve con
+    release(): mientras tanto no se sobrescribe ni se libera, aunque el
+    anillo se reasigne por un cambio de tamaño.
+    """
+
+    def __init__(self, max_width=640, max_height=480, size=4):
+        self.max_width = max_width
+        self.max_height = max_height
+        self.size = size
+        self.buffers = []
+        self._source_shape = None
+        self._next = 0
+        self._held = {}  # id(buffer) -> buffer entregado y aún no devuelto
+        self._lock = threading.Lock()
+
+    def _allocate(self, source_shape):
+        h, w = source_shape[:2]
+        scale = min(self.max_width / w, self.max_height / h)
+        target_h, target_w = max(1, int(h * scale)), max(1, int(w * scale))
+        channels = source_shape[2] if len(source_shape) > 2 else 1
+        self.buffers = [np.empty((target_h, target_w, channels), dtype=np.uint8)
+                        for _ in range(self.size)]
+        self._source_shape = source_shape
+
+    def resize_into(self, image):
+        """
+        Redimensiona 'image' (manteniendo aspecto) en el siguiente buffer libre
+        y lo devuelve ocupado; None si la vista aún tiene todos los buffers.
+        """
+        with self._lock:
+            if image.shape != self._source_shape:
+                self._allocate(image.shape)
+            for _ in range(self.size):
+                buf = self.buffers[self._next]
+                self._next = (self._next + 1) % self.size
+                if id(buf) not in self._held:
+                    break
+            else:
+                return None
+            self._held[id(buf)] = buf
+        h, w = buf.shape[:2]
+        cv2.resize(image, (w, h), dst=buf, interpolation=cv2.INTER_AREA)
+        return buf
+
+    def release(self, buf):
+        """Devolver un buffer de resize_into() que la vista ya no muestra."""
+        with self._lock:
+            self._held.pop(id(buf), None)
+
+
+class SlotWorker(threading.Thread):
+    """Etapa genérica: consume elementos de 'slot' y llama a handler(item)."""
+
+    def __init__(self, slot, handler):
+        super().__init__(daemon=True)
+        self.slot = slot
+        self.handler = handler
+        self._run_flag = True
+
+    def run(self):
+        while self._run_flag:
+            item = self.slot.get(timeout=0.1)
+            if item is not None:
+                self.handler(item)
+
+    def stop(self):
+        self._run_flag = False
+        self.join()
+
+
+class AdaptiveInferenceScheduler:
+    """
+    Decide qué fotogramas pasan por MediaPipe y a qué resolución.
+
+    - Sin mano (reposo): se procesa 1 de cada 'idle_interval' fotogramas a
+      escala 'idle_scale', lo justo para detectar que aparece una mano.
+    - Con mano (activo): todos los fotogramas a resolución completa, dejando
+      que MediaPipe haga tracking entre fotogramas.
+    - Si la inferencia media supera 'frame_budget' durante 'over_budget_frames'
+      fotogramas seguidos, se baja a model_complexity=0 (una sola vez).
+    """
+
+    def __init__(self, idle_scale=0.5, idle_interval=3, hand_lost_grace=15,
+                 frame_budget=1 / 30, over_budget_frames=30, model_complexity=1):
+        self.idle_scale = idle_scale
+        self.idle_interval = idle_interval
+        self.hand_lost_grace = hand_lost_grace
+        self.frame_budget = frame_budget
+        self.over_budget_frames = over_budget_frames
+        self.model_complexity = model_complexity
+
+        self.active = False
+        self._frames_without_hand = 0
+        self._frame_counter = 0
+        self._over_budget = 0
+        self._avg_inference = None
+
+    def should_process(self):
+        """Llamar una vez por fotograma: False si este fotograma se salta."""
+        self._frame_counter += 1
+        if self.active:
+            return True
+        return self._frame_counter % self.idle_interval == 0
+
+    @property
+    def scale(self):
+        return 1.0 if self.active else self.idle_scale
+
+    def report(self, hand_found, inference_time):
+        """
+        Informar del resultado de una inferencia.
+
+        Returns:
+            bool: True si hay que recrear el modelo con self.model_complexity.
+        """
+        if hand_found:
+            self.active = True
+            self._frames_without_hand = 0
+        elif self.active:
+            self._frames_without_hand += 1
+            if self._frames_without_hand > self.hand_lost_grace:
+                self.active = False
+
+        # Media móvil exponencial del tiempo de inferencia en modo activo
+        if not self.active:
+            return False
+        if self._avg_inference is None:
+            self._avg_inference = inference_time
+        else:
+            self._avg_inference = 0.9 * self._avg_inference + 0.1 * inference_time
+
+        if self.model_complexity > 0 and self._avg_inference > self.frame_budget:
+            self._over_budget += 1
+            if self._over_budget >= self.over_budget_frames:
+                self.model_complexity = 0
+                self._over_budget = 0
+                self._avg_inference = None
+                return True
+        else:
+            self._over_budget = 0
+        return False